@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict, fields
+from dataclasses import dataclass, asdict, field, fields
 import json
+import os
 from pathlib import Path
 from platformdirs import user_config_dir, user_log_dir
 
@@ -15,6 +16,12 @@ DEFAULT_DB = CFG_DIR / "examgen_initial_empty.db"
 def db_path() -> Path:
     return Path(db_folder) / "examgen.db" if db_folder else DEFAULT_DB
 
+
+def database_url() -> str | None:
+    """Return the configured server URL, or None to use the SQLite file."""
+    return os.environ.get("EXAMGEN_DATABASE_URL") or settings.database_url
+
+
 SETTINGS_FILE = CFG_DIR / "settings.json"
 
 
@@ -23,6 +30,44 @@ class AppSettings:
     theme: str = "dark"
     db_folder: str | None = None
     debug_mode: bool = False
+    # servidor compartido (p. ej. "postgresql+psycopg://user@host/examgen");
+    # None = fichero SQLite en db_folder.  EXAMGEN_DATABASE_URL tiene prioridad
+    database_url: str | None = None
+    # pool por cliente de escritorio: mantener
+    # clientes × (db_pool_size + db_max_overflow) < max_connections del servidor
+    db_pool_size: int = 2
+    db_max_overflow: int = 3
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    # escrituras con reintento (ver core.services.write_coordinator)
+    write_retries: int = 8
+    write_backoff_ms: int = 50
+    write_backoff_max_ms: int = 2000
+    # 0 = sin lease; >0 = segundos que un equipo conserva el turno de escritura
+    write_lease_seconds: float = 0.0
+    # sentencias compiladas por engine (ver core.database.StatementCache)
+    statement_cache_size: int = 500
+    # almacén de imágenes; None = "<bd>_media" junto al fichero SQLite
+    media_folder: str | None = None
+    # perfil de PRAGMAs SQLite: "durable" o "fast" (ver core.database)
+    sqlite_profile: str = "fast"
+    # BD en una carpeta de red (SMB/NFS): journal DELETE en vez de WAL.
+    # None = detectarlo por la ruta del fichero
+    sqlite_shared_folder: bool | None = None
+    sqlite_pragmas: dict[str, int | str] = field(default_factory=dict)
+    # el mantenimiento en reposo archiva en examgen_archive.db los intentos
+    # más antiguos (None = nunca; el botón "Archivar" usa 365 días)
+    archive_after_days: int | None = None
+    # mantenimiento en segundo plano (ver core.services.maintenance)
+    maintenance_interval_hours: int = 24
+    maintenance_idle_seconds: int = 60
+    # ficheros mayores no se convierten a auto_vacuum incremental solos:
+    # el VACUUM completo bloquea la BD (job "convert_vacuum", a mano)
+    maintenance_convert_max_mb: int = 256
+    # copias de seguridad; None = carpeta "backups" junto a la BD
+    backup_folder: str | None = None
+    backup_keep: int = 7
+    backup_pages_per_step: int = 1024
 
     @classmethod
     def load(cls) -> "AppSettings":
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
+from datetime import datetime
+import hashlib
+from inspect import getsource
+import os
 from pathlib import Path
+import threading
+from typing import Callable
 
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session, SessionTransaction, sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.selectable import SelectBase
+from sqlalchemy.util import LRUCache
 
-from examgen.config import db_path
+from examgen.config import DEFAULT_DB, database_url, db_path, settings
 from examgen.utils.debug import log
 
-from examgen.core.models import Base, _create_examiner_tables
+from examgen.core.models import Base, SchemaVersion, _create_examiner_tables
 
 
 LEGACY_DB = Path("examgen.db")
@@ -22,31 +31,391 @@ if LEGACY_DB.exists() and not DEFAULT_DB.exists():
 if LEGACY_DOCS_DB.exists() and DEFAULT_DB.exists():
     LEGACY_DOCS_DB.unlink()
 
+# PRAGMAs aplicados a cada conexión nueva.  "durable" conserva el fsync
+# completo en cada commit; "fast" usa synchronous=NORMAL (seguro con WAL,
+# solo puede perder los últimos commits ante un corte de luz) y cachés grandes.
+SQLITE_PROFILES: dict[str, dict[str, int | str]] = {
+    "durable": {
+        # solo tiene efecto en ficheros nuevos (antes de crear tablas)
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        # solo tiene efecto en ficheros nuevos (antes de crear tablas)
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # KiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+
+# WAL necesita memoria compartida en un único equipo: en una carpeta de red
+# varios equipos corromperían el índice del WAL.  DELETE bloquea el fichero
+# entero, que sí funciona sobre SMB/NFS
+SHARED_FOLDER_PRAGMAS: dict[str, int | str] = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+}
+_NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "afpfs", "9p", "fuse.sshfs"}
+
+
+def is_network_path(path: Path) -> bool:
+    """Best-effort check for a file on a network share (UNC, SMB, NFS…)."""
+    text = str(path)
+    if text.startswith(("\\\\", "//")):
+        return True
+    path = Path(path).absolute()
+    if os.name == "nt":
+        import ctypes
+
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(path.anchor) == DRIVE_REMOTE
+    try:
+        mounts = Path("/proc/mounts").read_text().splitlines()
+    except OSError:
+        return False
+    best, fstype = "", ""
+    for line in mounts:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        point = parts[1]
+        inside = path == Path(point) or Path(point) in path.parents
+        if inside and len(point) >= len(best):
+            best, fstype = point, parts[2]
+    return fstype in _NETWORK_FS
+
+
+def is_shared_folder(path: Path) -> bool:
+    """True if *path* must be opened for several machines (no WAL)."""
+    if settings.sqlite_shared_folder is not None:
+        return settings.sqlite_shared_folder
+    return is_network_path(path)
+
+
+def sqlite_pragmas(path: Path | None = None) -> dict[str, int | str]:
+    """Return the PRAGMAs for the profile selected in the settings.
+
+    For a database in a shared folder (see :func:`is_shared_folder`) the
+    profile is adjusted with :data:`SHARED_FOLDER_PRAGMAS`; explicit
+    ``settings.sqlite_pragmas`` always win.
+    """
+    pragmas = dict(
+        SQLITE_PROFILES.get(settings.sqlite_profile, SQLITE_PROFILES["durable"])
+    )
+    if path is not None and is_shared_folder(path):
+        pragmas.update(SHARED_FOLDER_PRAGMAS)
+    pragmas.update(settings.sqlite_pragmas)
+    return pragmas
+
+
+# PRAGMAs del perfil que no escriben en el fichero (válidos en modo ro)
+_READER_PRAGMAS = ("busy_timeout", "cache_size", "mmap_size", "temp_store")
+
+
+def _apply_profile(engine: Engine, path: Path, read_only: bool = False) -> None:
+    """Run the configured PRAGMAs on every connection opened by *engine*."""
+    pragmas = sqlite_pragmas(path)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_con, _record) -> None:
+        cur = dbapi_con.cursor()
+        cur.execute("PRAGMA foreign_keys = ON")
+        for name, value in pragmas.items():
+            if not read_only or name in _READER_PRAGMAS:
+                cur.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            cur.execute("PRAGMA query_only = ON")
+        cur.close()
+
+
+class StatementCache(LRUCache):
+    """LRU of compiled statements that counts its hits and misses.
+
+    SQLAlchemy looks every statement up here by its cache key before
+    compiling; the counters show whether the hot queries are being reused.
+    """
+
+    __slots__ = ("hits", "misses")
+
+    def __init__(self, capacity: int = 500) -> None:
+        super().__init__(capacity)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        # sin lock: un recuento aproximado entre hilos es suficiente
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+def _count_statements(engine: Engine) -> Engine:
+    engine.update_execution_options(
+        compiled_cache=StatementCache(settings.statement_cache_size)
+    )
+    return engine
+
+
+def create_sqlite_engine(path: Path) -> Engine:
+    """Create the writer engine for the SQLite file at *path*.
+
+    Its pool holds a single connection: writers from the GUI and from the
+    maintenance thread queue up in the pool instead of failing with
+    ``database is locked``.
+    """
+    engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        future=True,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    _apply_profile(engine, path)
+    return _count_statements(engine)
+
+
+def create_sqlite_private(path: Path) -> Engine:
+    """Create an unpooled engine for background jobs on *path*.
+
+    Its connections are not the writer's: a long job only holds SQLite's
+    lock while it writes, and GUI writers wait on ``busy_timeout`` instead
+    of on the pool.  Dispose of it when the job ends.
+    """
+    engine = create_engine(f"sqlite:///{path}", future=True, poolclass=NullPool)
+    _apply_profile(engine, path)
+    return engine
+
+
+def create_sqlite_reader(path: Path) -> Engine:
+    """Create a read-only engine (``mode=ro``, ``query_only``) for *path*.
+
+    With WAL its connections read the last committed state without waiting
+    for the writer.
+    """
+    engine = create_engine(
+        f"sqlite:///{path.as_uri()}?mode=ro&uri=true", echo=False, future=True
+    )
+    _apply_profile(engine, path, read_only=True)
+    return _count_statements(engine)
+
+
+def create_server_engine(url: str) -> Engine:
+    """Create a pooled engine for a database server such as PostgreSQL."""
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        connect_args["application_name"] = "examgen"
+    engine = create_engine(
+        url,
+        echo=False,
+        future=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+    return _count_statements(engine)
+
+
+def is_sqlite(bind: Engine | Connection) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+# -----------------------------------------------------------------------------
+# Registro de engines: uno por fichero de BD o URL de servidor
+# -----------------------------------------------------------------------------
+_engines: dict[str, Engine] = {}
+_readers: dict[str, Engine] = {}
+_factories: dict[str, sessionmaker] = {}
+_initialised: set[str] = set()
+_registry_lock = threading.Lock()
+
+
+def _is_url(target: Path | str | None) -> bool:
+    return isinstance(target, str) and "://" in target
+
+
+def _key(target: Path | str | None) -> str:
+    if _is_url(target):
+        url = make_url(target)
+        if url.get_backend_name() != "sqlite":
+            return target
+        target = url.database
+    return str(Path(target or db_path()).resolve())
+
+
+def engine_for(target: Path | str | None = None) -> Engine:
+    """Return the shared engine for a SQLite path or a server URL.
+
+    Engines are created on first use and reused afterwards.
+    """
+    key = _key(target)
+    with _registry_lock:
+        eng = _engines.get(key)
+        if eng is None:
+            if _is_url(key):
+                eng = create_server_engine(key)
+            else:
+                eng = create_sqlite_engine(Path(key))
+            _engines[key] = eng
+        return eng
+
+
+def reader_for(target: Path | str | None = None) -> Engine:
+    """Return the read-only engine paired with :func:`engine_for`.
+
+    Servers handle concurrent readers themselves: there the writer engine
+    is returned.
+    """
+    key = _key(target)
+    if _is_url(key):
+        return engine_for(key)
+    with _registry_lock:
+        eng = _readers.get(key)
+        if eng is None:
+            eng = _readers[key] = create_sqlite_reader(Path(key))
+        return eng
+
+
+class RoutingSession(Session):
+    """Session that reads through the read-only engine and writes through
+    the writer.
+
+    Only statements known to be a SELECT (``select()``, ORM queries,
+    ``text(...).columns()``) may go to the reader.  Flushes, DML, plain
+    ``text()`` and raw ``connection()`` calls go to the writer; from then on
+    the session sticks to it until the transaction ends, so it always reads
+    its own uncommitted changes.
+
+    A read-modify-write must not read through the reader first: the value
+    could be stale by the time it writes.  Run it with
+    ``core.services.write_coordinator.run_write``, whose session uses the
+    writer from ``BEGIN IMMEDIATE`` on.
+    """
+
+    def __init__(self, *args, reader: Engine | None = None, **kw) -> None:
+        super().__init__(*args, **kw)
+        self.reader = reader
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):  # type: ignore[override]
+        writer = super().get_bind(mapper, clause=clause, **kw)
+        if self.reader is None or self.info.get("use_writer"):
+            return writer
+        if self._flushing or not isinstance(clause, SelectBase):
+            self.info["use_writer"] = True
+            return writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _unstick(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("use_writer", None)
+
+
+def session_factory(target: Path | str | None = None) -> sessionmaker:
+    """Return the shared session factory for a SQLite path or a server URL."""
+    key = _key(target)
+    eng = engine_for(key)
+    with _registry_lock:
+        factory = _factories.get(key)
+    if factory is None:
+        factory = sessionmaker(
+            class_=RoutingSession,
+            bind=eng,
+            reader=reader_for(key),
+            expire_on_commit=False,
+            future=True,
+        )
+        with _registry_lock:
+            factory = _factories.setdefault(key, factory)
+    return factory
+
+
+def statement_cache_stats() -> dict[str, int]:
+    """Return hits, misses and size of the statement caches in the registry."""
+    stats = {"hits": 0, "misses": 0, "size": 0}
+    with _registry_lock:
+        engines = [*_engines.values(), *_readers.values()]
+    for eng in engines:
+        cache = eng.get_execution_options().get("compiled_cache")
+        if isinstance(cache, StatementCache):
+            stats["hits"] += cache.hits
+            stats["misses"] += cache.misses
+            stats["size"] += len(cache)
+    return stats
+
+
+def dispose_engines() -> None:
+    """Close every pooled connection and empty the registry."""
+    with _registry_lock:
+        for eng in (*_engines.values(), *_readers.values()):
+            eng.dispose()
+        _engines.clear()
+        _readers.clear()
+        _factories.clear()
+        _initialised.clear()
+
+
 DB_FILE = db_path()
-DB_FILE.parent.mkdir(parents=True, exist_ok=True)
-DB_FILE.touch(exist_ok=True)
-engine = create_engine(f"sqlite:///{DB_FILE}", future=True)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+# con ``database_url`` configurada no se crea ningún fichero SQLite
+if database_url():
+    engine = engine_for(database_url())
+else:
+    DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+    DB_FILE.touch(exist_ok=True)
+    engine = engine_for(DB_FILE)
+# ``SessionLocal`` siempre apunta al engine activo (ver ``set_engine``); el
+# lector se asigna allí, cuando el esquema ya existe
+SessionLocal = sessionmaker(
+    class_=RoutingSession, bind=engine, expire_on_commit=False, future=True
+)
 
 _engine: Engine | None = engine
 
 
-def set_engine(db_file: Path | None = None) -> None:
-    """Create and register a new engine bound to ``db_path``."""
+def set_engine(db_file: Path | str | None = None) -> None:
+    """Make the registry engine for *db_file* the active one.
+
+    *db_file* may be a SQLite path or a server URL; by default the
+    configured ``database_url`` is used, falling back to ``db_path()``.
+    """
     global _engine
 
-    path = db_file or db_path()
+    target = db_file or database_url() or db_path()
 
-    if not path.exists():
-        if LEGACY_DB.exists():
-            LEGACY_DB.rename(path)
-        else:
-            path.touch()
-            log(f"DB creada en {path}")
+    if not _is_url(target):
+        path = Path(target)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            if LEGACY_DB.exists():
+                LEGACY_DB.rename(path)
+            else:
+                path.touch()
+                log(f"DB creada en {path}")
 
-    _engine = create_engine(f"sqlite:///{path}", echo=False, future=True)
-    SessionLocal.configure(bind=_engine)
-    init_db(_engine)
+    _engine = engine_for(target)
+    # las migraciones abren sesiones: hasta terminar, todo va al escritor
+    SessionLocal.configure(bind=_engine, reader=None)
+    key = _key(target)
+    if key not in _initialised:
+        ensure_schema(_engine)
+        _initialised.add(key)
+    SessionLocal.configure(reader=reader_for(target))
 
 
 def get_engine() -> Engine:
@@ -59,6 +428,9 @@ def get_engine() -> Engine:
 def init_db(engine: Engine) -> None:
     """Create tables and apply idempotent migrations."""
     Base.metadata.create_all(engine)
+    if not is_sqlite(engine):
+        # los arreglos de columnas solo afectan a ficheros SQLite antiguos
+        return
 
     _create_examiner_tables(engine)
 
@@ -91,6 +463,8 @@ def run_migrations() -> None:
     existing_tables = set(inspector.get_table_names())
 
     for mig in MIGRATIONS:
+        if engine.dialect.name not in getattr(mig, "dialects", {engine.dialect.name}):
+            continue
         if mig.requires.issubset(existing_tables):
             try:
                 mig.run()
@@ -100,3 +474,115 @@ def run_migrations() -> None:
         else:
             missing = mig.requires - existing_tables
             log(f"Skipping {mig.__name__}: unmet deps {missing}")
+
+
+# -----------------------------------------------------------------------------
+# Ledger de esquema: una BD al día solo cuesta una consulta al arrancar
+# -----------------------------------------------------------------------------
+def _checksum(*objs: object) -> str:
+    """Hash the source of *objs* (bytecode when frozen without sources)."""
+    h = hashlib.sha256()
+    for obj in objs:
+        if isinstance(obj, str):
+            h.update(obj.encode())
+            continue
+        try:
+            h.update(getsource(obj).encode())
+        except (OSError, TypeError):
+            code = getattr(obj, "__code__", None) or obj.run.__code__
+            h.update(code.co_code)
+    return h.hexdigest()
+
+
+def _metadata_signature() -> str:
+    return ";".join(
+        f"{t.name}({','.join(c.name for c in t.columns)})"
+        for t in Base.metadata.sorted_tables
+    )
+
+
+def schema_steps() -> list[tuple[str, str, Callable[[Engine], None]]]:
+    """Return ``(step, checksum, upgrade)`` for every schema step in order."""
+    from .migrations import MIGRATIONS
+
+    steps: list[tuple[str, str, Callable[[Engine], None]]] = [
+        (
+            "init_db",
+            _checksum(init_db, _create_examiner_tables, _metadata_signature()),
+            init_db,
+        )
+    ]
+    for mig in MIGRATIONS:
+        # ``signature()`` lets a step depend on runtime declarations too
+        extra = mig.signature() if hasattr(mig, "signature") else ""
+        steps.append(
+            (
+                mig.__name__.rsplit(".", 1)[-1],
+                _checksum(mig, extra),
+                _migration_step(mig),
+            )
+        )
+    return steps
+
+
+class _StepSkipped(Exception):
+    """A migration's required tables are missing; retry on next start."""
+
+
+def _migration_step(mig) -> Callable[[Engine], None]:
+    def _run(engine: Engine) -> None:
+        # ``dialects`` opcional: p. ej. FTS5 o arreglos de ficheros SQLite;
+        # en otros motores el paso queda registrado sin hacer nada
+        if engine.dialect.name not in getattr(mig, "dialects", {engine.dialect.name}):
+            return
+        missing = mig.requires - set(inspect(engine).get_table_names())
+        if missing:
+            raise _StepSkipped(f"unmet deps {missing}")
+        mig.run()
+
+    return _run
+
+
+def _applied_steps(engine: Engine) -> dict[str, str]:
+    try:
+        with engine.connect() as con:
+            rows = con.exec_driver_sql("SELECT step, checksum FROM schema_version")
+            return {step: checksum for step, checksum in rows}
+    except (OperationalError, ProgrammingError):
+        return {}
+
+
+def ensure_schema(engine: Engine) -> None:
+    """Bring *engine*'s database up to date using the ``schema_version`` ledger.
+
+    Steps whose checksum is already recorded are skipped.  Legacy files
+    without a ledger run every idempotent step once and get recorded.
+    """
+    applied = _applied_steps(engine)
+    pending = [
+        step for step in schema_steps() if applied.get(step[0]) != step[1]
+    ]
+    if not pending:
+        return
+
+    ledger = SchemaVersion.__table__
+    for name, checksum, upgrade in pending:
+        try:
+            upgrade(engine)
+        except _StepSkipped as exc:
+            log(f"Skipping {name}: {exc}")
+            continue
+        except (OperationalError, ProgrammingError) as exc:
+            log(f"Schema step {name} failed: {exc}")
+            continue
+        with engine.begin() as con:
+            con.execute(ledger.delete().where(ledger.c.step == name))
+            con.execute(
+                ledger.insert().values(
+                    step=name,
+                    checksum=checksum,
+                    created_at=datetime.utcnow(),
+                    updated_at=datetime.utcnow(),
+                )
+            )
+        log(f"Schema step {name} applied")
@@ -1,14 +1,45 @@
 from __future__ import annotations
 
-from . import create_schema, add_section, unique_exam_question
+from . import (
+    create_schema,
+    add_section,
+    unique_exam_question,
+    hot_path_indexes,
+    spaced_repetition,
+    question_stats,
+    fts_search,
+    answer_masks,
+    meta_indexes,
+    tag_bitsets,
+    attempt_summary,
+    compress_text,
+    attempt_learner,
+    attempt_autoincrement,
+    lease_waiter,
+)
 
 # Each migration module exposes:
 #   requires: set[str]  -- tables needed
 #   provides: set[str]  -- tables created
 #   def run() -> None   -- perform migration
+# and optionally:
+#   dialects: set[str]  -- engines it applies to (default: all)
+#   def signature() -> str  -- extra input for the ledger checksum
 
 MIGRATIONS = (
     create_schema,      # provides base tables
     add_section,        # requires question
     unique_exam_question,  # add unique index to exam_question
+    hot_path_indexes,   # indexes for selectors, scoring and history
+    spaced_repetition,  # SM-2 columns and due-date index on question_stats
+    question_stats,     # backfill per-question counters
+    fts_search,         # FTS5 index over prompts, options, explanations
+    answer_masks,       # correct_mask / selected_mask backfill
+    meta_indexes,       # expression indexes for declared meta keys
+    tag_bitsets,        # precomputed question bitsets per tag
+    attempt_summary,    # denormalized counters for the history views
+    compress_text,      # zlib-compress long explanations (SQLite)
+    attempt_learner,    # learner column for cohort attempts
+    attempt_autoincrement,  # never reuse attempt ids (archive keeps them)
+    lease_waiter,       # writer_lease turn requests
 )
@@ -6,6 +6,7 @@ from examgen.core.database import get_engine
 
 requires: set[str] = {"question"}
 provides: set[str] = set()
+dialects: set[str] = {"sqlite"}
 
 
 def run() -> None:
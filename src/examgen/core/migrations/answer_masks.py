@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from examgen.core.database import get_engine
+from examgen.core.models import OPTION_LETTERS
+
+requires: set[str] = {"question", "answer_option", "attempt_question"}
+provides: set[str] = set()
+dialects: set[str] = {"sqlite"}
+
+CHUNK = 5000
+
+
+def _selected_mask_sql() -> str:
+    # instr() distingue mayúsculas (LIKE no): "a" no es la opción A,
+    # igual que en letters_to_mask()
+    terms = " + ".join(
+        f"CASE WHEN instr(selected_option, '{letter}') > 0 THEN {1 << i} ELSE 0 END"
+        for i, letter in enumerate(OPTION_LETTERS)
+    )
+    return (
+        f"UPDATE attempt_question SET selected_mask = {terms} "
+        "WHERE selected_option IS NOT NULL "
+        # también las rellenadas antes con LIKE, que contaba las minúsculas
+        "AND (selected_mask IS NULL OR selected_option GLOB '*[a-z]*')"
+    )
+
+
+def run() -> None:
+    """Add and backfill the answer bitmask columns."""
+    eng = get_engine()
+    with eng.begin() as conn:
+        q_cols = {
+            row[1] for row in conn.exec_driver_sql("PRAGMA table_info('question')")
+        }
+        if "correct_mask" not in q_cols:
+            conn.exec_driver_sql(
+                "ALTER TABLE question "
+                "ADD COLUMN correct_mask INTEGER NOT NULL DEFAULT 0"
+            )
+        aq_cols = {
+            row[1]
+            for row in conn.exec_driver_sql("PRAGMA table_info('attempt_question')")
+        }
+        if "selected_mask" not in aq_cols:
+            conn.exec_driver_sql(
+                "ALTER TABLE attempt_question ADD COLUMN selected_mask INTEGER"
+            )
+        conn.exec_driver_sql(_selected_mask_sql())
+
+    # correct_mask: las letras siguen el orden de las opciones (por id)
+    last_qid = 0
+    while True:
+        with eng.begin() as conn:
+            qids = [
+                row[0]
+                for row in conn.exec_driver_sql(
+                    "SELECT id FROM question WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_qid, CHUNK),
+                )
+            ]
+            if not qids:
+                break
+            rows = conn.exec_driver_sql(
+                "SELECT question_id, is_correct FROM answer_option "
+                "WHERE question_id BETWEEN ? AND ? ORDER BY question_id, id",
+                (qids[0], qids[-1]),
+            )
+            masks = dict.fromkeys(qids, 0)
+            pos: dict[int, int] = {}
+            for qid, is_correct in rows:
+                i = pos[qid] = pos.get(qid, -1) + 1
+                if is_correct and i < len(OPTION_LETTERS):
+                    masks[qid] |= 1 << i
+            conn.exec_driver_sql(
+                "UPDATE question SET correct_mask = ? WHERE id = ?",
+                [(mask, qid) for qid, mask in masks.items()],
+            )
+            last_qid = qids[-1]
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from examgen.core.database import get_engine
+from examgen.core.models import Attempt, AttemptQuestion
+from examgen.core.table_rebuild import rebuild_table
+
+requires: set[str] = {"attempt", "attempt_question"}
+provides: set[str] = set()
+dialects: set[str] = {"sqlite"}
+
+
+def _has_autoincrement(name: str) -> bool:
+    with get_engine().connect() as conn:
+        sql = conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,),
+        ).scalar()
+    return "AUTOINCREMENT" in (sql or "").upper()
+
+
+def run() -> None:
+    """Make attempt ids AUTOINCREMENT so archived ids are never reused."""
+    from examgen.core.services.archive import archive_connection, reserve_archived_ids
+
+    eng = get_engine()
+    for table in (Attempt.__table__, AttemptQuestion.__table__):
+        if not _has_autoincrement(table.name):
+            rebuild_table(eng, table)
+    with archive_connection() as conn:
+        if conn is not None:
+            reserve_archived_ids(conn)
+            conn.commit()
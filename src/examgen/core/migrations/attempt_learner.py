@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from sqlalchemy import inspect
+
+from examgen.core.database import get_engine
+
+requires: set[str] = {"attempt"}
+provides: set[str] = set()
+
+
+def run() -> None:
+    """Add ``attempt.learner`` (cohort attempts) and its index."""
+    eng = get_engine()
+    with eng.begin() as conn:
+        have = {c["name"] for c in inspect(conn).get_columns("attempt")}
+        if "learner" not in have:
+            conn.exec_driver_sql("ALTER TABLE attempt ADD COLUMN learner VARCHAR(200)")
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_attempt_learner ON attempt (learner)"
+        )
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from sqlalchemy import inspect, update
+
+from examgen.core.database import get_engine
+from examgen.core.models import Attempt, AttemptQuestion
+
+requires: set[str] = {"attempt", "attempt_question"}
+provides: set[str] = set()
+
+SUMMARY_COLUMNS = (
+    "question_count",
+    "answered_count",
+    "correct_count",
+    "duration_seconds",
+)
+
+
+def run() -> None:
+    """Add and backfill the attempt summary columns used by the history."""
+    from examgen.core.services.exam_service import attempt_summary_values
+
+    eng = get_engine()
+    at = Attempt.__table__
+    with eng.begin() as conn:
+        have = {c["name"] for c in inspect(conn).get_columns("attempt")}
+        for name in SUMMARY_COLUMNS:
+            if name in have:
+                continue
+            col = at.c[name]
+            ddl = col.type.compile(dialect=conn.dialect)
+            if not col.nullable:
+                ddl += " NOT NULL DEFAULT 0"
+            conn.exec_driver_sql(f"ALTER TABLE attempt ADD COLUMN {name} {ddl}")
+        conn.execute(
+            update(at).values(
+                **attempt_summary_values(at, AttemptQuestion.__table__)
+            )
+        )
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from sqlalchemy import LargeBinary, bindparam, cast, func, select, update
+
+from examgen.core.database import get_engine
+from examgen.core.migrations.fts_search import fts_ready, refresh_explanations
+from examgen.core.models import AnswerOption, CompressedText, Question
+
+requires: set[str] = {"question", "answer_option"}
+provides: set[str] = set()
+dialects: set[str] = {"sqlite"}
+
+# filas por transacción: el escritor se libera entre lotes
+CHUNK = 500
+
+
+def _columns():
+    for model in (Question, AnswerOption):
+        table = model.__table__
+        for col in table.columns:
+            if isinstance(col.type, CompressedText):
+                yield table, col
+
+
+def run() -> None:
+    """Compress the long texts still stored as plain ``TEXT``."""
+    eng = get_engine()
+    for table, col in _columns():
+        # pregunta dueña de cada fila, para reindexar sus explicaciones
+        owner = table.c.get("question_id", table.c.id)
+        last_id = 0
+        while True:
+            # typeof() = 'text': las filas ya comprimidas son BLOB
+            stmt = (
+                select(table.c.id, col, owner)
+                .where(
+                    table.c.id > last_id,
+                    func.typeof(col) == "text",
+                    func.length(cast(col, LargeBinary)) >= col.type.min_bytes,
+                )
+                .order_by(table.c.id)
+                .limit(CHUNK)
+            )
+            with eng.begin() as conn:
+                rows = conn.execute(stmt).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                # updated_at explícito: reescribir no es editar la pregunta
+                conn.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("rid"))
+                    .values(
+                        {
+                            col.name: bindparam("val", type_=col.type),
+                            "updated_at": table.c.updated_at,
+                        }
+                    ),
+                    [{"rid": rid, "val": text} for rid, text, _ in rows],
+                )
+                # los triggers FTS no leen el BLOB: sin esto se perdería
+                if col.name == "explanation" and fts_ready(conn):
+                    refresh_explanations(conn, (qid for *_, qid in rows))
@@ -1,15 +1,11 @@
 from __future__ import annotations
 
 import sqlalchemy as sa
-from sqlalchemy import (
-    Column,
-    ForeignKey,
-    Integer,
-    MetaData,
-    String,
-    Table,
-)
+from sqlalchemy import MetaData
+
 from examgen.core.database import get_engine
+from examgen.core.models import AttemptQuestion
+from examgen.core.table_rebuild import rebuild_table
 
 
 def run() -> None:
@@ -43,48 +39,14 @@ def run() -> None:
         print("FK ya es correcta; nada que migrar.")
         return
 
-    with eng.begin() as conn:
-        print("Migrando FK de attempt_question ...")
-        conn.exec_driver_sql(
-            "ALTER TABLE attempt_question RENAME TO attempt_question_old;"
-        )
-
-        meta2 = MetaData()
-        Table(
-            "attempt_question",
-            meta2,
-            Column("id", Integer, primary_key=True),
-            Column(
-                "attempt_id",
-                Integer,
-                ForeignKey("attempt.id", ondelete="CASCADE"),
-                nullable=False,
-            ),
-            Column(
-                "question_id",
-                Integer,
-                ForeignKey("question.id", ondelete="CASCADE"),
-                nullable=False,
-            ),
-            Column("selected_option", String, nullable=True),
-            Column("is_correct", Integer, nullable=True),
-            Column("score", Integer, nullable=True),
-            Column("created_at", String),
-            Column("updated_at", String),
-        )
-        meta2.create_all(conn)
-
-        conn.exec_driver_sql(
-            """
-            INSERT INTO attempt_question (id, attempt_id, question_id,
-                                          selected_option, is_correct, score,
-                                          created_at, updated_at)
-            SELECT id, attempt_id, question_id,
-                   selected_option, is_correct, score,
-                   created_at, updated_at
-            FROM attempt_question_old;
-            """
-        )
-
-        conn.exec_driver_sql("DROP TABLE attempt_question_old;")
-        print("Migración completada.")
+    print("Migrando FK de attempt_question ...")
+    # la definición actual del modelo ya apunta a attempt.id; la copia va
+    # por lotes y, si se interrumpe, se reanuda al volver a ejecutarla.
+    # Se conservan los ON DELETE CASCADE que creaba esta migración
+    rebuild_table(
+        eng,
+        AttemptQuestion.__table__,
+        progress=lambda done, total: print(f"\r{done}/{total} filas", end=""),
+        on_delete={"attempt_id": "CASCADE", "question_id": "CASCADE"},
+    )
+    print("\nMigración completada.")
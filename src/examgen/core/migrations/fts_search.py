@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy.engine import Connection
+
+from examgen.core.database import get_engine
+from examgen.core.models import decompress_text
+from examgen.utils.debug import log
+
+requires: set[str] = {"question", "answer_option"}
+provides: set[str] = {"question_fts"}
+dialects: set[str] = {"sqlite"}
+
+# texto agregado por pregunta: opciones y explicaciones (pregunta + opciones).
+# Los triggers solo usan SQL integrado para que cualquier cliente (sqlite3,
+# otras herramientas) pueda escribir: de las explicaciones ven las guardadas
+# como TEXT; las comprimidas (BLOB) las indexa refresh_explanations().
+_OPTIONS_SQL = (
+    "(SELECT group_concat(text, ' ') FROM answer_option "
+    "WHERE question_id = {qid})"
+)
+_PLAIN = "CASE WHEN typeof({col}) = 'text' THEN {col} END"
+_EXPL_SQL = (
+    "coalesce(" + _PLAIN.format(col="{expl}") + ", '') || ' ' || "
+    "coalesce((SELECT group_concat(" + _PLAIN.format(col="explanation") + ", ' ') "
+    "FROM answer_option WHERE question_id = {qid}), '')"
+)
+_COMPRESSED_IDS = (
+    "SELECT id FROM question WHERE typeof(explanation) = 'blob' "
+    "UNION SELECT question_id FROM answer_option WHERE typeof(explanation) = 'blob'"
+)
+# ids por consulta IN (...): lejos del límite de variables de SQLite
+CHUNK = 500
+_QUESTION_EXPL_SQL = "(SELECT explanation FROM question WHERE id = {qid})"
+
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5(
+    prompt, options, explanations, subject_id UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+
+def _refresh_sql(qid: str) -> str:
+    expl = _EXPL_SQL.format(qid=qid, expl=_QUESTION_EXPL_SQL.format(qid=qid))
+    return (
+        "UPDATE question_fts SET "
+        f"options = {_OPTIONS_SQL.format(qid=qid)}, "
+        f"explanations = {expl} "
+        f"WHERE rowid = {qid};"
+    )
+
+
+TRIGGERS: dict[str, str] = {
+    "question_fts_ai": f"""
+        AFTER INSERT ON question BEGIN
+            INSERT INTO question_fts (rowid, prompt, options, explanations, subject_id)
+            VALUES (
+                NEW.id,
+                NEW.prompt,
+                {_OPTIONS_SQL.format(qid="NEW.id")},
+                {_EXPL_SQL.format(qid="NEW.id", expl="NEW.explanation")},
+                NEW.subject_id
+            );
+        END""",
+    "question_fts_au": f"""
+        AFTER UPDATE OF prompt, explanation, subject_id ON question BEGIN
+            UPDATE question_fts SET
+                prompt = NEW.prompt,
+                explanations = {_EXPL_SQL.format(qid="NEW.id", expl="NEW.explanation")},
+                subject_id = NEW.subject_id
+            WHERE rowid = NEW.id;
+        END""",
+    "question_fts_ad": """
+        AFTER DELETE ON question BEGIN
+            DELETE FROM question_fts WHERE rowid = OLD.id;
+        END""",
+    "answer_option_fts_ai": f"""
+        AFTER INSERT ON answer_option BEGIN
+            {_refresh_sql("NEW.question_id")}
+        END""",
+    "answer_option_fts_au": f"""
+        AFTER UPDATE OF text, explanation, question_id ON answer_option BEGIN
+            {_refresh_sql("OLD.question_id")}
+            {_refresh_sql("NEW.question_id")}
+        END""",
+    "answer_option_fts_ad": f"""
+        AFTER DELETE ON answer_option BEGIN
+            {_refresh_sql("OLD.question_id")}
+        END""",
+}
+
+
+def fts5_available(conn: Connection) -> bool:
+    """Return True if the SQLite library was compiled with FTS5."""
+    opts = {row[0] for row in conn.exec_driver_sql("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in opts
+
+
+def fts_ready(conn: Connection) -> bool:
+    """Return True if ``question_fts`` exists on *conn*'s database."""
+    return bool(
+        conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'question_fts'"
+        ).first()
+    )
+
+
+def refresh_explanations(conn: Connection, qids: Iterable[int]) -> None:
+    """Index the explanations of *qids*, compressed ones included."""
+    ids = sorted(set(qids))
+    for i in range(0, len(ids), CHUNK):
+        chunk = tuple(ids[i : i + CHUNK])
+        marks = ", ".join("?" * len(chunk))
+        texts = {
+            qid: [decompress_text(expl) or ""]
+            for qid, expl in conn.exec_driver_sql(
+                f"SELECT id, explanation FROM question WHERE id IN ({marks})", chunk
+            )
+        }
+        for qid, expl in conn.exec_driver_sql(
+            "SELECT question_id, explanation FROM answer_option "
+            f"WHERE question_id IN ({marks}) AND explanation IS NOT NULL",
+            chunk,
+        ):
+            if qid in texts:
+                texts[qid].append(decompress_text(expl))
+        if texts:
+            conn.exec_driver_sql(
+                "UPDATE question_fts SET explanations = ? WHERE rowid = ?",
+                [(" ".join(parts), qid) for qid, parts in texts.items()],
+            )
+
+
+def rebuild(conn: Connection) -> None:
+    """Fill ``question_fts`` from scratch."""
+    conn.exec_driver_sql("DELETE FROM question_fts")
+    conn.exec_driver_sql(
+        "INSERT INTO question_fts (rowid, prompt, options, explanations, subject_id) "
+        f"SELECT q.id, q.prompt, {_OPTIONS_SQL.format(qid='q.id')}, "
+        f"{_EXPL_SQL.format(qid='q.id', expl='q.explanation')}, q.subject_id "
+        "FROM question q"
+    )
+    compressed = [row[0] for row in conn.exec_driver_sql(_COMPRESSED_IDS)]
+    refresh_explanations(conn, compressed)
+
+
+def run() -> None:
+    """Create the FTS5 index and the triggers that keep it in sync."""
+    eng = get_engine()
+    with eng.begin() as conn:
+        if not fts5_available(conn):
+            log("FTS5 no disponible: la búsqueda usará LIKE")
+            return
+        conn.exec_driver_sql(CREATE_TABLE)
+        for name, body in TRIGGERS.items():
+            # se recrean siempre: versiones anteriores llamaban a examgen_text()
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+            conn.exec_driver_sql(f"CREATE TRIGGER {name} {body}")
+        indexed = conn.exec_driver_sql("SELECT count(*) FROM question_fts").scalar()
+        total = conn.exec_driver_sql("SELECT count(*) FROM question").scalar()
+        if indexed != total:
+            rebuild(conn)
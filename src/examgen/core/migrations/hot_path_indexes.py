@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from sqlalchemy.sql import Executable
+from sqlalchemy.engine import Connection
+
+from examgen.core.database import get_engine
+from examgen.utils.debug import log
+
+requires: set[str] = {
+    "question",
+    "answer_option",
+    "subject",
+    "attempt",
+    "attempt_question",
+}
+provides: set[str] = set()
+
+# (index name, table, indexed columns / expression)
+# ``(question_id, is_correct)`` also serves lookups on ``question_id`` alone,
+# so no separate single-column index is created for it.
+INDEXES: tuple[tuple[str, str, str], ...] = (
+    (
+        "ix_attempt_question_question_correct",
+        "attempt_question",
+        "question_id, is_correct",
+    ),
+    ("ix_attempt_question_attempt_id", "attempt_question", "attempt_id"),
+    ("ix_answer_option_question_id", "answer_option", "question_id"),
+    ("ix_question_subject_id", "question", "subject_id"),
+    ("ix_attempt_started_at", "attempt", "started_at"),
+    # matches ``func.lower(Subject.name) == ...`` used by the services
+    ("ix_subject_name_lower", "subject", "lower(name)"),
+)
+
+
+def run() -> None:
+    """Create the indexes used by selectors, scoring and history queries."""
+    eng = get_engine()
+    with eng.begin() as conn:
+        for name, table, cols in INDEXES:
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"
+            )
+
+
+def full_scans(conn: Connection, stmt: Executable) -> list[str]:
+    """Return the ``EXPLAIN QUERY PLAN`` lines of *stmt* that scan a table."""
+    sql = str(
+        stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    )
+    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [
+        row[3]
+        for row in plan
+        if row[3].startswith("SCAN ") and " USING " not in row[3]
+    ]
+
+
+def verify() -> dict[str, list[str]]:
+    """Explain every selector query and report the ones doing full scans."""
+    from examgen.core.services import exam_service as svc
+    from examgen.core.services import meta_query, sampling
+
+    selectors: dict[str, Executable] = {
+        "count_by_subject": svc._count_by_subject_stmt("demo"),
+        "subject_ids": sampling._subject_ids_stmt("demo"),
+        "subject_pool": sampling._subject_pool_stmt(1),
+        "exam_pool": sampling._exam_pool_stmt(1),
+        "exam_attempts": sampling._exam_attempts_stmt(1),
+        "errors": svc._errors_stmt(1, 20),
+        **{
+            f"meta_{key}": meta_query.meta_filter_stmt({key: 1})
+            for key in meta_query.INDEXED_META_KEYS
+        },
+    }
+    eng = get_engine()
+    report: dict[str, list[str]] = {}
+    if eng.dialect.name != "sqlite":
+        log("verify() usa EXPLAIN QUERY PLAN: solo disponible en SQLite")
+        return report
+    with eng.connect() as conn:
+        for name, stmt in selectors.items():
+            scans = full_scans(conn, stmt)
+            if scans:
+                log(f"Selector {name}: full scan {scans}")
+            report[name] = scans
+    return report
+
+
+if __name__ == "__main__":
+    for sel, scans in verify().items():
+        print(f"{sel:24} {'OK' if not scans else '; '.join(scans)}")
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from sqlalchemy import inspect
+
+from examgen.core.database import get_engine
+from examgen.core.models import WriterLease
+
+requires: set[str] = {"writer_lease"}
+provides: set[str] = set()
+
+
+def run() -> None:
+    """Add ``writer_lease.waiter``/``waiter_at`` (turn requests)."""
+    eng = get_engine()
+    lease = WriterLease.__table__
+    with eng.begin() as conn:
+        have = {c["name"] for c in inspect(conn).get_columns("writer_lease")}
+        for name in ("waiter", "waiter_at"):
+            if name not in have:
+                ddl = lease.c[name].type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE writer_lease ADD COLUMN {name} {ddl}"
+                )
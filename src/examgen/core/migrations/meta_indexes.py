@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from examgen.core.database import get_engine
+from examgen.core.services.meta_query import INDEXED_META_KEYS, ensure_meta_indexes
+
+requires: set[str] = {"question"}
+provides: set[str] = set()
+
+
+def signature() -> str:
+    """Declared keys; the schema ledger reruns this step when they change."""
+    return ",".join(f"{k}:{t.__name__}" for k, t in sorted(INDEXED_META_KEYS.items()))
+
+
+def run() -> None:
+    """Create an expression index for every declared meta key."""
+    eng = get_engine()
+    with eng.begin() as conn:
+        ensure_meta_indexes(conn)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from examgen.core.database import get_engine
+
+requires: set[str] = {"question_stats", "attempt", "attempt_question"}
+provides: set[str] = set()
+
+
+def run() -> None:
+    """Fill ``question_stats`` once for databases created before it existed."""
+    from examgen.core.services.question_stats import rebuild_question_stats
+
+    eng = get_engine()
+    with eng.connect() as conn:
+        has_stats = conn.exec_driver_sql(
+            "SELECT 1 FROM question_stats LIMIT 1"
+        ).first()
+        has_scored = conn.exec_driver_sql(
+            "SELECT 1 FROM attempt WHERE score IS NOT NULL LIMIT 1"
+        ).first()
+    if has_scored and not has_stats:
+        rebuild_question_stats()
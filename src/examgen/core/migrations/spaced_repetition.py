@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from sqlalchemy import inspect
+
+from examgen.core.database import get_engine
+from examgen.core.models import QuestionStats
+
+requires: set[str] = {"question", "question_stats", "attempt", "attempt_question"}
+provides: set[str] = set()
+
+SM2_COLUMNS = ("subject_id", "ease", "interval_days", "repetitions", "due_at")
+
+
+def run() -> None:
+    """Add the SM-2 columns of ``question_stats`` and schedule past reviews."""
+    from examgen.core.services.question_stats import replay_reviews, sync_subjects
+
+    eng = get_engine()
+    st = QuestionStats.__table__
+    if eng.dialect.name == "postgresql":
+        # los ENUM nativos no admiten ADD VALUE dentro de una transacción
+        with eng.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+            conn.exec_driver_sql(
+                "ALTER TYPE selectortypeenum ADD VALUE IF NOT EXISTS 'REPASO'"
+            )
+    with eng.begin() as conn:
+        have = {c["name"] for c in inspect(conn).get_columns("question_stats")}
+        for name in SM2_COLUMNS:
+            if name in have:
+                continue
+            col = st.c[name]
+            ddl = col.type.compile(dialect=conn.dialect)
+            if not col.nullable:
+                ddl += f" NOT NULL DEFAULT {col.default.arg}"
+            conn.exec_driver_sql(f"ALTER TABLE question_stats ADD COLUMN {name} {ddl}")
+        for index in st.indexes:
+            index.create(conn, checkfirst=True)
+        sync_subjects(conn)
+        replay_reviews(conn)
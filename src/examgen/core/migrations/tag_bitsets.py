@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from examgen.core.database import get_engine
+
+requires: set[str] = {"tag", "question_tag"}
+provides: set[str] = set()
+
+
+def run() -> None:
+    """Compute the bitsets of tags that have none (e.g. rows added in SQL)."""
+    from examgen.core.services.tags import rebuild_bitsets
+
+    eng = get_engine()
+    with eng.begin() as conn:
+        stale = list(conn.exec_driver_sql("SELECT id FROM tag WHERE bitset IS NULL"))
+        if stale:
+            rebuild_bitsets(conn, [row[0] for row in stale])
@@ -4,6 +4,7 @@ from examgen.core.database import get_engine
 
 requires: set[str] = {"exam_question"}
 provides: set[str] = set()
+dialects: set[str] = {"sqlite"}
 
 
 def run() -> None:
@@ -12,25 +12,30 @@ import datetime as _dt
 from enum import Enum as _Enum
 from pathlib import Path
 from typing import List
+import zlib
 
 from sqlalchemy import (
     Boolean,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
+    TypeDecorator,
     UniqueConstraint,
-    create_engine,
     Enum as SQLAEnum,
+    event,
     inspect,
 )
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Dialect, Engine
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
+    Session,
     mapped_column,
     relationship,
 )
@@ -40,6 +45,54 @@ from examgen.config import DEFAULT_DB
 class SelectorTypeEnum(str, _Enum):
     ALEATORIO = "ALEATORIO"
     ERRORES = "ERRORES"
+    REPASO = "REPASO"  # repaso espaciado (SM-2), ver question_stats
+
+
+# -----------------------------------------------------------------------------
+# Texto comprimido
+# -----------------------------------------------------------------------------
+# prefijo de los valores comprimidos; un texto UTF-8 nunca empieza por \x00
+TEXT_MAGIC = b"\x00z1"
+COMPRESS_MIN_BYTES = 512
+
+
+def decompress_text(value: str | bytes | None) -> str | None:
+    """Return the text stored in *value*, compressed or not."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value)
+        if raw.startswith(TEXT_MAGIC):
+            raw = zlib.decompress(raw[len(TEXT_MAGIC):])
+        return raw.decode("utf-8")
+    return value
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed on SQLite once it reaches a size threshold.
+
+    Short values stay plain ``TEXT``; longer ones become a BLOB with the
+    :data:`TEXT_MAGIC` prefix.  Other engines compress large values on their
+    own (TOAST), so there the column is plain text.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def __init__(self, min_bytes: int = COMPRESS_MIN_BYTES) -> None:
+        super().__init__()
+        self.min_bytes = min_bytes
+
+    def process_bind_param(self, value: str | None, dialect: Dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        raw = value.encode("utf-8")
+        if len(raw) < self.min_bytes:
+            return value
+        packed = TEXT_MAGIC + zlib.compress(raw, 6)
+        # texto poco compresible: no compensa el coste de descomprimir
+        return packed if len(packed) < len(raw) * 0.9 else value
+
+    def process_result_value(self, value, dialect: Dialect) -> str | None:
+        return decompress_text(value)
 
 
 # -----------------------------------------------------------------------------
@@ -87,7 +140,8 @@ class Question(Base):
     __tablename__ = "question"
 
     prompt: Mapped[str] = mapped_column(Text(), nullable=False)
-    explanation: Mapped[str | None] = mapped_column(Text())
+    # textos largos: comprimidos y diferidos (solo se leen al mostrarlos)
+    explanation: Mapped[str | None] = mapped_column(CompressedText(), deferred=True)
     difficulty: Mapped[int] = mapped_column(Integer, default=0)  # 0‑5
 
     type: Mapped[str] = mapped_column(String(30), default="MCQ", nullable=False)
@@ -103,10 +157,26 @@ class Question(Base):
 
     option_e: Mapped[str | None] = mapped_column(Text())
     is_e_correct: Mapped[bool] = mapped_column(Boolean, default=False)
+    # bit i = opción i ("ABCDE") correcta; se recalcula al guardar opciones
+    correct_mask: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
 
     options: Mapped[List["AnswerOption"]] = relationship(
         back_populates="question", cascade="all, delete-orphan"
     )
+    stats: Mapped["QuestionStats | None"] = relationship(
+        back_populates="question", cascade="all, delete-orphan", uselist=False
+    )
+    archived_stats: Mapped["QuestionStatsArchive | None"] = relationship(
+        cascade="all, delete-orphan", uselist=False
+    )
+    # solo hashes; los ficheros viven en el almacén de media (lazy, nunca en
+    # los selectinload de preguntas)
+    media: Mapped[List["QuestionMedia"]] = relationship(
+        cascade="all, delete-orphan", order_by="QuestionMedia.position"
+    )
+    tags: Mapped[List["Tag"]] = relationship(
+        secondary="question_tag", back_populates="questions"
+    )
 
     __mapper_args__ = {"polymorphic_on": type, "polymorphic_identity": "BASE"}
 
@@ -128,8 +198,8 @@ class AnswerOption(Base):
     __tablename__ = "answer_option"
 
     text: Mapped[str] = mapped_column(Text(), nullable=False)
-    answer: Mapped[str | None] = mapped_column(Text())  # NUEVO
-    explanation: Mapped[str | None] = mapped_column(Text())  # NUEVO
+    answer: Mapped[str | None] = mapped_column(CompressedText(), deferred=True)
+    explanation: Mapped[str | None] = mapped_column(CompressedText(), deferred=True)
     is_correct: Mapped[bool] = mapped_column(Boolean, default=False)
 
     question_id: Mapped[int] = mapped_column(ForeignKey("question.id"), nullable=False)
@@ -161,6 +231,8 @@ class Exam(Base):
 
 class Attempt(Base):
     __tablename__ = "attempt"
+    # ids nunca reutilizados: el archivo guarda intentos con su id original
+    __table_args__ = {"sqlite_autoincrement": True}
 
     exam_id: Mapped[int | None] = mapped_column(ForeignKey("exam.id"), nullable=True)
     subject: Mapped[str] = mapped_column(String(200), nullable=False)
@@ -175,6 +247,15 @@ class Attempt(Base):
     )
     ended_at: Mapped[_dt.datetime | None] = mapped_column(DateTime(timezone=True))
     score: Mapped[int | None] = mapped_column(Integer)
+    # alumno al que se asignó el intento (cohortes); None = uso individual
+    learner: Mapped[str | None] = mapped_column(String(200), index=True)
+
+    # resumen desnormalizado para el historial (sin leer attempt_question);
+    # lo mantienen create_attempt / evaluate_attempts
+    question_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    answered_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    correct_count: Mapped[int | None] = mapped_column(Integer)
+    duration_seconds: Mapped[int | None] = mapped_column(Integer)
 
     exam: Mapped["Exam"] = relationship(back_populates="attempts")
     questions: Mapped[List["AttemptQuestion"]] = relationship(
@@ -184,10 +265,13 @@ class Attempt(Base):
 
 class AttemptQuestion(Base):
     __tablename__ = "attempt_question"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     attempt_id: Mapped[int] = mapped_column(ForeignKey("attempt.id"), nullable=False)
     question_id: Mapped[int] = mapped_column(ForeignKey("question.id"), nullable=False)
     selected_option: Mapped[str | None] = mapped_column(String(200))
+    # mismo formato que ``Question.correct_mask``; sigue a ``selected_option``
+    selected_mask: Mapped[int | None] = mapped_column(Integer)
     is_correct: Mapped[bool | None] = mapped_column(Boolean)
     score: Mapped[int | None] = mapped_column(Integer)
 
@@ -195,6 +279,176 @@ class AttemptQuestion(Base):
     question: Mapped[Question] = relationship()
 
 
+# -----------------------------------------------------------------------------
+# Máscaras de respuesta
+# -----------------------------------------------------------------------------
+OPTION_LETTERS = "ABCDE"
+
+
+def letters_to_mask(letters: str | None) -> int:
+    """Return the bitmask for a selection such as ``"AC"``."""
+    return sum(
+        1 << OPTION_LETTERS.index(c) for c in set(letters or "") if c in OPTION_LETTERS
+    )
+
+
+def options_mask(options: List["AnswerOption"]) -> int:
+    """Return the bitmask of the correct options, lettered in list order."""
+    return sum(
+        1 << i
+        for i, opt in enumerate(options[: len(OPTION_LETTERS)])
+        if opt.is_correct
+    )
+
+
+@event.listens_for(AttemptQuestion.selected_option, "set")
+def _sync_selected_mask(target: AttemptQuestion, value, _old, _initiator) -> None:
+    target.selected_mask = None if value is None else letters_to_mask(value)
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_correct_mask(session: Session, _ctx, _instances) -> None:
+    touched: set[Question] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Question):
+            touched.add(obj)
+        elif isinstance(obj, AnswerOption) and obj.question is not None:
+            touched.add(obj.question)
+    for q in touched:
+        if q in session.deleted:
+            continue
+        opts = [o for o in q.options if o not in session.deleted]
+        mask = options_mask(opts)
+        if q.correct_mask != mask:
+            q.correct_mask = mask
+
+
+class QuestionStats(Base):
+    """Per-question counters, updated each time an attempt is evaluated."""
+
+    __tablename__ = "question_stats"
+    # repaso: las k más vencidas son una lectura por rango solo de índice
+    __table_args__ = (
+        Index("ix_question_stats_subject_due", "subject_id", "due_at", "question_id"),
+    )
+
+    question_id: Mapped[int] = mapped_column(
+        ForeignKey("question.id"), unique=True, nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_seen_at: Mapped[_dt.datetime | None] = mapped_column(DateTime(timezone=True))
+    last_correct_at: Mapped[_dt.datetime | None] = mapped_column(
+        DateTime(timezone=True)
+    )
+
+    # estado SM-2; subject_id es copia de question.subject_id para el índice
+    subject_id: Mapped[int | None] = mapped_column(Integer)
+    ease: Mapped[float] = mapped_column(Float, default=2.5, nullable=False)
+    interval_days: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    repetitions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    due_at: Mapped[_dt.datetime | None] = mapped_column(DateTime(timezone=True))
+
+    question: Mapped[Question] = relationship(back_populates="stats")
+
+
+class MediaFile(Base):
+    """File in the content-addressed media store, named by its sha256."""
+
+    __tablename__ = "media"
+
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    mime: Mapped[str | None] = mapped_column(String(100))
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class QuestionMedia(Base):
+    """Reference from a question to a media file (images, attachments)."""
+
+    __tablename__ = "question_media"
+    __table_args__ = (UniqueConstraint("question_id", "sha256"),)
+
+    question_id: Mapped[int] = mapped_column(ForeignKey("question.id"), nullable=False)
+    sha256: Mapped[str] = mapped_column(ForeignKey("media.sha256"), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class Tag(Base):
+    """Free-form label; ``bitset`` caches the ids of its questions.
+
+    Bit *n* of the (zlib-compressed, little-endian) bitset is set when
+    question *n* carries the tag.  It is rewritten whenever ``question_tag``
+    changes through the ORM (see ``core.services.tags``).
+    """
+
+    __tablename__ = "tag"
+
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    bitset: Mapped[bytes | None] = mapped_column(LargeBinary)
+    question_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    questions: Mapped[List[Question]] = relationship(
+        secondary="question_tag", back_populates="tags"
+    )
+
+
+class QuestionTag(Base):
+    """Association between questions and tags."""
+
+    __tablename__ = "question_tag"
+    __table_args__ = (UniqueConstraint("question_id", "tag_id"),)
+
+    question_id: Mapped[int] = mapped_column(ForeignKey("question.id"), nullable=False)
+    tag_id: Mapped[int] = mapped_column(
+        ForeignKey("tag.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+
+
+class QuestionStatsArchive(Base):
+    """Counters of attempts moved to the archive database.
+
+    ``question_stats`` keeps including them; this table lets
+    ``rebuild_question_stats`` add them back after the rows are gone.
+    """
+
+    __tablename__ = "question_stats_archive"
+
+    question_id: Mapped[int] = mapped_column(
+        ForeignKey("question.id"), unique=True, nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_seen_at: Mapped[_dt.datetime | None] = mapped_column(DateTime(timezone=True))
+    last_correct_at: Mapped[_dt.datetime | None] = mapped_column(
+        DateTime(timezone=True)
+    )
+
+
+class WriterLease(Base):
+    """Single row naming the instance allowed to write (optional).
+
+    See ``core.services.write_coordinator``; ``expires_at`` is a Unix time.
+    """
+
+    __tablename__ = "writer_lease"
+
+    holder: Mapped[str | None] = mapped_column(String(200))
+    expires_at: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    # última instancia que pidió el turno (y cuándo): el titular solo cede
+    # su siguiente turno si alguien espera
+    waiter: Mapped[str | None] = mapped_column(String(200))
+    waiter_at: Mapped[float | None] = mapped_column(Float)
+
+
+class SchemaVersion(Base):
+    """Ledger of applied schema steps (see ``core.database.ensure_schema``)."""
+
+    __tablename__ = "schema_version"
+
+    step: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    checksum: Mapped[str] = mapped_column(String(64), nullable=False)
+
+
 def _migrate_attempt_subject_column(engine: Engine) -> None:
     """Add ``subject`` column to ``attempt`` table if missing."""
     with engine.begin() as con:
@@ -231,20 +485,14 @@ def _add_section(engine: Engine) -> None:
 
 def _make_attempt_exam_nullable(engine: Engine) -> None:
     """Drop NOT NULL constraint from ``attempt.exam_id`` if present."""
-    with engine.begin() as con:
+    from examgen.core.table_rebuild import rebuild_table
+
+    with engine.connect() as con:
         info = con.exec_driver_sql("PRAGMA table_info('attempt')").fetchall()
-        exam_col = next((row for row in info if row[1] == "exam_id"), None)
-        if exam_col and exam_col[3]:
-            Attempt.__table__.c.exam_id.nullable = True
-            cols = ", ".join(row[1] for row in info)
-            con.exec_driver_sql("PRAGMA foreign_keys = OFF")
-            con.exec_driver_sql("ALTER TABLE attempt RENAME TO attempt_old")
-            Attempt.__table__.create(bind=con)
-            con.exec_driver_sql(
-                f"INSERT INTO attempt ({cols}) SELECT {cols} FROM attempt_old"
-            )
-            con.exec_driver_sql("DROP TABLE attempt_old")
-            con.exec_driver_sql("PRAGMA foreign_keys = ON")
+    exam_col = next((row for row in info if row[1] == "exam_id"), None)
+    if exam_col and exam_col[3]:
+        # por lotes y reanudable: el historial puede ocupar varios GB
+        rebuild_table(engine, Attempt.__table__)
 
 
 def _create_examiner_tables(engine: Engine) -> None:
@@ -270,39 +518,17 @@ def _create_examiner_tables(engine: Engine) -> None:
 
 
 def get_engine(db_path: str | Path = DEFAULT_DB) -> Engine:
-    """Create an engine bound to ``db_path``."""
-    return create_engine(f"sqlite:///{db_path}", echo=False, future=True)
+    """Return the shared engine bound to ``db_path``."""
+    from examgen.core.database import engine_for
+
+    return engine_for(db_path)
 
 
 def init_db(db_path: str | Path = DEFAULT_DB) -> None:
     """Initialise database at ``db_path`` applying migrations."""
-    from examgen.core.database import set_engine, get_engine, init_db as _init
+    from examgen.core.database import set_engine
 
     set_engine(Path(db_path))
-    engine = get_engine()
-
-    _init(engine)
-
-    with engine.begin() as con:
-        con.exec_driver_sql("PRAGMA foreign_keys = ON")
-
-        existing_cols = {
-            tbl: {row[1] for row in con.exec_driver_sql(f"PRAGMA table_info({tbl})")}
-            for tbl in ("question", "answer_option")
-        }
-
-        # columna reference (texto) — solo si no existe ninguna variante
-        if (
-            "reference" not in existing_cols["question"]
-            and "reference_id" not in existing_cols["question"]
-        ):
-            con.exec_driver_sql("ALTER TABLE question ADD COLUMN reference TEXT")
-
-        # columnas nuevas en answer_option (por si no estaban)
-        for col_sql in ("answer TEXT", "explanation TEXT"):
-            col_name = col_sql.split()[0]
-            if col_name not in existing_cols["answer_option"]:
-                con.exec_driver_sql(f"ALTER TABLE answer_option ADD COLUMN {col_sql}")
 
     print(f"✔️  Database initialised / migrated at {db_path}")
 
@@ -0,0 +1,408 @@
+from __future__ import annotations
+
+"""Archive of old attempts in a sibling SQLite file.
+
+Attempts older than ``settings.archive_after_days`` are moved from the hot
+database to ``examgen_archive.db`` next to it, after folding their results
+into ``question_stats_archive``.  The archive is only ATTACHed while a
+history view or an analysis asks for it; the temp views ``attempt_all`` and
+``attempt_question_all`` then expose live and archived rows together.
+
+The archive is attached to a private connection, never to the writer's
+pooled one, and changes through it go through
+:func:`~examgen.core.services.write_coordinator.run_write`, so the GUI keeps
+writing while a large archive is copied.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    MetaData,
+    Select,
+    Table,
+    column,
+    func,
+    insert,
+    literal,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import TableClause
+from sqlalchemy.schema import CreateTable
+
+from examgen.config import db_path, settings
+from examgen.core import models as m
+from examgen.core.database import (
+    SessionLocal,
+    create_sqlite_private,
+    get_engine,
+    is_sqlite,
+)
+from examgen.core.services.exam_service import (
+    attempt_summary_values,
+    delete_attempts,
+)
+from examgen.core.services.question_stats import (
+    fold_archived,
+    rebuild_question_stats,
+)
+from examgen.core.services.write_coordinator import run_write
+from examgen.utils.debug import log
+
+SCHEMA = "archive"
+# antigüedad para archivar a mano cuando no hay archive_after_days
+DEFAULT_AFTER_DAYS = 365
+ARCHIVED_TABLES = ("attempt", "attempt_question")
+
+# (nombre, tabla, columnas) de los índices del fichero de archivo
+_INDEXES = (
+    ("ix_archive_attempt_started_at", "attempt", "started_at"),
+    ("ix_archive_attempt_question_attempt_id", "attempt_question", "attempt_id"),
+)
+
+
+@dataclass(slots=True)
+class ArchiveReport:
+    attempts: int
+    questions: int
+    path: Path
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    id: int
+    subject: str
+    started_at: datetime
+    ended_at: datetime | None
+    score: int | None
+    question_count: int
+    duration_seconds: int | None
+    archived: bool
+
+
+def archive_path(db_file: Path | None = None) -> Path:
+    """Return the archive file that belongs to *db_file*."""
+    path = db_file or db_path()
+    return path.with_name(f"{path.stem}_archive{path.suffix}")
+
+
+def _archive_table(name: str) -> Table:
+    # copia sin claves foráneas: question/exam no existen en el archivo
+    src = m.Base.metadata.tables[name]
+    return Table(
+        name,
+        MetaData(),
+        *(
+            Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+            for c in src.columns
+        ),
+        schema=SCHEMA,
+    )
+
+
+def _sync_schema(conn: Connection) -> None:
+    """Create the archive tables, adding columns the live schema gained."""
+    added: set[str] = set()
+    for name in ARCHIVED_TABLES:
+        tbl = _archive_table(name)
+        conn.execute(CreateTable(tbl, if_not_exists=True))
+        info = conn.exec_driver_sql(f"PRAGMA {SCHEMA}.table_info({name})")
+        have = {row[1] for row in info}
+        for col in tbl.columns:
+            if col.name not in have:
+                ddl = col.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {SCHEMA}.{name} ADD COLUMN {col.name} {ddl}"
+                )
+                added.add(f"{name}.{col.name}")
+    if "attempt.question_count" in added:
+        # archivo anterior al resumen de intentos: se calcula una vez aquí
+        at = _archive_table("attempt")
+        summary = attempt_summary_values(at, _archive_table("attempt_question"))
+        conn.execute(update(at).values(**summary))
+    for idx, name, cols in _INDEXES:
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {SCHEMA}.{idx} ON {name} ({cols})"
+        )
+
+
+def _create_views(conn: Connection) -> None:
+    for name in ARCHIVED_TABLES:
+        cols = ", ".join(c.name for c in m.Base.metadata.tables[name].columns)
+        conn.exec_driver_sql(
+            f"CREATE TEMP VIEW IF NOT EXISTS {name}_all AS "
+            f"SELECT {cols}, 0 AS archived FROM main.{name} "
+            f"UNION ALL SELECT {cols}, 1 AS archived FROM {SCHEMA}.{name}"
+        )
+
+
+def _attach(conn: Connection, path: Path) -> None:
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {SCHEMA}", (str(path),))
+    conn.exec_driver_sql(f"PRAGMA {SCHEMA}.journal_mode = WAL")
+    _sync_schema(conn)
+    _create_views(conn)
+    conn.commit()
+
+
+def _detach(conn: Connection) -> None:
+    conn.rollback()
+    for name in ARCHIVED_TABLES:
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS temp.{name}_all")
+    # _attach pudo fallar antes o después del ATTACH
+    attached = {row[1] for row in conn.exec_driver_sql("PRAGMA database_list")}
+    if SCHEMA in attached:
+        conn.exec_driver_sql(f"DETACH DATABASE {SCHEMA}")
+    conn.commit()
+
+
+@contextmanager
+def archive_connection(create: bool = False) -> Iterator[Connection | None]:
+    """Yield a connection with the archive attached and the union views.
+
+    The connection is private (not the writer's pooled one); writes on it
+    go through ``run_write(work, bind=conn)``.  Yields ``None`` when there
+    is no archive yet and *create* is false.
+    """
+    eng = get_engine()
+    if not is_sqlite(eng):
+        # ATTACH es propio de SQLite; en un servidor no hay archivo aparte
+        yield None
+        return
+    path = archive_path(Path(eng.url.database))
+    if not create and not path.exists():
+        yield None
+        return
+    private = create_sqlite_private(Path(eng.url.database))
+    try:
+        with private.connect() as conn:
+            try:
+                _attach(conn, path)
+                yield conn
+            finally:
+                _detach(conn)
+    finally:
+        private.dispose()
+
+
+class ArchiveCollision(RuntimeError):
+    """Some ids to archive already exist in the archive; nothing was moved."""
+
+    def __init__(self, table: str, ids: List[int]) -> None:
+        shown = ", ".join(map(str, ids[:10]))
+        super().__init__(f"{table}: ids ya archivados ({shown})")
+        self.table = table
+        self.ids = ids
+
+
+def _archivable_stmt(cutoff: datetime) -> Select:
+    return select(m.Attempt.id).where(m.Attempt.started_at < cutoff)
+
+
+def reserve_archived_ids(conn: Connection) -> None:
+    """Make new live ids start above every archived one.
+
+    ``attempt`` and ``attempt_question`` are AUTOINCREMENT tables, so
+    ``sqlite_sequence`` never goes back; raising it past the archive's
+    maximum keeps ids unique across both files.  Needs the archive attached.
+    """
+    for name in ARCHIVED_TABLES:
+        top = conn.execute(select(func.max(_archive_table(name).c.id))).scalar()
+        if top is None:
+            continue
+        updated = conn.exec_driver_sql(
+            "UPDATE main.sqlite_sequence SET seq = max(seq, ?) WHERE name = ?",
+            (top, name),
+        ).rowcount
+        if not updated:
+            conn.exec_driver_sql(
+                "INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)",
+                (name, top),
+            )
+
+
+def _collisions(conn: Connection, name: str, ids: Select) -> List[int]:
+    arch = _archive_table(name)
+    return list(conn.scalars(select(arch.c.id).where(arch.c.id.in_(ids)).limit(10)))
+
+
+def archive_old_attempts(older_than_days: int | None = None) -> ArchiveReport:
+    """Move attempts started more than *older_than_days* ago to the archive.
+
+    Defaults to ``settings.archive_after_days``; ``None`` there disables it.
+    Raises :class:`ArchiveCollision`, moving nothing, if an id to archive is
+    already in the archive.
+    """
+    days = older_than_days
+    if days is None:
+        days = settings.archive_after_days
+    eng = get_engine()
+    path = archive_path(Path(eng.url.database or ""))
+    if days is None or not is_sqlite(eng):
+        return ArchiveReport(0, 0, path)
+
+    ids = _archivable_stmt(datetime.utcnow() - timedelta(days=days))
+    with SessionLocal() as s:
+        if s.execute(ids.limit(1)).first() is None:
+            return ArchiveReport(0, 0, path)
+
+    def _move(session: Session) -> tuple[int, int]:
+        conn = session.connection()
+        aq_ids = select(m.AttemptQuestion.id).where(
+            m.AttemptQuestion.attempt_id.in_(ids)
+        )
+        for name, sel in (("attempt", ids), ("attempt_question", aq_ids)):
+            clash = _collisions(conn, name, sel)
+            if clash:
+                raise ArchiveCollision(name, clash)
+        n_attempts = conn.scalar(select(func.count()).select_from(ids.subquery()))
+        n_questions = conn.scalar(
+            select(func.count()).select_from(aq_ids.subquery())
+        )
+        fold_archived(conn, ids)
+        # todo en una transacción: si algo falla no se borra nada
+        for name, sel in (("attempt", ids), ("attempt_question", aq_ids)):
+            src = m.Base.metadata.tables[name]
+            conn.execute(
+                insert(_archive_table(name)).from_select(
+                    [c.name for c in src.columns],
+                    select(src).where(src.c.id.in_(sel)),
+                )
+            )
+        # solo se borra lo que está en el archivo
+        aq_table = m.AttemptQuestion.__table__
+        conn.execute(
+            aq_table.delete().where(
+                aq_table.c.id.in_(aq_ids),
+                aq_table.c.id.in_(select(_archive_table("attempt_question").c.id)),
+            )
+        )
+        at_table = m.Attempt.__table__
+        conn.execute(
+            at_table.delete().where(
+                at_table.c.id.in_(ids),
+                at_table.c.id.in_(select(_archive_table("attempt").c.id)),
+            )
+        )
+        reserve_archived_ids(conn)
+        return int(n_attempts or 0), int(n_questions or 0)
+
+    with archive_connection(create=True) as conn:
+        n_attempts, n_questions = run_write(_move, bind=conn)
+
+    log(f"Archivados {n_attempts} intentos ({n_questions} preguntas) en {path}")
+    return ArchiveReport(n_attempts, n_questions, path)
+
+
+def _history_stmt(attempts, archived) -> Select:
+    # solo columnas de attempt: el resumen evita leer attempt_question
+    return select(
+        attempts.c.id,
+        attempts.c.subject,
+        attempts.c.started_at,
+        attempts.c.ended_at,
+        attempts.c.score,
+        attempts.c.question_count,
+        attempts.c.duration_seconds,
+        archived,
+    ).order_by(attempts.c.started_at.desc())
+
+
+def _view(name: str) -> TableClause:
+    # las vistas no tienen tipos: se toman de la tabla original
+    src = m.Base.metadata.tables[name]
+    return table(
+        f"{name}_all",
+        *(column(c.name, c.type) for c in src.columns),
+        column("archived", Boolean),
+    )
+
+
+def history(include_archived: bool = False) -> List[HistoryEntry]:
+    """Return one row per attempt, newest first."""
+    if include_archived:
+        with archive_connection() as conn:
+            if conn is not None:
+                attempts = _view("attempt")
+                stmt = _history_stmt(attempts, attempts.c.archived)
+                return [HistoryEntry(*row) for row in conn.execute(stmt)]
+    stmt = _history_stmt(m.Attempt.__table__, literal(False))
+    with SessionLocal() as s:
+        return [HistoryEntry(*row) for row in s.execute(stmt)]
+
+
+def load_archived_attempt(attempt_id: int) -> m.Attempt | None:
+    """Build a detached :class:`Attempt` (with questions) from the archive."""
+    with archive_connection() as conn:
+        if conn is None:
+            return None
+        at = _archive_table("attempt")
+        aq = _archive_table("attempt_question")
+        row = conn.execute(select(at).where(at.c.id == attempt_id)).first()
+        if row is None:
+            return None
+        aq_rows = conn.execute(
+            select(aq).where(aq.c.attempt_id == attempt_id).order_by(aq.c.id)
+        ).all()
+
+    attempt = m.Attempt(**row._asdict())
+    with SessionLocal() as s:
+        questions = {
+            q.id: q
+            for q in s.scalars(
+                select(m.Question).where(
+                    m.Question.id.in_({r.question_id for r in aq_rows})
+                )
+            )
+        }
+        for q in questions.values():
+            q.options  # cargar antes de cerrar la sesión
+    for r in aq_rows:
+        item = m.AttemptQuestion(**r._asdict())
+        item.question = questions.get(r.question_id) or m.MCQQuestion(
+            prompt="(pregunta eliminada)"
+        )
+        attempt.questions.append(item)
+    return attempt
+
+
+def clear_archive() -> None:
+    """Delete every archived attempt and its folded statistics."""
+
+    def _clear(session: Session) -> None:
+        session.execute(text(f"DELETE FROM {SCHEMA}.attempt_question"))
+        session.execute(text(f"DELETE FROM {SCHEMA}.attempt"))
+        session.execute(m.QuestionStatsArchive.__table__.delete())
+
+    with archive_connection() as conn:
+        if conn is not None:
+            run_write(_clear, bind=conn)
+
+
+def clear_history() -> int:
+    """Delete every attempt, live and archived, and reset the statistics.
+
+    Returns the number of live attempts deleted.  Asks the maintenance
+    thread to reclaim the freed pages.
+    """
+    from examgen.core.services.maintenance import scheduler
+
+    deleted = delete_attempts()
+    clear_archive()
+    rebuild_question_stats()
+    scheduler.request("incremental_vacuum", "analyze", "optimize")
+    return deleted
+
+
+if __name__ == "__main__":
+    rep = archive_old_attempts()
+    print(f"{rep.attempts} attempts ({rep.questions} questions) -> {rep.path}")
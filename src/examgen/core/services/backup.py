@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+"""Online backups of the SQLite database.
+
+Copies are made with the ``sqlite3`` backup API on a private read-only
+connection.  With WAL that connection holds a single read transaction, so
+the GUI and the writer keep working while a large file is copied and their
+commits do not restart the copy.  Without WAL (``journal_mode=DELETE`` in
+shared folders) such a transaction would block every writer until the copy
+ends, so the file is copied in steps that release the lock in between; a
+commit from another connection then restarts the copy.
+:class:`BackupJob` runs it off the GUI thread.  Each copy
+is written to a ``.part`` file, checked with ``quick_check`` and only then
+renamed, and the oldest copies beyond ``settings.backup_keep`` are deleted.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Callable, List
+
+from examgen.config import settings
+from examgen.core.database import dispose_engines, get_engine, is_sqlite, set_engine
+from examgen.core.services import sampling
+from examgen.utils.debug import jlog
+
+# (páginas copiadas, páginas totales)
+ProgressFn = Callable[[int, int], None]
+
+_STAMP = "%Y%m%d-%H%M%S"
+
+
+class BackupCancelled(Exception):
+    """The backup was cancelled before it finished."""
+
+
+@dataclass(slots=True)
+class BackupResult:
+    path: Path
+    pages: int
+    size: int
+    seconds: float
+
+
+def _db_file() -> Path:
+    eng = get_engine()
+    if not is_sqlite(eng):
+        raise RuntimeError("Backups need a SQLite database; use the server's tools")
+    return Path(eng.url.database)
+
+
+def backup_folder() -> Path:
+    """Return the folder holding the backups of the active database."""
+    if settings.backup_folder:
+        return Path(settings.backup_folder)
+    return _db_file().parent / "backups"
+
+
+def list_backups() -> List[Path]:
+    """Return the backups of the active database, newest first."""
+    folder = backup_folder()
+    if not folder.exists():
+        return []
+    return sorted(folder.glob(f"{_db_file().stem}-*.db"), reverse=True)
+
+
+def rotate_backups(keep: int | None = None) -> List[Path]:
+    """Delete all but the *keep* newest backups; return the deleted paths."""
+    keep = settings.backup_keep if keep is None else keep
+    old = list_backups()[max(keep, 0):]
+    for path in old:
+        path.unlink(missing_ok=True)
+    return old
+
+
+def _quick_check(path: Path) -> None:
+    con = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    try:
+        rows = [row[0] for row in con.execute("PRAGMA quick_check")]
+    finally:
+        con.close()
+    if rows != ["ok"]:
+        raise RuntimeError(f"{path.name}: " + "; ".join(rows[:10]))
+
+
+def _copy(
+    src: Path,
+    dst: Path,
+    progress: ProgressFn | None,
+    cancel: threading.Event | None,
+    pages: int,
+) -> int:
+    """Copy *src* into *dst* with the backup API; return the page count."""
+    total = 0
+
+    def _step(_status: int, remaining: int, count: int) -> None:
+        nonlocal total
+        total = count
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled()
+        if progress is not None:
+            progress(count - remaining, count)
+
+    source = sqlite3.connect(
+        f"{src.as_uri()}?mode=ro", uri=True, isolation_level=None
+    )
+    target = sqlite3.connect(dst)
+    try:
+        # con WAL, una única transacción de lectura en el origen: la copia es
+        # una instantánea fija y las escrituras de otras conexiones no la
+        # reinician; los pasos solo sirven para el progreso y para cancelar.
+        # Sin WAL esa transacción bloquearía a los escritores toda la copia:
+        # se copia por pasos sueltos y el API reinicia si alguien escribe
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, progress=_step, sleep=0)
+    finally:
+        target.close()
+        source.close()
+    return total
+
+
+def backup_database(
+    dest: Path | None = None,
+    progress: ProgressFn | None = None,
+    cancel: threading.Event | None = None,
+    pages: int | None = None,
+) -> BackupResult:
+    """Copy the live database to *dest* (default: a new rotated backup).
+
+    Safe while the application is writing: the copy always reflects a
+    single committed state (the one at the start with WAL, the last one
+    without it).  Raises :class:`BackupCancelled` if *cancel*
+    is set, leaving no partial file behind.
+    """
+    src = _db_file()
+    t0 = time.perf_counter()
+    rotated = dest is None
+    if dest is None:
+        dest = backup_folder() / f"{src.stem}-{datetime.now().strftime(_STAMP)}.db"
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(dest.name + ".part")
+    part.unlink(missing_ok=True)
+    try:
+        n_pages = _copy(
+            src, part, progress, cancel, pages or settings.backup_pages_per_step
+        )
+        _quick_check(part)
+        os.replace(part, dest)  # atómico: nunca queda una copia a medias
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    if rotated:
+        rotate_backups()
+    res = BackupResult(dest, n_pages, dest.stat().st_size, time.perf_counter() - t0)
+    jlog(
+        "backup",
+        path=str(res.path),
+        pages=res.pages,
+        bytes=res.size,
+        ms=int(res.seconds * 1000),
+    )
+    return res
+
+
+def restore_backup(path: Path, progress: ProgressFn | None = None) -> BackupResult:
+    """Replace the live database with the backup at *path*.
+
+    A copy of the current state is taken first.  Pooled connections are
+    closed and the schema is brought up to date again afterwards, so older
+    backups are migrated on restore.
+    """
+    path = Path(path)
+    _quick_check(path)
+    live = _db_file()
+    stamp = datetime.now().strftime(_STAMP)
+    # mismo patrón que las copias rotadas: entra en la rotación por fecha
+    safety = backup_database(backup_folder() / f"{live.stem}-{stamp}-prerestore.db")
+    dispose_engines()
+    sampling.invalidate()
+    try:
+        # el API de backup sustituye el contenido de forma transaccional
+        _copy(path, live, progress, None, settings.backup_pages_per_step)
+    finally:
+        set_engine(live)
+    jlog("restore", path=str(path), safety=str(safety.path))
+    return safety
+
+
+class BackupJob:
+    """Run :func:`backup_database` on a daemon thread.
+
+    Callbacks run on that thread; GUI code must forward them through a
+    queued signal.
+    """
+
+    def __init__(
+        self,
+        progress: ProgressFn | None = None,
+        done: Callable[[BackupResult | None, BaseException | None], None]
+        | None = None,
+    ) -> None:
+        self.progress = progress
+        self.done = done
+        self.result: BackupResult | None = None
+        self.error: BaseException | None = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="examgen-backup", daemon=True
+        )
+
+    def start(self) -> "BackupJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self) -> None:
+        try:
+            self.result = backup_database(progress=self.progress, cancel=self._cancel)
+        except BaseException as exc:  # noqa: BLE001 - se entrega a done()
+            self.error = exc
+        if self.done is not None:
+            self.done(self.result, self.error)
+
+
+if __name__ == "__main__":
+    res = backup_database(
+        progress=lambda done, total: print(f"\r{done}/{total} pages", end="")
+    )
+    print(f"\n{res.path} ({res.size / 1024:.0f} KiB, {res.seconds:.2f} s)")
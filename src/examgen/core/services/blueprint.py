@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+"""Stratified sampling of attempts from a blueprint.
+
+A :class:`Blueprint` asks for coverage that plain uniform sampling cannot
+guarantee: a minimum number of questions per section and a difficulty mix
+("at least 3 per section, 30/50/20").  The pool is split once into strata
+keyed by ``(section, difficulty)`` and cached with the sampling pools; each
+draw then only decides how many ids to take from every stratum and samples
+them with :func:`random.sample`, so a paper costs O(k) plus the number of
+strata.
+
+Per draw:
+
+1. difficulty quotas are fixed by largest remainder over the mix weights;
+2. section minimums are met first, with a small max-flow over
+   sections × difficulty levels (so no minimum consumes a quota another
+   section needed);
+3. the remaining slots of each difficulty are spread over its strata with
+   an alias table weighted by stratum size, i.e. uniformly over questions.
+
+Blueprints that cannot be met raise :class:`BlueprintError`, listing every
+reason found.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+import random
+from typing import Collection, Generic, Hashable, List, Mapping, Sequence, TypeVar
+
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from examgen.core import models as m
+from examgen.core.services import sampling
+
+K = TypeVar("K", bound=Hashable)
+# (sección, dificultad); dificultad None = la mezcla no importa
+Stratum = tuple[str | None, int | None]
+
+NO_SECTION = "(sin sección)"
+
+
+@dataclass(slots=True)
+class Blueprint:
+    """Coverage an attempt must have; the size is ``num_questions``."""
+
+    # mínimo para cada sección con preguntas en el pool
+    min_per_section: int = 0
+    # mínimos por sección concretos (prevalecen sobre min_per_section)
+    sections: dict[str, int] = field(default_factory=dict)
+    # pesos por nivel de dificultad, p. ej. {1: 30, 2: 50, 3: 20}
+    difficulty_mix: dict[int, float] = field(default_factory=dict)
+
+
+class BlueprintError(ValueError):
+    """The blueprint cannot be met by the available questions."""
+
+    def __init__(self, problems: Sequence[str]) -> None:
+        super().__init__("Distribución imposible: " + "; ".join(problems))
+        self.problems = list(problems)
+
+
+class AliasTable(Generic[K]):
+    """Walker's alias method: O(n) setup, O(1) weighted draws."""
+
+    __slots__ = ("keys", "prob", "alias")
+
+    def __init__(self, weights: Mapping[K, float]) -> None:
+        self.keys = [key for key, w in weights.items() if w > 0]
+        n = len(self.keys)
+        total = sum(weights[key] for key in self.keys)
+        scaled = [weights[key] * n / total for key in self.keys] if n else []
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # lo que quede (errores de redondeo) tiene probabilidad 1
+
+    def draw(self, rng: random.Random) -> K:
+        i = rng.randrange(len(self.keys))
+        return self.keys[i if rng.random() < self.prob[i] else self.alias[i]]
+
+
+# -----------------------------------------------------------------------------
+# Estratos precalculados (cacheados con los pools de sampling)
+# -----------------------------------------------------------------------------
+def _subject_strata_stmt(subject_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.Question.id, m.Question.section, m.Question.difficulty)
+        .where(m.Question.subject_id == subject_id)
+        .order_by(m.Question.id)
+    )
+
+
+def _exam_strata_stmt(exam_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.Question.id, m.Question.section, m.Question.difficulty)
+        .join(m.ExamQuestion, m.ExamQuestion.question_id == m.Question.id)
+        .where(m.ExamQuestion.exam_id == exam_id)
+        .order_by(m.Question.id)
+    )
+
+
+def _group(rows) -> dict[tuple[str | None, int], list[int]]:
+    strata: dict[tuple[str | None, int], list[int]] = defaultdict(list)
+    for qid, section, difficulty in rows:
+        strata[(section or None, difficulty or 0)].append(qid)
+    return dict(strata)
+
+
+def subject_strata(
+    session: Session, subject_id: int
+) -> dict[tuple[str | None, int], list[int]]:
+    """Return the cached question ids of a subject by (section, difficulty)."""
+    return sampling.cached(
+        session,
+        ("strata", "subject", subject_id),
+        lambda: _group(session.execute(_subject_strata_stmt(subject_id))),
+    )
+
+
+def exam_strata(
+    session: Session, exam_id: int
+) -> dict[tuple[str | None, int], list[int]]:
+    """Return the cached question ids of an exam by (section, difficulty)."""
+    return sampling.cached(
+        session,
+        ("strata", "exam", exam_id),
+        lambda: _group(session.execute(_exam_strata_stmt(exam_id))),
+    )
+
+
+# -----------------------------------------------------------------------------
+# Reparto
+# -----------------------------------------------------------------------------
+def _quotas(k: int, mix: Mapping[int, float]) -> dict[int, int]:
+    """Split *k* by the weights of *mix* with the largest-remainder method."""
+    total = sum(mix.values())
+    exact = {level: k * w / total for level, w in mix.items()}
+    quotas = {level: int(x) for level, x in exact.items()}
+    rest = k - sum(quotas.values())
+    by_fraction = sorted(exact, key=lambda lv: (quotas[lv] - exact[lv], lv))
+    for level in by_fraction[:rest]:
+        quotas[level] += 1
+    return quotas
+
+
+def _label(section: str | None) -> str:
+    return section if section is not None else NO_SECTION
+
+
+def _cover(
+    need: dict[str | None, int],
+    cap: dict[int | None, int],
+    size: Mapping[Stratum, int],
+    rng: random.Random,
+) -> tuple[dict[Stratum, int], dict[str | None, int]]:
+    """Max-flow sections → difficulty levels meeting the section minimums.
+
+    Returns the count taken from every stratum and the shortfall of each
+    section that could not reach its minimum.
+    """
+    flow: dict[Stratum, int] = defaultdict(int)
+    used: dict[int | None, int] = defaultdict(int)
+    levels: dict[str | None, list[int | None]] = defaultdict(list)
+    for section, level in size:
+        levels[section].append(level)
+    for section in levels:
+        rng.shuffle(levels[section])
+    # asignación de una unidad cada vez: el grafo es diminuto
+    got: dict[str | None, int] = defaultdict(int)
+
+    def augment(section: str | None, seen: set[int | None]) -> bool:
+        for level in levels[section]:
+            if level in seen or flow[(section, level)] >= size[(section, level)]:
+                continue
+            seen.add(level)
+            if used[level] < cap[level]:
+                used[level] += 1
+                flow[(section, level)] += 1
+                return True
+            # nivel lleno: desplazar una unidad de otra sección a otro nivel
+            for (other, lv), n in list(flow.items()):
+                if lv == level and n and other != section and augment(other, seen):
+                    flow[(other, level)] -= 1
+                    flow[(section, level)] += 1
+                    return True
+        return False
+
+    short: dict[str | None, int] = {}
+    for section, n in need.items():
+        while got[section] < n and augment(section, set()):
+            got[section] += 1
+        if got[section] < n:
+            short[section] = n - got[section]
+    return {key: n for key, n in flow.items() if n}, short
+
+
+class BlueprintSampler:
+    """Draw papers meeting a :class:`Blueprint` from precomputed strata.
+
+    The constructor checks the blueprint against the pool and raises
+    :class:`BlueprintError`; :meth:`draw` is then cheap and can be called
+    once per learner.
+    """
+
+    def __init__(
+        self,
+        strata: Mapping[tuple[str | None, int], Sequence[int]],
+        blueprint: Blueprint,
+        k: int,
+        only: Collection[int] | None = None,
+    ) -> None:
+        mix = {lv: w for lv, w in blueprint.difficulty_mix.items() if w}
+        problems: list[str] = []
+        bad = sorted(lv for lv, w in mix.items() if w < 0 or not 0 <= lv <= 5)
+        if bad:
+            problems.append(f"pesos de dificultad no válidos para {bad}")
+            mix = {}
+
+        cells: dict[Stratum, list[int]] = defaultdict(list)
+        sections: set[str | None] = set()
+        for (section, level), ids in strata.items():
+            if only is not None:
+                ids = [qid for qid in ids if qid in only]
+            if ids:
+                sections.add(section)
+            if ids and (not mix or level in mix):
+                cells[(section, level if mix else None)].extend(ids)
+        self.cells = dict(cells)
+        self.k = k
+        self.size = {key: len(ids) for key, ids in self.cells.items()}
+
+        sec_size: dict[str | None, int] = defaultdict(int)
+        lvl_size: dict[int | None, int] = defaultdict(int)
+        for (section, level), n in self.size.items():
+            sec_size[section] += n
+            lvl_size[level] += n
+        self.cap: dict[int | None, int] = _quotas(k, mix) if mix else {None: k}
+        self.need: dict[str | None, int] = {
+            s: blueprint.min_per_section for s in sections if s is not None
+        }
+        self.need.update(blueprint.sections)
+        self.need = {s: n for s, n in self.need.items() if n > 0}
+
+        available = sum(self.size.values())
+        if k > available:
+            what = "con esa mezcla de dificultad" if mix else "en el pool"
+            problems.append(f"se piden {k} preguntas y hay {available} {what}")
+        if sum(self.need.values()) > k:
+            problems.append(
+                f"los mínimos por sección suman {sum(self.need.values())} "
+                f"y el examen tiene {k} preguntas"
+            )
+        for section, n in sorted(self.need.items(), key=lambda kv: _label(kv[0])):
+            have = sec_size.get(section, 0)
+            if have < n:
+                where = " con esa mezcla de dificultad" if mix else ""
+                problems.append(
+                    f"la sección {_label(section)!r} necesita {n} y tiene {have}"
+                    + where
+                )
+        for level, n in sorted(self.cap.items(), key=lambda kv: kv[0] or 0):
+            if level is not None and lvl_size.get(level, 0) < n:
+                problems.append(
+                    f"la dificultad {level} necesita {n} y hay {lvl_size.get(level, 0)}"
+                )
+        if not problems:
+            _flow, short = _cover(self.need, self.cap, self.size, random.Random(0))
+            for section, n in short.items():
+                problems.append(
+                    f"la sección {_label(section)!r} se queda {n} por debajo de su "
+                    "mínimo sin romper la mezcla de dificultad"
+                )
+        if problems:
+            raise BlueprintError(problems)
+
+        self.tables: dict[int | None, AliasTable[Stratum]] = {}
+        for level in self.cap:
+            self.tables[level] = AliasTable(
+                {key: n for key, n in self.size.items() if key[1] == level}
+            )
+
+    def draw(self, rng: random.Random | None = None) -> List[int]:
+        """Return the ids of one paper (grouped by stratum)."""
+        rng = rng or random.Random()
+        counts, _short = _cover(self.need, self.cap, self.size, rng)
+        counts = defaultdict(int, counts)
+        for level, quota in self.cap.items():
+            left = quota - sum(n for (_s, lv), n in counts.items() if lv == level)
+            table = self.tables[level]
+            misses = 0
+            while left > 0 and misses < 4 * left + 16:
+                key = table.draw(rng)
+                if counts[key] < self.size[key]:
+                    counts[key] += 1
+                    left -= 1
+                else:
+                    misses += 1
+            # estratos casi agotados: se completa con lo que quede
+            for key in table.keys:
+                take = min(left, self.size[key] - counts[key])
+                counts[key] += take
+                left -= take
+        ids: List[int] = []
+        for key, n in counts.items():
+            if n:
+                ids.extend(sampling.sample_ids(self.cells[key], n, rng))
+        return ids
+
+
+def sampler_for(
+    session: Session,
+    blueprint: Blueprint,
+    k: int,
+    exam_id: int = 0,
+    subject: str = "",
+    only: Collection[int] | None = None,
+) -> BlueprintSampler:
+    """Build the sampler for an exam's pool, or a subject's when *exam_id* is 0.
+
+    *only* restricts the pool (e.g. a tag expression's result).
+    """
+    if exam_id:
+        strata = exam_strata(session, exam_id)
+    else:
+        strata = defaultdict(list)
+        for subject_id in sampling.subject_ids(session, subject):
+            for key, ids in subject_strata(session, subject_id).items():
+                strata[key].extend(ids)
+    return BlueprintSampler(strata, blueprint, k, only)
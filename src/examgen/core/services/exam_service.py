@@ -2,14 +2,37 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
 import random
-
-from sqlalchemy import select, func
+import time
+from typing import Callable, List, Sequence
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Table,
+    and_,
+    case,
+    func,
+    insert,
+    lambda_stmt,
+    select,
+    update,
+)
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session, selectinload, with_polymorphic
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
 from examgen.core import models as m
-from examgen.core.database import SessionLocal
+from examgen.core.database import SessionLocal, statement_cache_stats
+from examgen.core.services import sampling, tags
+from examgen.core.services.blueprint import Blueprint, sampler_for
+from examgen.core.services.question_stats import (
+    record_attempts,
+    refresh_question_stats,
+)
+from examgen.core.services.write_coordinator import run_write
+from examgen.utils.debug import jlog
 
 
 @dataclass(slots=True)
@@ -21,6 +44,10 @@ class ExamConfig:
     num_questions: int | None
     error_threshold: int | None
     time_limit: int
+    # p. ej. "tema1 OR tema2 AND NOT repaso"; None = sin filtro
+    tag_expr: str | None = None
+    # cobertura por sección y dificultad; sustituye al selector
+    blueprint: Blueprint | None = None
 
 
 class NotEnoughQuestionsError(Exception):
@@ -34,104 +61,119 @@ class NotEnoughQuestionsError(Exception):
 def count_questions_by_subject(subject: str) -> int:
     """Return how many questions exist for a subject name."""
     with SessionLocal() as s:
-        count = s.scalar(
-            select(func.count(m.Question.id))
-            .join(m.Subject, m.Subject.id == m.Question.subject_id)
-            .where(func.lower(m.Subject.name) == subject.lower())
-        )
+        count = s.scalar(_count_by_subject_stmt(subject))
         return int(count or 0)
 
 
-def _select_random(
-    session: Session, exam_id: int, limit: int, subject_id: int | None = None
-) -> List[m.Question]:
-    attempts_sub = (
-        select(
-            m.AttemptQuestion.question_id,
-            func.count(m.AttemptQuestion.id).label("attempts_count"),
-        )
-        .group_by(m.AttemptQuestion.question_id)
-        .subquery()
+def _count_by_subject_stmt(subject: str) -> StatementLambdaElement:
+    lowered = subject.lower()
+    return lambda_stmt(
+        lambda: select(func.count(m.Question.id))
+        .join(m.Subject, m.Subject.id == m.Question.subject_id)
+        .where(func.lower(m.Subject.name) == lowered)
     )
-    stmt = (
-        select(m.Question)
-        .distinct(m.Question.id)
-        .join(m.ExamQuestion, m.ExamQuestion.question_id == m.Question.id)
-        .outerjoin(attempts_sub, attempts_sub.c.question_id == m.Question.id)
-        .filter(m.ExamQuestion.exam_id == exam_id)
-        .order_by(func.coalesce(attempts_sub.c.attempts_count, 0).asc(), func.random())
-        .limit(limit)
-    )
-    questions = list(session.scalars(stmt))
-    if not questions and subject_id is not None:
-        questions = (
-            session.query(m.Question)
-            .filter(m.Question.subject_id == subject_id)
-            .order_by(func.random())
-            .limit(limit)
-            .all()
-        )
-    return questions
 
 
-def _select_by_errors(
-    session: Session, exam_id: int, limit: int, subject_id: int | None = None
+def _select_random(
+    session: Session,
+    exam_id: int,
+    limit: int,
+    subject_id: int | None = None,
+    only: Sequence[int] | None = None,
 ) -> List[m.Question]:
-    error_sub = (
-        select(
-            m.AttemptQuestion.question_id,
-            func.count(m.AttemptQuestion.id).label("errors_count"),
-        )
-        .where(m.AttemptQuestion.is_correct.is_(False))
-        .group_by(m.AttemptQuestion.question_id)
-        .subquery()
-    )
-    attempts_sub = (
-        select(
-            m.AttemptQuestion.question_id,
-            func.count(m.AttemptQuestion.id).label("attempts_count"),
-        )
-        .group_by(m.AttemptQuestion.question_id)
-        .subquery()
-    )
-    stmt = (
-        select(
+    allowed = None if only is None else set(only)
+    ids = sampling.sample_least_attempted(session, exam_id, limit, only=allowed)
+    if not ids and only is not None:
+        ids = sampling.sample_ids(only, limit)
+    elif not ids and subject_id is not None:
+        ids = sampling.sample_ids(sampling.subject_pool(session, subject_id), limit)
+    return sampling.fetch_questions(session, ids)
+
+
+def _errors_stmt(
+    exam_id: int, limit: int, only: Sequence[int] | None = None
+) -> StatementLambdaElement:
+    # (exam_id, question_id) es único y question_stats tiene una fila por
+    # pregunta: el join no duplica filas, no hace falta DISTINCT (ON)
+    stmt = lambda_stmt(
+        lambda: select(
             m.Question,
-            func.coalesce(error_sub.c.errors_count, 0).label("errors"),
-            func.coalesce(attempts_sub.c.attempts_count, 0).label("attempts"),
+            func.coalesce(m.QuestionStats.errors, 0).label("errors"),
+            func.coalesce(m.QuestionStats.attempts, 0).label("attempts"),
         )
-        .distinct(m.Question.id)
         .join(m.ExamQuestion, m.ExamQuestion.question_id == m.Question.id)
-        .outerjoin(error_sub, error_sub.c.question_id == m.Question.id)
-        .outerjoin(attempts_sub, attempts_sub.c.question_id == m.Question.id)
+        .outerjoin(m.QuestionStats, m.QuestionStats.question_id == m.Question.id)
         .filter(m.ExamQuestion.exam_id == exam_id)
         .order_by(
-            func.coalesce(error_sub.c.errors_count, 0).desc(),
-            func.coalesce(attempts_sub.c.attempts_count, 0).asc(),
+            func.coalesce(m.QuestionStats.errors, 0).desc(),
+            func.coalesce(m.QuestionStats.attempts, 0).asc(),
         )
         .limit(limit)
     )
-    results = session.execute(stmt).all()
+    if only is not None:
+        ids = list(only)
+        stmt += lambda s: s.where(m.Question.id.in_(ids))
+    return stmt
+
+
+def _select_by_errors(
+    session: Session,
+    exam_id: int,
+    limit: int,
+    subject_id: int | None = None,
+    only: Sequence[int] | None = None,
+) -> List[m.Question]:
+    results = session.execute(_errors_stmt(exam_id, limit, only)).all()
     if not results or all(row.errors == 0 for row in results):
-        return _select_random(session, exam_id, limit, subject_id)
+        return _select_random(session, exam_id, limit, subject_id, only)
     return [row.Question for row in results]
 
 
+def _tag_filtered_ids(session: Session, config: ExamConfig) -> List[int] | None:
+    """Ids allowed by ``config.tag_expr`` (``None`` when there is none).
+
+    The universe is the subject's pool for free exams and the exam's pool
+    otherwise, so ``NOT tag`` means "the rest of that pool".
+    """
+    if not (config.tag_expr and config.tag_expr.strip()):
+        return None
+    if config.exam_id == 0:
+        universe = tags.subject_bits_by_name(session, config.subject)
+    else:
+        universe = tags.exam_bits(session, config.exam_id)
+    return tags.from_bits(tags.evaluate(session, config.tag_expr, universe))
+
+
 def create_attempt(config: ExamConfig) -> m.Attempt:
     """Persist a new Attempt with its questions."""
     with SessionLocal() as session:
-        available = count_questions_by_subject(config.subject)
+        only = _tag_filtered_ids(session, config)
+        if only is None:
+            available = count_questions_by_subject(config.subject)
+        else:
+            available = len(only)
         if config.num_questions and config.num_questions > available:
             raise NotEnoughQuestionsError(available)
-        if config.exam_id == 0:
-            stmt = (
-                session.query(m.Question)
-                .join(m.Subject, m.Question.subject_id == m.Subject.id)
-                .filter(func.lower(m.Subject.name) == config.subject.lower())
-                .order_by(func.random())
-                .limit(config.num_questions or 0)
+        if config.blueprint is not None:
+            draw = _blueprint_draw(session, config, config.blueprint, only)
+            questions = sampling.fetch_questions(session, draw(random.Random()))
+            if not questions:
+                raise ValueError(f'No hay preguntas para la materia "{config.subject}"')
+        elif config.selector_type is m.SelectorTypeEnum.REPASO:
+            draw = _review_draw(session, config, only)
+            questions = sampling.fetch_questions(session, draw(random.Random()))
+            if not questions:
+                raise ValueError(f'No hay preguntas para la materia "{config.subject}"')
+        elif config.exam_id == 0:
+            questions = sampling.sample_questions(
+                session,
+                (
+                    sampling.subject_pool_by_name(session, config.subject)
+                    if only is None
+                    else only
+                ),
+                config.num_questions or 0,
             )
-            questions = stmt.all()
             if not questions:
                 raise ValueError(f'No hay preguntas para la materia "{config.subject}"')
         else:
@@ -141,21 +183,19 @@ def create_attempt(config: ExamConfig) -> m.Attempt:
                     config.exam_id,
                     config.num_questions or 0,
                     config.subject_id,
+                    only,
                 )
             else:
                 threshold = config.error_threshold or 0
                 questions = _select_by_errors(
-                    session, config.exam_id, threshold, config.subject_id
+                    session, config.exam_id, threshold, config.subject_id, only
                 )
 
-            if not questions:
-                questions = (
-                    session.query(m.Question)
-                    .join(m.Subject, m.Question.subject_id == m.Subject.id)
-                    .filter(func.lower(m.Subject.name) == config.subject.lower())
-                    .order_by(func.random())
-                    .limit(config.num_questions or 0)
-                    .all()
+            if not questions and only is None:
+                questions = sampling.sample_questions(
+                    session,
+                    sampling.subject_pool_by_name(session, config.subject),
+                    config.num_questions or 0,
                 )
 
             if not questions:
@@ -173,6 +213,8 @@ def create_attempt(config: ExamConfig) -> m.Attempt:
             error_threshold=config.error_threshold,
             time_limit=config.time_limit,
             started_at=datetime.utcnow(),
+            question_count=len(questions),
+            answered_count=0,
         )
         session.add(attempt)
 
@@ -195,63 +237,356 @@ def create_attempt(config: ExamConfig) -> m.Attempt:
         )
 
         session.expunge_all()
+        jlog(
+            "create_attempt",
+            attempt_id=attempt.id,
+            questions=len(attempt.questions),
+            stmt_cache=statement_cache_stats(),
+        )
         return attempt
 
 
-def _compute_score(attempt: m.Attempt) -> int:
-    """Calculate score and update AttemptQuestion entries."""
-    total = 0
-    for aq in attempt.questions:
-        opts = list(zip("ABCDE", aq.question.options))
-        correct_set = {
-            letter for letter, opt in opts if getattr(opt, "is_correct", False)
+Draw = Callable[[random.Random], List[int]]
+
+
+def _blueprint_draw(
+    session: Session, config: ExamConfig, blueprint: Blueprint, only: List[int] | None
+) -> Draw:
+    """Stratified draw for *blueprint*; raises BlueprintError."""
+    sampler = sampler_for(
+        session,
+        blueprint,
+        config.num_questions or 0,
+        exam_id=config.exam_id,
+        subject=config.subject,
+        only=None if only is None else set(only),
+    )
+    return sampler.draw
+
+
+def _review_draw(session: Session, config: ExamConfig, only: List[int] | None) -> Draw:
+    """Spaced-repetition selector (``REPASO``).
+
+    Takes the most overdue questions first, then questions never reviewed
+    (drawn at random) and, if still short, those due soonest.  Due dates
+    are read in index order, never aggregated over the history.
+    """
+    k = config.num_questions or 0
+    now = datetime.utcnow()
+    if config.exam_id == 0:
+        subjects = sampling.subject_ids(session, config.subject)
+        pool = sampling.subject_pool_by_name(session, config.subject)
+        allowed = None if only is None else set(only)
+    else:
+        subjects = sampling.exam_subject_ids(session, config.exam_id)
+        pool = sampling.exam_pool(session, config.exam_id)
+        allowed = set(pool) if only is None else set(pool).intersection(only)
+    if allowed is not None:
+        pool = [qid for qid in pool if qid in allowed]
+    due = sampling.most_due(session, subjects, k, now, only=allowed)
+    new = sampling.unscheduled(session, subjects, pool) if len(due) < k else []
+    later = sampling.most_due(
+        session, subjects, k - len(due) - len(new), now, overdue=False, only=allowed
+    )
+
+    def draw(rng: random.Random) -> List[int]:
+        fresh = sampling.sample_ids(new, k - len(due), rng)
+        return due + fresh + later[: k - len(due) - len(fresh)]
+
+    return draw
+
+
+def _cohort_draw(session: Session, config: ExamConfig, only: List[int] | None) -> Draw:
+    """Load the candidates once; return a function drawing one paper.
+
+    Mirrors the selectors of :func:`create_attempt` and their fallbacks.
+    """
+    k = config.num_questions or 0
+    fallback = k
+    if config.blueprint is not None:
+        return _blueprint_draw(session, config, config.blueprint, only)
+    if config.selector_type is m.SelectorTypeEnum.REPASO:
+        return _review_draw(session, config, only)
+    if config.exam_id == 0:
+        pool = sampling.subject_pool_by_name(session, config.subject)
+        pool = pool if only is None else only
+        return lambda rng: sampling.sample_ids(pool, k, rng)
+    if config.selector_type is m.SelectorTypeEnum.ERRORES:
+        fallback = config.error_threshold or 0
+        # todas las del examen: el orden por errores es determinista y con
+        # el corte de create_attempt todos recibirían las mismas
+        limit = len(sampling.exam_pool(session, config.exam_id)) if fallback else 0
+        rows = session.execute(_errors_stmt(config.exam_id, limit, only)).all()
+        if rows and any(row.errors for row in rows):
+            failed = [row.Question.id for row in rows if row.errors]
+            rest = [row.Question.id for row in rows if not row.errors]
+
+            def draw(rng: random.Random) -> List[int]:
+                # cada alumno sortea entre las falladas; si no llegan, se
+                # completa como en create_attempt (menos intentadas primero)
+                ids = sampling.sample_ids(failed, fallback, rng)
+                return ids + rest[: fallback - len(ids)]
+
+            return draw
+    buckets = sampling.attempt_buckets(session, config.exam_id, only)
+    if any(buckets.values()):
+        return lambda rng: sampling.draw_least_attempted(buckets, fallback, rng)
+    if only is not None:
+        return lambda rng: sampling.sample_ids(only, fallback, rng)
+    if config.subject_id is not None:
+        pool = sampling.subject_pool(session, config.subject_id)
+        if pool:
+            return lambda rng: sampling.sample_ids(pool, fallback, rng)
+    pool = sampling.subject_pool_by_name(session, config.subject)
+    return lambda rng: sampling.sample_ids(pool, k, rng)
+
+
+def create_cohort_attempts(
+    config: ExamConfig,
+    learners: Sequence[str],
+    seed: int | str | None = None,
+) -> List[int]:
+    """Create one attempt per learner; return their ids in *learners* order.
+
+    The candidates are loaded once and each paper is drawn with a
+    ``Random`` seeded from *seed* and the learner, so the same call yields
+    the same papers.  All rows are inserted with executemany in a single
+    transaction.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    t0 = time.perf_counter()
+    with SessionLocal() as session:
+        only = _tag_filtered_ids(session, config)
+        available = (
+            count_questions_by_subject(config.subject) if only is None else len(only)
+        )
+        if config.num_questions and config.num_questions > available:
+            raise NotEnoughQuestionsError(available)
+        draw = _cohort_draw(session, config, only)
+
+    papers: List[List[int]] = []
+    for learner in learners:
+        rng = random.Random(f"{seed}:{learner}")
+        ids = list(dict.fromkeys(draw(rng)))
+        if not ids:
+            raise ValueError(f'No hay preguntas para la materia "{config.subject}"')
+        rng.shuffle(ids)
+        papers.append(ids)
+
+    now = datetime.utcnow()
+    attempt_rows = [
+        {
+            "exam_id": config.exam_id or None,
+            "subject": config.subject,
+            "selector_type": config.selector_type,
+            "num_questions": config.num_questions,
+            "error_threshold": config.error_threshold,
+            "time_limit": config.time_limit,
+            "started_at": now,
+            "learner": learner,
+            "question_count": len(ids),
+            "answered_count": 0,
         }
-        sel = aq.selected_option or ""
-        if len(correct_set) == 1:
-            aq.is_correct = sel in correct_set
-        else:
-            aq.is_correct = set(sel) == correct_set
-        aq.score = 1 if aq.is_correct else 0
-        total += aq.score
+        for learner, ids in zip(learners, papers)
+    ]
+
+    def _insert(session: Session) -> List[int]:
+        attempt_ids = list(
+            session.scalars(
+                insert(m.Attempt).returning(
+                    m.Attempt.id, sort_by_parameter_order=True
+                ),
+                attempt_rows,
+            )
+        )
+        session.execute(
+            insert(m.AttemptQuestion),
+            [
+                {"attempt_id": aid, "question_id": qid}
+                for aid, ids in zip(attempt_ids, papers)
+                for qid in ids
+            ],
+        )
+        return attempt_ids
+
+    attempt_ids = run_write(_insert) if attempt_rows else []
+    jlog(
+        "create_cohort",
+        attempts=len(attempt_ids),
+        questions=sum(map(len, papers)),
+        seed=str(seed),
+        ms=int((time.perf_counter() - t0) * 1000),
+    )
+    return attempt_ids
 
-    if attempt.ended_at is None:
-        attempt.ended_at = datetime.utcnow()
 
-    return total
+class SecondsBetween(FunctionElement):
+    """Whole seconds from ``start`` to ``end`` (two datetime columns)."""
+
+    name = "seconds_between"
+    inherit_cache = True
+    type = Integer()
+
+
+@compiles(SecondsBetween)
+def _compile_seconds_sqlite(element: SecondsBetween, compiler, **kw) -> str:
+    end, start = (compiler.process(c, **kw) for c in element.clauses)
+    return (
+        f"CAST(round((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+    )
+
+
+@compiles(SecondsBetween, "postgresql")
+def _compile_seconds_pg(element: SecondsBetween, compiler, **kw) -> str:
+    end, start = (compiler.process(c, **kw) for c in element.clauses)
+    return f"CAST(round(EXTRACT(EPOCH FROM ({end} - {start}))) AS INTEGER)"
+
+
+def attempt_summary_values(attempts: Table, questions: Table, ended_at=None) -> dict:
+    """Correlated expressions for the summary columns of ``attempt``.
+
+    Works on the live tables and on their archive copies.  *ended_at*
+    overrides ``attempts.ended_at`` (evaluation sets both at once);
+    ``correct_count`` is only filled for scored attempts.
+    """
+    def _count(*where) -> ColumnElement:
+        return (
+            select(func.count())
+            .where(questions.c.attempt_id == attempts.c.id, *where)
+            .scalar_subquery()
+        )
+
+    ended_at = attempts.c.ended_at if ended_at is None else ended_at
+    return {
+        "question_count": _count(),
+        "answered_count": _count(func.coalesce(questions.c.selected_mask, 0) != 0),
+        "correct_count": case(
+            (attempts.c.score.is_(None), None),
+            else_=_count(questions.c.is_correct.is_(True)),
+        ),
+        "duration_seconds": SecondsBetween(ended_at, attempts.c.started_at),
+    }
+
+
+def is_answer_correct(selected_mask: int | None, correct_mask: int) -> bool:
+    """Scoring rule of :func:`evaluate_attempts` for a single answer.
+
+    An unanswered question never counts, even one without correct options.
+    """
+    return bool(selected_mask) and selected_mask == correct_mask
+
+
+def _evaluate_stmts(attempt_ids: Sequence[int], now: datetime) -> list:
+    """UPDATEs that score *attempt_ids* entirely inside the database."""
+    aq = m.AttemptQuestion
+    at = m.Attempt
+    correct_mask = (
+        select(m.Question.correct_mask)
+        .where(m.Question.id == aq.question_id)
+        .scalar_subquery()
+    )
+    # sin respuesta nunca cuenta como acierto (= is_answer_correct)
+    is_ok = and_(
+        func.coalesce(aq.selected_mask, 0) != 0, aq.selected_mask == correct_mask
+    )
+    total = (
+        select(func.count(aq.id))
+        .where(aq.attempt_id == at.id, aq.is_correct.is_(True))
+        .scalar_subquery()
+    )
+    ended_at = func.coalesce(at.ended_at, now)
+    summary = attempt_summary_values(at.__table__, aq.__table__, ended_at=ended_at)
+    # SET usa los valores previos de la fila: correct_count = total, no score
+    summary["correct_count"] = total
+    return [
+        update(aq)
+        .where(aq.attempt_id.in_(attempt_ids))
+        .values(is_correct=is_ok, score=case((is_ok, 1), else_=0)),
+        update(at)
+        .where(at.id.in_(attempt_ids))
+        .values(score=total, ended_at=ended_at, **summary),
+    ]
+
+
+def evaluate_attempts(session: Session, attempt_ids: Sequence[int]) -> list[int]:
+    """Score several attempts at once with set-based UPDATEs.
+
+    Statistics are only added for attempts evaluated for the first time.
+    Returns the ids that existed; the caller commits.
+    """
+    ids = list(dict.fromkeys(attempt_ids))
+    if not ids:
+        return []
+    rows = session.execute(
+        select(m.Attempt.id, m.Attempt.score).where(m.Attempt.id.in_(ids))
+    ).all()
+    first_eval = [aid for aid, score in rows if score is None]
+    for stmt in _evaluate_stmts(ids, datetime.utcnow()):
+        session.execute(stmt, execution_options={"synchronize_session": False})
+    record_attempts(session, first_eval)
+    return [aid for aid, _ in rows]
 
 
 def evaluate_attempt(attempt_id: int) -> m.Attempt:
     """Evaluate an attempt and store the score."""
+    # varios puestos terminan a la vez: reintenta si la BD está ocupada
+    if not run_write(lambda s: evaluate_attempts(s, [attempt_id])):
+        raise ValueError("Attempt not found")
     with SessionLocal() as s:
-        attempt = (
-            s.query(m.Attempt)
-            .options(selectinload(m.Attempt.questions))
-            .get(attempt_id)
+        return s.get(
+            m.Attempt,
+            attempt_id,
+            options=[selectinload(m.Attempt.questions)],
         )
-        if not attempt:
-            raise ValueError("Attempt not found")
-
-        correct = 0
-        for aq in attempt.questions:
-            q = aq.question
-            correct_set = {l for l, opt in zip("ABCDE", q.options) if opt.is_correct}
-            if aq.selected_option:
-                if len(correct_set) == 1:
-                    aq.is_correct = aq.selected_option in correct_set
-                else:
-                    aq.is_correct = set(aq.selected_option) == correct_set
-            else:
-                aq.is_correct = False
-            if aq.is_correct:
-                correct += 1
 
-        attempt.score = correct
-        if attempt.ended_at is None:
-            attempt.ended_at = datetime.utcnow()
 
-        s.commit()
-        s.refresh(attempt)
-        return attempt
+def delete_attempts(attempt_ids: Sequence[int] | None = None) -> int:
+    """Delete attempts (all when *attempt_ids* is None); return how many.
+
+    Their evaluated rows are taken out of ``question_stats`` in the same
+    transaction, so the selectors stop using deleted history.
+    """
+    at = m.Attempt.__table__
+    aq = m.AttemptQuestion.__table__
+
+    def _delete(session: Session) -> int:
+        ids = select(at.c.id)
+        if attempt_ids is not None:
+            ids = ids.where(at.c.id.in_(list(attempt_ids)))
+        touched = list(
+            session.scalars(
+                select(aq.c.question_id)
+                .join(at, at.c.id == aq.c.attempt_id)
+                .where(at.c.id.in_(ids), at.c.score.is_not(None))
+                .distinct()
+            )
+        )
+        session.execute(aq.delete().where(aq.c.attempt_id.in_(ids)))
+        deleted = session.execute(at.delete().where(at.c.id.in_(ids))).rowcount
+        refresh_question_stats(session, touched)
+        return deleted
+
+    deleted = run_write(_delete)
+    jlog("delete_attempts", attempts=deleted)
+    return deleted
+
+
+def question_explanations(question_id: int) -> tuple[str | None, dict[int, str | None]]:
+    """Return the explanation of a question and ``{option id: explanation}``.
+
+    The explanation columns are deferred, so attempts load without them;
+    the exam views call this for the question on screen only.
+    """
+    opt = m.AnswerOption
+    with SessionLocal() as s:
+        expl = s.scalar(
+            select(m.Question.explanation).where(m.Question.id == question_id)
+        )
+        rows = s.execute(
+            select(opt.id, opt.explanation).where(opt.question_id == question_id)
+        )
+        return expl, {oid: text for oid, text in rows}
 
 
 if __name__ == "__main__":
@@ -265,9 +600,19 @@ if __name__ == "__main__":
         time_limit=10,
     )
     att = create_attempt(cfg)
-    for aq in att.questions:
-        aq.selected_option = next(
-            (opt.text for opt in aq.question.options if opt.is_correct), None
+
+    def _answer_all(session: Session) -> None:
+        # las letras correctas; el evento de selected_option ajusta la máscara
+        rows = session.scalars(
+            select(m.AttemptQuestion).where(m.AttemptQuestion.attempt_id == att.id)
         )
-    evaluate_attempt(att.id)
-    print(f"Score: {att.score}")
+        for aq in rows:
+            mask = aq.question.correct_mask
+            aq.selected_option = "".join(
+                letter
+                for i, letter in enumerate(m.OPTION_LETTERS)
+                if mask >> i & 1
+            )
+
+    run_write(_answer_all)
+    print(f"Score: {evaluate_attempt(att.id).score}")
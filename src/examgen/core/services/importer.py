@@ -2,12 +2,12 @@ import csv
 import json
 
 from examgen.core import models as m
+from examgen.core.database import session_factory
 from examgen.config import DEFAULT_DB
 
 
 def import_csv(path: str, db_path: str = DEFAULT_DB) -> None:
-    engine = m.get_engine(db_path)
-    session = m.Session(engine)
+    session = session_factory(db_path)()
     with open(path, newline="", encoding="utf-8") as f:
         for row in csv.DictReader(f):
             subj = (
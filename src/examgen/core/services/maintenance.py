@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+"""Background database maintenance.
+
+ANALYZE, ``PRAGMA optimize``, incremental vacuum and ``quick_check`` run on
+a daemon thread, either when the database has been idle for a while (and the
+last run is older than the configured interval) or right away when requested
+after bulk deletes.  Each job is logged through :func:`jlog`.
+
+Idle runs only look after the file (:data:`SCHEDULED_JOBS`); archiving is
+added only when ``settings.archive_after_days`` is set, and backups and the
+media cleanup run on request.  On SQLite the scheduled jobs never use the
+writer's pooled connection, so the GUI can keep writing meanwhile:
+``quick_check`` reads through the read-only engine and the rest open a
+private connection that only locks while it writes.
+"""
+
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from examgen.config import settings
+from examgen.core.database import (
+    create_sqlite_private,
+    get_engine,
+    is_sqlite,
+    reader_for,
+)
+from examgen.core.services.archive import archive_old_attempts
+from examgen.core.services.backup import backup_database
+from examgen.core.services.media import collect_garbage
+from examgen.utils.debug import jlog
+
+# páginas liberadas por lote: el escritor solo se bloquea unos milisegundos
+VACUUM_STEP_PAGES = 2000
+
+
+@dataclass(slots=True)
+class MaintenanceResult:
+    job: str
+    ok: bool
+    detail: str
+    seconds: float
+    reclaimed_bytes: int = 0
+
+
+def _pragma(conn: Connection, name: str) -> int:
+    return int(conn.exec_driver_sql(f"PRAGMA {name}").scalar() or 0)
+
+
+JobFn = Callable[[Connection], tuple[str, int]]
+
+
+def _own_sessions(fn: JobFn) -> JobFn:
+    """Mark a job that opens its own sessions.
+
+    ``run_job`` then does not hold a connection for it: the writer pool has
+    a single one and the job would wait for itself.
+    """
+    fn.own_sessions = True  # type: ignore[attr-defined]
+    return fn
+
+
+def _read_only(fn: JobFn) -> JobFn:
+    """Mark a job that only reads: on SQLite it runs on the reader engine."""
+    fn.read_only = True  # type: ignore[attr-defined]
+    return fn
+
+
+def _sqlite_only(fn: JobFn) -> JobFn:
+    @wraps(fn)
+    def _job(conn: Connection) -> tuple[str, int]:
+        if not is_sqlite(conn):
+            return "skipped (SQLite only)", 0
+        return fn(conn)
+
+    return _job
+
+
+@_sqlite_only
+def _optimize(conn: Connection) -> tuple[str, int]:
+    conn.exec_driver_sql("PRAGMA optimize")
+    return "ok", 0
+
+
+def _analyze(conn: Connection) -> tuple[str, int]:
+    if is_sqlite(conn):
+        # muestreo limitado: estadísticas suficientes sin leer tablas enteras
+        conn.exec_driver_sql("PRAGMA analysis_limit = 1000")
+    conn.exec_driver_sql("ANALYZE")
+    return "ok", 0
+
+
+def _file_bytes(conn: Connection) -> int:
+    return _pragma(conn, "page_count") * _pragma(conn, "page_size")
+
+
+@_sqlite_only
+def _convert_vacuum(conn: Connection) -> tuple[str, int]:
+    # ficheros antiguos: un VACUUM completo activa el modo incremental; bloquea
+    # la BD mientras reescribe el fichero entero
+    before = _file_bytes(conn)
+    conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.exec_driver_sql("VACUUM")
+    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return "converted to auto_vacuum=INCREMENTAL", max(before - _file_bytes(conn), 0)
+
+
+@_sqlite_only
+def _incremental_vacuum(conn: Connection) -> tuple[str, int]:
+    if _pragma(conn, "auto_vacuum") != 2:
+        if _file_bytes(conn) > settings.maintenance_convert_max_mb * 1024 * 1024:
+            return "skipped: auto_vacuum is off (run convert_vacuum)", 0
+        return _convert_vacuum(conn)
+    before = _file_bytes(conn)
+    # sqlite3 solo avanza un paso por execute() y cada paso libera una
+    # página: lotes de VACUUM_STEP_PAGES pasos en una transacción corta
+    cur = conn.connection.dbapi_connection.cursor()
+    try:
+        while free := _pragma(conn, "freelist_count"):
+            cur.execute("BEGIN IMMEDIATE")
+            for _ in range(min(free, VACUUM_STEP_PAGES)):
+                cur.execute("PRAGMA incremental_vacuum")
+            cur.execute("COMMIT")
+            time.sleep(0.01)
+    finally:
+        cur.close()
+    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    return "ok", max(before - _file_bytes(conn), 0)
+
+
+@_own_sessions
+def _archive(_conn: Connection | None) -> tuple[str, int]:
+    rep = archive_old_attempts()
+    return f"{rep.attempts} attempts archived", 0
+
+
+@_own_sessions
+def _media_gc(_conn: Connection | None) -> tuple[str, int]:
+    removed = collect_garbage()
+    return f"{removed} unreferenced media files removed", 0
+
+
+@_own_sessions
+def _backup(_conn: Connection | None) -> tuple[str, int]:
+    # conexiones sqlite3 propias: no retiene el escritor durante la copia
+    if not is_sqlite(get_engine()):
+        return "skipped (SQLite only)", 0
+    res = backup_database()
+    return f"{res.path.name} ({res.pages} pages)", 0
+
+
+@_read_only
+@_sqlite_only
+def _quick_check(conn: Connection) -> tuple[str, int]:
+    rows = [row[0] for row in conn.exec_driver_sql("PRAGMA quick_check")]
+    if rows != ["ok"]:
+        raise RuntimeError("; ".join(rows[:10]))
+    return "ok", 0
+
+
+JOBS: dict[str, JobFn] = {
+    "optimize": _optimize,
+    "analyze": _analyze,
+    "incremental_vacuum": _incremental_vacuum,
+    # fuera de SCHEDULED_JOBS: VACUUM completo, solo a petición
+    "convert_vacuum": _convert_vacuum,
+    "quick_check": _quick_check,
+    "archive": _archive,
+    "media_gc": _media_gc,
+    "backup": _backup,
+}
+# solo mantenimiento del fichero: nada que mueva o borre datos del usuario
+SCHEDULED_JOBS = ("quick_check", "incremental_vacuum", "analyze", "optimize")
+
+
+def scheduled_jobs() -> tuple[str, ...]:
+    """Jobs of an idle run; "archive" only if ``archive_after_days`` is set."""
+    if settings.archive_after_days is None:
+        return SCHEDULED_JOBS
+    # antes del vacuum, para recuperar ya las páginas que libera
+    return ("quick_check", "archive", *SCHEDULED_JOBS[1:])
+
+
+def _job_engine(job: JobFn) -> tuple[Engine, bool]:
+    """Return the engine *job* runs on and whether it must be disposed of.
+
+    On SQLite no job takes the writer's only connection: read-only jobs use
+    the reader engine and the rest a private unpooled one.
+    """
+    eng = get_engine()
+    if not is_sqlite(eng):
+        return eng, False
+    path = Path(eng.url.database)
+    if getattr(job, "read_only", False):
+        return reader_for(path), False
+    return create_sqlite_private(path), True
+
+
+def run_job(name: str) -> MaintenanceResult:
+    """Run one maintenance job on its own connection and log the result."""
+    t0 = time.perf_counter()
+    try:
+        job = JOBS[name]
+        if getattr(job, "own_sessions", False):
+            detail, reclaimed = job(None)
+        else:
+            eng, private = _job_engine(job)
+            try:
+                # autocommit: VACUUM y algunos PRAGMA no admiten transacción
+                auto = eng.execution_options(isolation_level="AUTOCOMMIT")
+                with auto.connect() as conn:
+                    detail, reclaimed = job(conn)
+            finally:
+                if private:
+                    eng.dispose()
+        elapsed = time.perf_counter() - t0
+        res = MaintenanceResult(name, True, detail, elapsed, reclaimed)
+    except Exception as exc:  # noqa: BLE001 - se informa y se sigue
+        res = MaintenanceResult(name, False, str(exc), time.perf_counter() - t0)
+    jlog(
+        "maintenance",
+        job=res.job,
+        ok=res.ok,
+        detail=res.detail,
+        ms=int(res.seconds * 1000),
+        reclaimed_bytes=res.reclaimed_bytes,
+    )
+    return res
+
+
+def run_jobs(names: Iterable[str] | None = None) -> list[MaintenanceResult]:
+    """Run several jobs in order (synchronously); by default an idle run."""
+    return [run_job(name) for name in (scheduled_jobs() if names is None else names)]
+
+
+class MaintenanceScheduler:
+    """Run maintenance jobs on a daemon thread without blocking the GUI."""
+
+    def __init__(
+        self,
+        interval: float | None = None,
+        idle: float | None = None,
+        poll: float = 5.0,
+    ) -> None:
+        self.interval = interval or settings.maintenance_interval_hours * 3600
+        self.idle = idle if idle is not None else settings.maintenance_idle_seconds
+        self.poll = poll
+        self.last_activity = time.monotonic()
+        self.last_run: float | None = None
+        self.on_result: list[Callable[[MaintenanceResult], None]] = []
+        self._requested: list[str] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="examgen-maintenance", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def touch(self) -> None:
+        """Note database activity; jobs wait until it has been idle."""
+        self.last_activity = time.monotonic()
+
+    def request(self, *jobs: str) -> None:
+        """Queue *jobs* to run as soon as possible (e.g. after bulk deletes)."""
+        with self._lock:
+            self._requested.extend(j for j in jobs if j not in self._requested)
+        self._wake.set()
+
+    def _due(self) -> list[str]:
+        with self._lock:
+            if self._requested:
+                jobs, self._requested = self._requested, []
+                return jobs
+        if time.monotonic() - self.last_activity < self.idle:
+            return []
+        if self.last_run is not None and (
+            time.monotonic() - self.last_run < self.interval
+        ):
+            return []
+        return list(scheduled_jobs())
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            jobs = self._due()
+            if jobs:
+                if set(SCHEDULED_JOBS) <= set(jobs):
+                    self.last_run = time.monotonic()
+                for name in jobs:
+                    if self._stop.is_set():
+                        return
+                    res = run_job(name)
+                    for cb in self.on_result:
+                        cb(res)
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+
+scheduler = MaintenanceScheduler()
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(_session: Session) -> None:
+    scheduler.touch()
+
+
+if __name__ == "__main__":
+    # p. ej. ``python -m examgen.core.services.maintenance convert_vacuum``
+    for r in run_jobs(sys.argv[1:] or None):
+        status = "OK " if r.ok else "ERR"
+        print(
+            f"{status} {r.job:20} {r.seconds * 1000:7.0f} ms  "
+            f"{r.reclaimed_bytes / 1024:9.0f} KiB  {r.detail}"
+        )
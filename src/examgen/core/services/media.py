@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+"""Content-addressed media store.
+
+Files live next to the database in ``<db name>_media/ab/abcdef…`` (the
+sha256 of their content), so identical images are stored once and rows only
+carry hashes.  ``media`` records each stored file and ``question_media``
+links questions to them; :func:`collect_garbage` removes files nobody
+references any more.
+"""
+
+from datetime import datetime, timedelta
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+import tempfile
+from typing import Iterable, List, Sequence
+
+from sqlalchemy import delete, select
+
+from examgen.config import CFG_DIR, settings
+from examgen.core import models as m
+from examgen.core.database import SessionLocal, get_engine, is_sqlite
+
+_CHUNK = 1024 * 1024
+GC_GRACE = timedelta(days=1)
+
+
+def media_root() -> Path:
+    """Return the store directory of the active database."""
+    if settings.media_folder:
+        return Path(settings.media_folder)
+    eng = get_engine()
+    if is_sqlite(eng):
+        db_file = Path(eng.url.database)
+        return db_file.with_name(f"{db_file.stem}_media")
+    # servidor sin media_folder compartida: almacén local de este equipo
+    return CFG_DIR / "media"
+
+
+def media_path(sha256: str) -> Path:
+    return media_root() / sha256[:2] / sha256
+
+
+def _register(sha256: str, size: int, mime: str | None) -> None:
+    with SessionLocal() as s:
+        exists = s.scalar(select(m.MediaFile.id).where(m.MediaFile.sha256 == sha256))
+        if exists is None:
+            s.add(m.MediaFile(sha256=sha256, size=size, mime=mime))
+            s.commit()
+
+
+def _place(tmp: Path, sha256: str) -> Path:
+    dest = media_path(sha256)
+    if dest.exists():
+        tmp.unlink()
+    else:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, dest)  # atómico: nunca queda un fichero a medias
+    return dest
+
+
+def _tmp_file() -> tuple[int, Path]:
+    root = media_root()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(dir=root, suffix=".part")
+    return fd, Path(name)
+
+
+def store_bytes(data: bytes, mime: str | None = None) -> str:
+    """Store *data* and return its sha256."""
+    sha256 = hashlib.sha256(data).hexdigest()
+    if not media_path(sha256).exists():
+        fd, tmp = _tmp_file()
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        _place(tmp, sha256)
+    _register(sha256, len(data), mime)
+    return sha256
+
+
+def store_file(path: Path | str) -> str:
+    """Copy the file at *path* into the store and return its sha256."""
+    path = Path(path)
+    h = hashlib.sha256()
+    fd, tmp = _tmp_file()
+    size = 0
+    with path.open("rb") as src, os.fdopen(fd, "wb") as dst:
+        while chunk := src.read(_CHUNK):
+            h.update(chunk)
+            dst.write(chunk)
+            size += len(chunk)
+    sha256 = h.hexdigest()
+    _place(tmp, sha256)
+    _register(sha256, size, mimetypes.guess_type(path.name)[0])
+    return sha256
+
+
+def set_question_media(question: m.Question, hashes: Sequence[str]) -> None:
+    """Replace the media of *question* with *hashes*, in that order.
+
+    Rows already linked are kept (only their position changes): replacing
+    them would INSERT the new (question_id, sha256) row before the old one
+    is DELETEd and break the unique constraint.
+    """
+    current = {qm.sha256: qm for qm in question.media}
+    wanted = list(dict.fromkeys(hashes))
+    keep = []
+    for pos, sha in enumerate(wanted):
+        qm = current.get(sha)
+        if qm is None:
+            qm = m.QuestionMedia(sha256=sha, position=pos)
+        elif qm.position != pos:
+            qm.position = pos
+        keep.append(qm)
+    if keep != list(question.media):
+        question.media[:] = keep
+
+
+def question_media(question_id: int) -> List[str]:
+    """Return the media hashes of one question."""
+    return media_for_questions([question_id]).get(question_id, [])
+
+
+def media_for_questions(question_ids: Iterable[int]) -> dict[int, List[str]]:
+    """Return ``{question_id: [sha256, …]}`` with a single narrow query."""
+    qm = m.QuestionMedia
+    ids = list(question_ids)
+    out: dict[int, List[str]] = {}
+    if not ids:
+        return out
+    stmt = (
+        select(qm.question_id, qm.sha256)
+        .where(qm.question_id.in_(ids))
+        .order_by(qm.question_id, qm.position)
+    )
+    with SessionLocal() as s:
+        for qid, sha in s.execute(stmt):
+            out.setdefault(qid, []).append(sha)
+    return out
+
+
+def collect_garbage(grace: timedelta = GC_GRACE) -> int:
+    """Delete stored files no question references; return how many.
+
+    Files stored less than *grace* ago are kept: a dialog may have stored
+    them and not saved its question yet.
+    """
+    cutoff = datetime.utcnow() - grace
+    referenced = select(m.QuestionMedia.sha256)
+    with SessionLocal() as s:
+        orphans = list(
+            s.scalars(
+                select(m.MediaFile.sha256).where(
+                    m.MediaFile.sha256.not_in(referenced),
+                    m.MediaFile.created_at < cutoff,
+                )
+            )
+        )
+        if orphans:
+            s.execute(delete(m.MediaFile).where(m.MediaFile.sha256.in_(orphans)))
+            s.commit()
+    for sha in orphans:
+        media_path(sha).unlink(missing_ok=True)
+    # restos de copias interrumpidas
+    root = media_root()
+    if root.exists():
+        for part in root.glob("*.part"):
+            age = datetime.now() - datetime.fromtimestamp(part.stat().st_mtime)
+            if age > grace:
+                part.unlink(missing_ok=True)
+    return len(orphans)
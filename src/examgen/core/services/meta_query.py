@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+"""Indexed filters on ``Question.meta``.
+
+``meta`` is free-form JSON, so a filter on it is a full scan unless the key
+has an expression index on its value.  Keys listed in
+:data:`INDEXED_META_KEYS` get such an index (see the ``meta_indexes``
+migration) and the helpers below build exactly the same expression
+(:class:`MetaValue`), so the planner can match it against the index.
+"""
+
+import re
+from typing import Any, List
+
+from sqlalchemy import ColumnElement, Integer, Select, String, literal_column, select
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeEngine
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+
+# clave de meta -> tipo SQL del valor extraído
+INDEXED_META_KEYS: dict[str, type[TypeEngine]] = {
+    "source": String,
+    "year": Integer,
+}
+
+_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def declare_meta_key(key: str, type_: type[TypeEngine] = String) -> None:
+    """Register *key* as an indexed meta key.
+
+    The index itself is created by the ``meta_indexes`` migration on the
+    next start, or right away with :func:`ensure_meta_indexes`.
+    """
+    if not _KEY_RE.match(key):
+        raise ValueError(f"Invalid meta key: {key!r}")
+    INDEXED_META_KEYS[key] = type_
+
+
+def _check_key(key: str) -> None:
+    if key not in INDEXED_META_KEYS:
+        raise KeyError(f"Meta key {key!r} is not indexed")
+
+
+class MetaValue(FunctionElement):
+    """Value of an indexed meta key, rendered the way its index is defined.
+
+    SQLite (and MySQL) use ``json_extract(meta, '$.key')``; PostgreSQL uses
+    ``meta ->> 'key'``, cast for integer keys.  The key is inlined instead
+    of bound so the planner can match the expression against the index.
+    """
+
+    name = "meta_value"
+    inherit_cache = True
+
+    def __init__(self, key: str) -> None:
+        _check_key(key)
+        super().__init__(m.Question.meta, literal_column(key))
+        self.type = INDEXED_META_KEYS[key]()
+
+
+@compiles(MetaValue)
+def _compile_json_extract(element: MetaValue, compiler, **kw) -> str:
+    meta, key = element.clauses
+    return f"json_extract({compiler.process(meta, **kw)}, '$.{key.name}')"
+
+
+@compiles(MetaValue, "postgresql")
+def _compile_pg(element: MetaValue, compiler, **kw) -> str:
+    meta, key = element.clauses
+    expr = f"({compiler.process(meta, **kw)} ->> '{key.name}')"
+    if isinstance(element.type, Integer):
+        expr = f"CAST({expr} AS INTEGER)"
+    return expr
+
+
+def meta_expr(key: str) -> ColumnElement[Any]:
+    """Return the indexed expression for the meta value of *key*."""
+    return MetaValue(key)
+
+
+def index_name(key: str) -> str:
+    return f"ix_question_meta_{key}"
+
+
+def index_ddl(key: str, dialect: Dialect) -> str:
+    expr = meta_expr(key).compile(
+        dialect=dialect, compile_kwargs={"include_table": False}
+    )
+    return f"CREATE INDEX IF NOT EXISTS {index_name(key)} ON question (({expr}))"
+
+
+def ensure_meta_indexes(conn: Connection) -> None:
+    """Create the expression index of every declared key."""
+    for key in INDEXED_META_KEYS:
+        conn.exec_driver_sql(index_ddl(key, conn.dialect))
+
+
+def meta_filter_stmt(
+    filters: dict[str, Any], subject_id: int | None = None
+) -> Select:
+    """Select question ids whose meta values equal *filters*."""
+    stmt = select(m.Question.id)
+    for key, value in filters.items():
+        stmt = stmt.where(meta_expr(key) == value)
+    if subject_id is not None:
+        stmt = stmt.where(m.Question.subject_id == subject_id)
+    return stmt.order_by(m.Question.id)
+
+
+def question_ids_by_meta(subject_id: int | None = None, **filters: Any) -> List[int]:
+    """Return the ids of questions matching every ``key=value`` in *filters*.
+
+    Example: ``question_ids_by_meta(source="MIR", year=2021)``.
+    """
+    with SessionLocal() as s:
+        return list(s.scalars(meta_filter_stmt(filters, subject_id)))
+
+
+def meta_values(key: str) -> List[Any]:
+    """Return the distinct non-null values stored under *key*."""
+    expr = meta_expr(key)
+    stmt = select(expr).where(expr.is_not(None)).distinct().order_by(expr)
+    with SessionLocal() as s:
+        return list(s.scalars(stmt))
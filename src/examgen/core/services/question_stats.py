@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Protocol, Sequence
+
+from sqlalchemy import (
+    DateTime,
+    Select,
+    Table,
+    and_,
+    bindparam,
+    case,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    literal,
+    or_,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+
+
+_STATS_COLUMNS = [
+    "question_id",
+    "attempts",
+    "errors",
+    "last_seen_at",
+    "last_correct_at",
+    "created_at",
+    "updated_at",
+]
+
+# SM-2: calidad de la respuesta (0-5) para acierto y fallo
+QUALITY_CORRECT = 5
+QUALITY_WRONG = 1
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+class Card(Protocol):
+    ease: float
+    interval_days: float
+    repetitions: int
+    due_at: datetime | None
+
+
+@dataclass(slots=True)
+class _Card:
+    ease: float = DEFAULT_EASE
+    interval_days: float = 0.0
+    repetitions: int = 0
+    due_at: datetime | None = None
+
+
+def review(card: Card, ok: bool, seen_at: datetime) -> None:
+    """Advance the SM-2 state of *card* by one review answered at *seen_at*.
+
+    A correct answer schedules the question 1, 6 and then ``interval * ease``
+    days later; a wrong one starts over at one day.  The ease factor moves
+    with the answer quality and never drops below :data:`MIN_EASE`.
+    """
+    q = QUALITY_CORRECT if ok else QUALITY_WRONG
+    if ok:
+        if card.repetitions == 0:
+            interval = 1.0
+        elif card.repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(card.interval_days * card.ease, 2)
+        card.repetitions += 1
+    else:
+        card.repetitions = 0
+        interval = 1.0
+    card.ease = max(MIN_EASE, card.ease + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    card.interval_days = interval
+    card.due_at = seen_at + timedelta(days=interval)
+
+
+def record_results(
+    session: Session, results: Iterable[tuple[int, bool]], seen_at: datetime
+) -> None:
+    """Add evaluated ``(question_id, is_correct)`` pairs to ``question_stats``.
+
+    Changes are only added to *session*; the caller commits them together
+    with the evaluation itself.
+    """
+    delta: dict[int, list[int]] = defaultdict(lambda: [0, 0, 0])
+    for qid, ok in results:
+        d = delta[qid]
+        d[0] += 1
+        if ok:
+            d[2] = 1
+        else:
+            d[1] += 1
+    if not delta:
+        return
+
+    existing = {
+        st.question_id: st
+        for st in session.scalars(
+            select(m.QuestionStats).where(m.QuestionStats.question_id.in_(delta))
+        )
+    }
+    subjects = dict(
+        session.execute(
+            select(m.Question.id, m.Question.subject_id).where(
+                m.Question.id.in_(delta)
+            )
+        ).all()
+    )
+    for qid, (attempts, errors, any_ok) in delta.items():
+        st = existing.get(qid)
+        if st is None:
+            st = m.QuestionStats(
+                question_id=qid,
+                attempts=0,
+                errors=0,
+                ease=DEFAULT_EASE,
+                interval_days=0.0,
+                repetitions=0,
+            )
+            session.add(st)
+        st.attempts += attempts
+        st.errors += errors
+        st.last_seen_at = seen_at
+        if any_ok:
+            st.last_correct_at = seen_at
+        st.subject_id = subjects.get(qid)
+        review(st, not errors, seen_at)
+
+
+def _results_stmt(attempt_ids: Sequence[int] | Select | None) -> Select:
+    """Aggregate evaluated rows per question (optionally for some attempts)."""
+    aq = m.AttemptQuestion
+    at = m.Attempt
+    seen = func.coalesce(at.ended_at, at.started_at)
+    stmt = (
+        select(
+            aq.question_id.label("question_id"),
+            func.count(aq.id).label("attempts"),
+            func.sum(case((aq.is_correct.is_(False), 1), else_=0)).label("errors"),
+            func.max(seen).label("seen_at"),
+            func.max(case((aq.is_correct.is_(True), seen))).label("correct_at"),
+        )
+        .join(at, at.id == aq.attempt_id)
+        .where(at.score.is_not(None))
+        .group_by(aq.question_id)
+    )
+    if attempt_ids is not None:
+        stmt = stmt.where(aq.attempt_id.in_(attempt_ids))
+    return stmt
+
+
+def _later(new, old):
+    return case(
+        (and_(new.is_not(None), or_(old.is_(None), new > old)), new), else_=old
+    )
+
+
+def _merge_results(
+    bind: Session | Connection, st: Table, attempt_ids: Sequence[int] | Select
+) -> None:
+    """Add the evaluated rows of *attempt_ids* to the counters table *st*."""
+    delta = _results_stmt(attempt_ids).subquery()
+    now = datetime.utcnow()
+    bind.execute(
+        update(st)
+        .where(st.c.question_id == delta.c.question_id)
+        .values(
+            attempts=st.c.attempts + delta.c.attempts,
+            errors=st.c.errors + delta.c.errors,
+            last_seen_at=_later(delta.c.seen_at, st.c.last_seen_at),
+            last_correct_at=_later(delta.c.correct_at, st.c.last_correct_at),
+            updated_at=now,
+        )
+    )
+    missing = select(
+        delta.c.question_id,
+        delta.c.attempts,
+        delta.c.errors,
+        delta.c.seen_at,
+        delta.c.correct_at,
+        literal(now, DateTime(timezone=True)),
+        literal(now, DateTime(timezone=True)),
+    ).where(delta.c.question_id.not_in(select(st.c.question_id)))
+    bind.execute(insert(st).from_select(_STATS_COLUMNS, missing))
+
+
+def record_attempts(session: Session, attempt_ids: Sequence[int]) -> None:
+    """Add the evaluated rows of *attempt_ids* to ``question_stats`` in SQL.
+
+    Set-based counterpart of :func:`record_results` for attempts already
+    scored in the database; the caller commits.
+    """
+    if attempt_ids:
+        _merge_results(session, m.QuestionStats.__table__, attempt_ids)
+        _schedule(session, _reviews_stmt(attempt_ids))
+
+
+def _reviews_stmt(attempt_ids: Sequence[int] | None) -> Select:
+    """Evaluated ``(question_id, is_correct, seen)`` rows in answer order."""
+    aq = m.AttemptQuestion
+    at = m.Attempt
+    seen = func.coalesce(at.ended_at, at.started_at)
+    stmt = (
+        select(aq.question_id, aq.is_correct, seen)
+        .join(at, at.id == aq.attempt_id)
+        .where(at.score.is_not(None))
+        .order_by(seen, aq.id)
+    )
+    if attempt_ids is not None:
+        stmt = stmt.where(aq.attempt_id.in_(attempt_ids))
+    return stmt
+
+
+def _load_cards(
+    bind: Session | Connection, qids: Iterable[int] | Select
+) -> dict[int, _Card]:
+    st = m.QuestionStats.__table__
+    if not isinstance(qids, Select):
+        qids = list(qids)
+    stmt = select(
+        st.c.question_id, st.c.ease, st.c.interval_days, st.c.repetitions, st.c.due_at
+    ).where(st.c.question_id.in_(qids))
+    return {row[0]: _Card(*row[1:]) for row in bind.execute(stmt)}
+
+
+def _store_cards(bind: Session | Connection, cards: dict[int, _Card]) -> None:
+    if not cards:
+        return
+    st = m.QuestionStats.__table__
+    bind.execute(
+        update(st)
+        .where(st.c.question_id == bindparam("b_qid"))
+        .values(
+            ease=bindparam("b_ease"),
+            interval_days=bindparam("b_interval"),
+            repetitions=bindparam("b_reps"),
+            due_at=bindparam("b_due"),
+        ),
+        [
+            {
+                "b_qid": qid,
+                "b_ease": c.ease,
+                "b_interval": c.interval_days,
+                "b_reps": c.repetitions,
+                "b_due": c.due_at,
+            }
+            for qid, c in cards.items()
+        ],
+    )
+
+
+def _schedule(bind: Session | Connection, reviews: Select) -> int:
+    """Apply the rows of *reviews* to the SM-2 state in ``question_stats``.
+
+    Only the touched questions are read and written; returns their count.
+    """
+    rows = bind.execute(reviews).all()
+    if not rows:
+        return 0
+    cards = _load_cards(bind, {qid for qid, _ok, _seen in rows})
+    for qid, ok, seen in rows:
+        card = cards.get(qid)
+        if card is not None:
+            # is_correct NULL (sin responder) cuenta como fallo
+            review(card, bool(ok), seen)
+    _store_cards(bind, cards)
+    sync_subjects(bind, only_missing=True)
+    return len(cards)
+
+
+def sync_subjects(bind: Session | Connection, only_missing: bool = False) -> None:
+    """Copy ``question.subject_id`` into ``question_stats.subject_id``."""
+    st = m.QuestionStats.__table__
+    q = m.Question.__table__
+    stmt = update(st).values(
+        subject_id=select(q.c.subject_id)
+        .where(q.c.id == st.c.question_id)
+        .scalar_subquery()
+    )
+    if only_missing:
+        stmt = stmt.where(st.c.subject_id.is_(None))
+    bind.execute(stmt)
+
+
+def replay_reviews(bind: Session | Connection) -> int:
+    """Initialise the SM-2 state of never-scheduled questions from history.
+
+    Replays every evaluated live attempt in order; questions that already
+    have a due date are left alone, so running it twice changes nothing.
+    Returns the number of questions scheduled.
+    """
+    st = m.QuestionStats.__table__
+    fresh = select(st.c.question_id).where(st.c.due_at.is_(None))
+    stmt = _reviews_stmt(None).where(m.AttemptQuestion.question_id.in_(fresh))
+    return _schedule(bind, stmt)
+
+
+def fold_archived(conn: Connection, attempt_ids: Select) -> None:
+    """Add attempts about to be archived to ``question_stats_archive``."""
+    _merge_results(conn, m.QuestionStatsArchive.__table__, attempt_ids)
+
+
+def _totals_stmt(now: datetime, question_ids: Sequence[int] | None = None) -> Select:
+    """Counters per question over live attempts and the archive aggregates."""
+    sa = m.QuestionStatsArchive.__table__
+    live = _results_stmt(None)
+    archived = select(
+        sa.c.question_id,
+        sa.c.attempts,
+        sa.c.errors,
+        sa.c.last_seen_at,
+        sa.c.last_correct_at,
+    )
+    if question_ids is not None:
+        live = live.where(m.AttemptQuestion.question_id.in_(question_ids))
+        archived = archived.where(sa.c.question_id.in_(question_ids))
+    # intentos vivos + agregados de los ya archivados
+    both = union_all(live, archived).subquery()
+    return select(
+        both.c.question_id,
+        func.sum(both.c.attempts),
+        func.sum(both.c.errors),
+        func.max(both.c.seen_at),
+        func.max(both.c.correct_at),
+        literal(now, DateTime(timezone=True)),
+        literal(now, DateTime(timezone=True)),
+    ).group_by(both.c.question_id)
+
+
+def rebuild_question_stats() -> int:
+    """Recompute ``question_stats`` from all evaluated attempts.
+
+    Attempts moved to the archive count through ``question_stats_archive``.
+    The spaced-repetition state is kept; questions without one get it from
+    :func:`replay_reviews`.
+
+    Returns the number of questions that have statistics afterwards.
+    """
+    st = m.QuestionStats.__table__
+    with SessionLocal() as s:
+        # el estado SM-2 es incremental (no sale de los agregados): se conserva
+        cards = _load_cards(s, select(st.c.question_id))
+        s.execute(delete(st))
+        s.execute(
+            insert(st).from_select(_STATS_COLUMNS, _totals_stmt(datetime.utcnow()))
+        )
+        _store_cards(s, cards)
+        sync_subjects(s)
+        replay_reviews(s)
+        s.commit()
+        return int(s.scalar(select(func.count()).select_from(st)) or 0)
+
+
+# lote de ids por sentencia (límite de parámetros de SQLite)
+_REFRESH_CHUNK = 500
+
+
+def refresh_question_stats(
+    bind: Session | Connection, question_ids: Iterable[int]
+) -> None:
+    """Recompute the rows of *question_ids* after attempts were deleted.
+
+    Counters come from the remaining live attempts plus the archive; the
+    SM-2 state is replayed from the remaining live reviews (the archive
+    keeps no per-review rows).  Questions left with no history lose their
+    row.  The caller commits, normally with the delete itself.
+    """
+    st = m.QuestionStats.__table__
+    ids = list(dict.fromkeys(question_ids))
+    now = datetime.utcnow()
+    for i in range(0, len(ids), _REFRESH_CHUNK):
+        chunk = ids[i : i + _REFRESH_CHUNK]
+        bind.execute(delete(st).where(st.c.question_id.in_(chunk)))
+        bind.execute(insert(st).from_select(_STATS_COLUMNS, _totals_stmt(now, chunk)))
+        _schedule(
+            bind, _reviews_stmt(None).where(m.AttemptQuestion.question_id.in_(chunk))
+        )
+    sync_subjects(bind, only_missing=True)
+
+
+@event.listens_for(m.Question, "after_update", propagate=True)
+def _on_subject_change(_mapper, conn: Connection, target: m.Question) -> None:
+    # mantiene la copia de subject_id que usa el índice de repaso
+    if inspect(target).attrs.subject_id.history.has_changes():
+        st = m.QuestionStats.__table__
+        conn.execute(
+            update(st)
+            .where(st.c.question_id == target.id)
+            .values(subject_id=target.subject_id)
+        )
+
+
+if __name__ == "__main__":
+    print(f"question_stats rebuilt: {rebuild_question_stats()} questions")
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+"""Uniform question sampling over cached id pools.
+
+Instead of ``ORDER BY random() LIMIT k`` (which sorts every candidate row),
+the ids of a subject or exam are read once with a narrow indexed query,
+cached in memory and sampled with :func:`random.sample`, which is O(k).
+Only the drawn rows are then loaded.
+
+Commits made through this process's ORM drop the pools right away.  Changes
+from other processes or raw SQL are caught by a fingerprint of the pooled
+tables (row counts and the highest question id), read once per transaction
+before the cache is used; in-place edits of a question's subject, section or
+difficulty made outside the ORM are only seen after :func:`invalidate`.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+import heapq
+import random
+import threading
+from typing import Any, Callable, Collection, Hashable, List, Sequence, TypeVar
+
+from sqlalchemy import event, func, inspect, lambda_stmt, select
+from sqlalchemy.orm import Session, SessionTransaction, object_session
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from examgen.core import models as m
+
+_pools: dict[Hashable, Any] = {}
+# huella de las tablas de los pools por URL de BD (ver _check_fingerprint)
+_fingerprints: dict[str, tuple] = {}
+_lock = threading.Lock()
+
+T = TypeVar("T")
+
+
+def invalidate() -> None:
+    """Forget every cached id pool."""
+    with _lock:
+        _pools.clear()
+        _fingerprints.clear()
+
+
+# Lambda statements: SQLAlchemy builds each construct once per call site and
+# reuses its cache key, so repeated calls only bind new parameter values.
+def _subject_pool_stmt(subject_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.Question.id).where(m.Question.subject_id == subject_id)
+    )
+
+
+def _exam_pool_stmt(exam_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.ExamQuestion.question_id).where(
+            m.ExamQuestion.exam_id == exam_id
+        )
+    )
+
+
+def _subject_ids_stmt(name: str) -> StatementLambdaElement:
+    lowered = name.lower()
+    return lambda_stmt(
+        lambda: select(m.Subject.id).where(func.lower(m.Subject.name) == lowered)
+    )
+
+
+def _exam_attempts_stmt(exam_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.QuestionStats.question_id, m.QuestionStats.attempts)
+        .join(
+            m.ExamQuestion,
+            m.ExamQuestion.question_id == m.QuestionStats.question_id,
+        )
+        .where(m.ExamQuestion.exam_id == exam_id)
+    )
+
+
+def _due_stmt(subject_id: int, now: datetime, overdue: bool) -> StatementLambdaElement:
+    # rango sobre ix_question_stats_subject_due: ya ordenado y solo de índice
+    stmt = lambda_stmt(
+        lambda: select(m.QuestionStats.due_at, m.QuestionStats.question_id)
+        .where(m.QuestionStats.subject_id == subject_id)
+        .order_by(m.QuestionStats.due_at, m.QuestionStats.question_id)
+    )
+    if overdue:
+        stmt += lambda s: s.where(m.QuestionStats.due_at <= now)
+    else:
+        stmt += lambda s: s.where(m.QuestionStats.due_at > now)
+    return stmt
+
+
+def _scheduled_stmt(subject_id: int) -> StatementLambdaElement:
+    return lambda_stmt(
+        lambda: select(m.QuestionStats.question_id).where(
+            m.QuestionStats.subject_id == subject_id,
+            m.QuestionStats.due_at.is_not(None),
+        )
+    )
+
+
+def _fingerprint_stmt() -> StatementLambdaElement:
+    # recuentos y max(id): solo índices, sin leer filas
+    return lambda_stmt(
+        lambda: select(
+            select(func.count()).select_from(m.Question).scalar_subquery(),
+            select(func.max(m.Question.id)).scalar_subquery(),
+            select(func.count()).select_from(m.ExamQuestion).scalar_subquery(),
+            select(func.count()).select_from(m.QuestionTag).scalar_subquery(),
+        )
+    )
+
+
+def _check_fingerprint(session: Session, url: str) -> None:
+    """Drop the pools of *url* if other writers changed the pooled tables."""
+    if session.info.get("sampling_checked"):
+        return
+    session.info["sampling_checked"] = True
+    fingerprint = tuple(session.execute(_fingerprint_stmt()).one())
+    with _lock:
+        if _fingerprints.get(url) != fingerprint:
+            for key in [key for key in _pools if key[0] == url]:
+                del _pools[key]
+            _fingerprints[url] = fingerprint
+
+
+def _questions_stmt(ids: Sequence[int]) -> StatementLambdaElement:
+    ids = list(ids)
+    return lambda_stmt(lambda: select(m.Question).where(m.Question.id.in_(ids)))
+
+
+def cached(session: Session, key: Hashable, build: Callable[[], T]) -> T:
+    """Return the value cached under *key*, building it on a miss.
+
+    Entries share the pools' invalidation: they are dropped whenever a
+    commit changes questions, exam links or tags, and when the tables'
+    fingerprint shows another process changed them.
+    """
+    # the registry may hold several databases; never mix their pools.
+    # ``session.bind`` is the writer: reads may go through the reader engine
+    url = str(session.bind.url)
+    _check_fingerprint(session, url)
+    key = (url, key)
+    with _lock:
+        value = _pools.get(key)
+    if value is None:
+        value = build()
+        with _lock:
+            _pools[key] = value
+    return value
+
+
+def _pool(
+    session: Session, key: Hashable, stmt: StatementLambdaElement
+) -> list[int]:
+    return cached(session, key, lambda: list(session.scalars(stmt)))
+
+
+def subject_pool(session: Session, subject_id: int) -> list[int]:
+    """Return the cached question ids of a subject."""
+    return _pool(session, ("subject", subject_id), _subject_pool_stmt(subject_id))
+
+
+def subject_pool_by_name(session: Session, name: str) -> list[int]:
+    """Return the cached question ids of the subject(s) called *name*."""
+    ids: list[int] = []
+    for subject_id in session.scalars(_subject_ids_stmt(name)):
+        ids.extend(subject_pool(session, subject_id))
+    return ids
+
+
+def subject_ids(session: Session, name: str) -> list[int]:
+    """Return the ids of the subject(s) called *name*."""
+    return list(session.scalars(_subject_ids_stmt(name)))
+
+
+def exam_subject_ids(session: Session, exam_id: int) -> list[int]:
+    """Return the cached ids of the subjects an exam draws questions from."""
+    stmt = (
+        select(m.Question.subject_id)
+        .join(m.ExamQuestion, m.ExamQuestion.question_id == m.Question.id)
+        .where(m.ExamQuestion.exam_id == exam_id)
+        .distinct()
+    )
+    return cached(
+        session, ("exam_subjects", exam_id), lambda: list(session.scalars(stmt))
+    )
+
+
+def exam_pool(session: Session, exam_id: int) -> list[int]:
+    """Return the cached question ids linked to an exam."""
+    return _pool(session, ("exam", exam_id), _exam_pool_stmt(exam_id))
+
+
+def sample_ids(
+    ids: Sequence[int], k: int, rng: random.Random | None = None
+) -> list[int]:
+    """Draw up to *k* distinct ids uniformly at random in O(k)."""
+    return (rng or random).sample(ids, min(max(k, 0), len(ids)))
+
+
+def attempt_buckets(
+    session: Session, exam_id: int, only: Collection[int] | None = None
+) -> dict[int, list[int]]:
+    """Group the exam's question ids by how many times they were attempted.
+
+    The counts are ``question_stats.attempts``: evaluated attempts only, so
+    questions of attempts that were generated but never submitted still
+    count as unseen.  *only* restricts the ids (e.g. a tag expression's
+    result).
+    """
+    ids = exam_pool(session, exam_id)
+    if only is not None:
+        ids = [qid for qid in ids if qid in only]
+    buckets: dict[int, list[int]] = defaultdict(list)
+    seen: set[int] = set()
+    for qid, attempts in session.execute(_exam_attempts_stmt(exam_id)):
+        if only is not None and qid not in only:
+            continue
+        buckets[attempts].append(qid)
+        seen.add(qid)
+    buckets[0].extend(qid for qid in ids if qid not in seen)
+    return buckets
+
+
+def draw_least_attempted(
+    buckets: dict[int, list[int]], k: int, rng: random.Random | None = None
+) -> list[int]:
+    """Draw *k* ids from *buckets*, least attempted first, random within ties."""
+    chosen: list[int] = []
+    for attempts in sorted(buckets):
+        if len(chosen) >= k:
+            break
+        chosen.extend(sample_ids(buckets[attempts], k - len(chosen), rng))
+    return chosen
+
+
+def sample_least_attempted(
+    session: Session,
+    exam_id: int,
+    k: int,
+    rng: random.Random | None = None,
+    only: Collection[int] | None = None,
+) -> list[int]:
+    """Draw *k* exam questions, least attempted first, random within ties.
+
+    *only* restricts the draw to those ids (e.g. a tag expression's result).
+    """
+    return draw_least_attempted(attempt_buckets(session, exam_id, only), k, rng)
+
+
+def most_due(
+    session: Session,
+    subjects: Sequence[int],
+    k: int,
+    now: datetime,
+    overdue: bool = True,
+    only: Collection[int] | None = None,
+) -> list[int]:
+    """Return up to *k* scheduled ids of *subjects*, earliest due first.
+
+    With *overdue* the questions due by *now*, otherwise those due later.
+    Each subject is one ordered range read of the due-date index; the
+    ranges are merged with a heap and read only until *k* ids pass *only*.
+    """
+    if k <= 0:
+        return []
+    results = [
+        session.execute(_due_stmt(sid, now, overdue)).tuples() for sid in subjects
+    ]
+    chosen: list[int] = []
+    try:
+        for _due, qid in heapq.merge(*results):
+            if only is None or qid in only:
+                chosen.append(qid)
+                if len(chosen) >= k:
+                    break
+    finally:
+        for res in results:
+            res.close()
+    return chosen
+
+
+def unscheduled(
+    session: Session, subjects: Sequence[int], ids: Sequence[int]
+) -> list[int]:
+    """Return the ids in *ids* that were never reviewed (no due date)."""
+    seen: set[int] = set()
+    for sid in subjects:
+        seen.update(session.scalars(_scheduled_stmt(sid)))
+    return [qid for qid in ids if qid not in seen]
+
+
+def fetch_questions(session: Session, ids: Sequence[int]) -> List[m.Question]:
+    """Load the questions for *ids*, keeping their order."""
+    if not ids:
+        return []
+    rows = {q.id: q for q in session.scalars(_questions_stmt(ids))}
+    if len(rows) < len(set(ids)):
+        # the cached pool is stale (rows deleted elsewhere)
+        invalidate()
+    return [rows[i] for i in ids if i in rows]
+
+
+def sample_questions(
+    session: Session,
+    ids: Sequence[int],
+    k: int,
+    rng: random.Random | None = None,
+) -> List[m.Question]:
+    """Sample *k* ids from *ids* and load only those questions."""
+    return fetch_questions(session, sample_ids(ids, k, rng))
+
+
+# -----------------------------------------------------------------------------
+# Invalidación automática (al confirmar la transacción que cambió los pools)
+# -----------------------------------------------------------------------------
+def mark_dirty(session: Session) -> None:
+    """Drop every cached pool when *session* commits."""
+    session.info["sampling_dirty"] = True
+
+
+def _mark_dirty(target: object) -> None:
+    session = object_session(target)
+    if session is not None:
+        mark_dirty(session)
+
+
+@event.listens_for(m.Question, "after_insert", propagate=True)
+@event.listens_for(m.Question, "after_delete", propagate=True)
+@event.listens_for(m.ExamQuestion, "after_insert")
+@event.listens_for(m.ExamQuestion, "after_delete")
+def _on_pool_change(_mapper, _conn, target: object) -> None:
+    _mark_dirty(target)
+
+
+@event.listens_for(m.Question, "after_update", propagate=True)
+def _on_question_update(_mapper, _conn, target: m.Question) -> None:
+    attrs = inspect(target).attrs
+    # section y difficulty: estratos de blueprint
+    if any(
+        attrs[name].history.has_changes()
+        for name in ("subject_id", "section", "difficulty")
+    ):
+        _mark_dirty(target)
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session: Session) -> None:
+    if session.info.pop("sampling_dirty", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _recheck(session: Session, transaction: SessionTransaction) -> None:
+    # cada transacción nueva vuelve a comprobar la huella una vez
+    if transaction.parent is None:
+        session.info.pop("sampling_checked", None)
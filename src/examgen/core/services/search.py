@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import re
+from typing import List
+
+from sqlalchemy import event, func, inspect, or_, select, text
+from sqlalchemy.orm import Session
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.migrations.fts_search import fts_ready, refresh_explanations
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# pesos bm25 por columna: enunciado > opciones > explicaciones
+_FTS_SQL = """
+SELECT f.rowid AS question_id, f.subject_id AS subject_id,
+       bm25(question_fts, 10.0, 4.0, 1.0) AS rank,
+       snippet(question_fts, -1, '[', ']', '…', 12) AS snippet
+FROM question_fts f
+WHERE question_fts MATCH :query
+  {subject_filter}
+ORDER BY rank, f.rowid
+LIMIT :limit OFFSET :offset
+"""
+
+
+@dataclass(slots=True)
+class SearchHit:
+    question_id: int
+    subject_id: int
+    rank: float
+    snippet: str
+
+
+def fts_query(user_text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    return " ".join(f'"{tok}"*' for tok in _TOKEN_RE.findall(user_text))
+
+
+def _has_fts(session: Session) -> bool:
+    # ``bind`` (el escritor) basta para el dialecto; get_bind() sin sentencia
+    # fijaría la sesión al escritor
+    if session.bind.dialect.name != "sqlite":
+        return False
+    return bool(
+        session.execute(
+            # .columns(): una lectura, puede ir al lector
+            text(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'question_fts'"
+            ).columns()
+        ).first()
+    )
+
+
+def _like_search(
+    session: Session,
+    user_text: str,
+    subject_id: int | None,
+    limit: int,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """Fallback when FTS5 is missing: case-insensitive substring match."""
+    pattern = f"%{user_text.lower()}%"
+    opt_match = (
+        select(m.AnswerOption.question_id)
+        .where(func.lower(m.AnswerOption.text).like(pattern))
+        .scalar_subquery()
+    )
+    stmt = select(m.Question.id, m.Question.subject_id).where(
+        or_(func.lower(m.Question.prompt).like(pattern), m.Question.id.in_(opt_match))
+    )
+    if subject_id is not None:
+        stmt = stmt.where(m.Question.subject_id == subject_id)
+    rows = session.execute(stmt.order_by(m.Question.id).limit(limit).offset(offset))
+    return [SearchHit(qid, sid, 0.0, "") for qid, sid in rows]
+
+
+def search(
+    user_text: str,
+    subject_id: int | None = None,
+    limit: int = 200,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """Ranked search over prompts, options and explanations.
+
+    Matching is prefix-based and ignores case and accents.  Pass
+    *subject_id* to restrict the search, or ``None`` to search every subject.
+    *limit* and *offset* select a page of the ranking.
+    """
+    query = fts_query(user_text)
+    if not query:
+        return []
+    with SessionLocal() as s:
+        if not _has_fts(s):
+            return _like_search(s, user_text.strip(), subject_id, limit, offset)
+        params: dict[str, object] = {"query": query, "limit": limit, "offset": offset}
+        subject_filter = ""
+        if subject_id is not None:
+            subject_filter = "AND f.subject_id = :subject_id"
+            params["subject_id"] = subject_id
+        stmt = text(_FTS_SQL.format(subject_filter=subject_filter)).columns()
+        rows = s.execute(stmt, params)
+        return [SearchHit(*row) for row in rows]
+
+
+def search_question_ids(
+    user_text: str,
+    subject_id: int | None = None,
+    limit: int = 200,
+    offset: int = 0,
+) -> List[int]:
+    """Return only the ids of :func:`search`, best match first."""
+    hits = search(user_text, subject_id, limit, offset)
+    return [hit.question_id for hit in hits]
+
+
+def _touched_questions(session: Session) -> set[int]:
+    qids: set[int] = set()
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, m.Question) and session.is_modified(obj):
+            qids.add(obj.id)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, m.AnswerOption):
+            # también la pregunta de la que sale una opción movida
+            qids.update(inspect(obj).attrs.question_id.history.deleted)
+            qids.add(obj.question_id)
+    qids.discard(None)
+    return qids
+
+
+@event.listens_for(Session, "after_flush")
+def _index_compressed_explanations(session: Session, _ctx) -> None:
+    # los triggers FTS no descomprimen: tras ellos se reindexan las
+    # explicaciones de las preguntas tocadas en este flush
+    qids = _touched_questions(session)
+    if not qids:
+        return
+    conn = session.connection()
+    if conn.dialect.name == "sqlite" and fts_ready(conn):
+        refresh_explanations(conn, qids)
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+"""Question tags and tag expressions.
+
+Each tag keeps the ids of its questions as a bitset (bit *n* set = question
+*n* carries the tag), stored zlib-compressed in ``tag.bitset`` and rewritten
+in the same transaction whenever the ORM changes ``question_tag``.  An
+expression such as ``anatomia AND (tema1 OR tema2) AND NOT repaso`` is
+parsed once and evaluated with integer ``& | ~`` over the decoded bitsets,
+intersected with the cached pool of the subject or exam, so filtering costs
+microseconds and no queries before sampling.
+"""
+
+from functools import lru_cache
+import re
+import zlib
+from typing import Iterable, List, Sequence, Union
+
+from sqlalchemy import bindparam, event, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from examgen.core import models as m
+from examgen.core.services import sampling
+
+# ("tag", name) | ("not", node) | ("and" | "or", node, node)
+Node = Union[tuple[str, str], tuple[str, "Node"], tuple[str, "Node", "Node"]]
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|(&&?|\|\|?|!)|"([^"]*)"|([^\s()&|!"]+))')
+_SYMBOLS = {"&": "AND", "&&": "AND", "|": "OR", "||": "OR", "!": "NOT"}
+_KEYWORDS = {"AND", "OR", "NOT"}
+
+
+class TagExprError(ValueError):
+    """Invalid tag expression or unknown tag."""
+
+
+def normalize_tag(name: str) -> str:
+    """Canonical tag name: trimmed, single spaces, lower case."""
+    return " ".join(name.split()).lower()
+
+
+# -----------------------------------------------------------------------------
+# Bitsets
+# -----------------------------------------------------------------------------
+def to_bits(ids: Iterable[int]) -> int:
+    """Return the bitset (a Python int) with the bits of *ids* set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def from_bits(bits: int) -> List[int]:
+    """Return the ids set in *bits*, in ascending order."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    ids: List[int] = []
+    for i, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            ids.append(i * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+def encode_bitset(bits: int) -> bytes:
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, "little"))
+
+
+def decode_bitset(blob: bytes | None) -> int:
+    return int.from_bytes(zlib.decompress(blob), "little") if blob else 0
+
+
+def rebuild_bitsets(conn: Connection, tag_ids: Sequence[int] | None = None) -> int:
+    """Recompute the stored bitsets of *tag_ids* (all tags when ``None``)."""
+    tag = m.Tag.__table__
+    qt = m.QuestionTag.__table__
+    ids_stmt = select(tag.c.id)
+    if tag_ids is not None:
+        ids_stmt = ids_stmt.where(tag.c.id.in_(list(tag_ids)))
+    members: dict[int, list[int]] = {tid: [] for tid in conn.scalars(ids_stmt)}
+    if not members:
+        return 0
+    rows = conn.execute(
+        select(qt.c.tag_id, qt.c.question_id).where(qt.c.tag_id.in_(list(members)))
+    )
+    for tid, qid in rows:
+        members[tid].append(qid)
+    conn.execute(
+        update(tag)
+        .where(tag.c.id == bindparam("tid"))
+        .values(bitset=bindparam("bits"), question_count=bindparam("n")),
+        [
+            {"tid": tid, "bits": encode_bitset(to_bits(qids)), "n": len(qids)}
+            for tid, qids in members.items()
+        ],
+    )
+    return len(members)
+
+
+# -----------------------------------------------------------------------------
+# Expresiones
+# -----------------------------------------------------------------------------
+def _tokenize(text: str) -> list[tuple[str, str]]:
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise TagExprError(f"Carácter no válido en la posición {pos + 1}")
+        lpar, rpar, symbol, quoted, word = match.groups()
+        if lpar or rpar:
+            tokens.append((lpar or rpar, ""))
+        elif symbol:
+            tokens.append((_SYMBOLS[symbol], ""))
+        elif quoted is not None:
+            tokens.append(("TAG", normalize_tag(quoted)))
+        elif word.upper() in _KEYWORDS:
+            tokens.append((word.upper(), ""))
+        else:
+            tokens.append(("TAG", normalize_tag(word)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent; precedence NOT > AND > OR, juxtaposition is AND."""
+
+    def __init__(self, tokens: list[tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> str | None:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self) -> tuple[str, str]:
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise TagExprError(f'"{self.peek()}" inesperado')
+        return node
+
+    def parse_or(self) -> Node:
+        node = self.parse_and()
+        while self.peek() == "OR":
+            self.take()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self) -> Node:
+        node = self.parse_not()
+        while self.peek() in ("AND", "NOT", "TAG", "("):
+            if self.peek() == "AND":
+                self.take()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self) -> Node:
+        if self.peek() == "NOT":
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self) -> Node:
+        kind = self.peek()
+        if kind is None:
+            raise TagExprError("Expresión incompleta")
+        if kind == "(":
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise TagExprError('Falta ")"')
+            self.take()
+            return node
+        if kind == "TAG":
+            return ("tag", self.take()[1])
+        raise TagExprError(f'"{kind}" inesperado')
+
+
+@lru_cache(maxsize=256)
+def parse_tag_expr(text: str) -> Node:
+    """Parse *text* into a small tuple tree; raises :class:`TagExprError`."""
+    tokens = _tokenize(text)
+    if not tokens:
+        raise TagExprError("Expresión vacía")
+    return _Parser(tokens).parse()
+
+
+def expr_tags(node: Node) -> set[str]:
+    """Return the tag names used by *node*."""
+    if node[0] == "tag":
+        return {node[1]}
+    return set().union(*(expr_tags(child) for child in node[1:]))
+
+
+def _evaluate(node: Node, bits: dict[str, int]) -> int:
+    op = node[0]
+    if op == "tag":
+        try:
+            return bits[node[1]]
+        except KeyError:
+            raise TagExprError(f'Etiqueta desconocida: "{node[1]}"') from None
+    if op == "not":
+        # ~x es "infinito" en negativo; el AND final con el universo lo acota
+        return ~_evaluate(node[1], bits)
+    left = _evaluate(node[1], bits)
+    right = _evaluate(node[2], bits)
+    return left & right if op == "and" else left | right
+
+
+def tag_bits(session: Session) -> dict[str, int]:
+    """Return ``{tag name: bitset}`` for every tag (cached)."""
+    def _load() -> dict[str, int]:
+        rows = session.execute(select(m.Tag.name, m.Tag.bitset))
+        return {name: decode_bitset(blob) for name, blob in rows}
+
+    return sampling.cached(session, ("tag_bits",), _load)
+
+
+def subject_bits(session: Session, subject_id: int) -> int:
+    """Return the cached bitset of a subject's questions."""
+    return sampling.cached(
+        session,
+        ("subject_bits", subject_id),
+        lambda: to_bits(sampling.subject_pool(session, subject_id)),
+    )
+
+
+def subject_bits_by_name(session: Session, name: str) -> int:
+    bits = 0
+    for subject_id in session.scalars(sampling._subject_ids_stmt(name)):
+        bits |= subject_bits(session, subject_id)
+    return bits
+
+
+def exam_bits(session: Session, exam_id: int) -> int:
+    """Return the cached bitset of the questions linked to an exam."""
+    return sampling.cached(
+        session,
+        ("exam_bits", exam_id),
+        lambda: to_bits(sampling.exam_pool(session, exam_id)),
+    )
+
+
+def evaluate(session: Session, expr: str, universe: int) -> int:
+    """Return the bitset of the questions in *universe* matching *expr*."""
+    return universe & _evaluate(parse_tag_expr(expr), tag_bits(session))
+
+
+# -----------------------------------------------------------------------------
+# Edición
+# -----------------------------------------------------------------------------
+def all_tags() -> List[str]:
+    """Return every tag name, sorted."""
+    from examgen.core.database import SessionLocal
+
+    with SessionLocal() as s:
+        return list(s.scalars(select(m.Tag.name).order_by(m.Tag.name)))
+
+
+def question_tags(question_id: int) -> List[str]:
+    """Return the tag names of one question."""
+    from examgen.core.database import SessionLocal
+
+    stmt = (
+        select(m.Tag.name)
+        .join(m.QuestionTag, m.QuestionTag.tag_id == m.Tag.id)
+        .where(m.QuestionTag.question_id == question_id)
+        .order_by(m.Tag.name)
+    )
+    with SessionLocal() as s:
+        return list(s.scalars(stmt))
+
+
+def set_question_tags(
+    session: Session, question: m.Question, names: Iterable[str]
+) -> None:
+    """Replace the tags of *question*, creating the missing ones."""
+    wanted = [n for n in dict.fromkeys(normalize_tag(n) for n in names) if n]
+    existing = {
+        t.name: t for t in session.scalars(select(m.Tag).where(m.Tag.name.in_(wanted)))
+    }
+    question.tags[:] = [existing.get(n) or m.Tag(name=n) for n in wanted]
+
+
+# -----------------------------------------------------------------------------
+# Mantenimiento de los bitsets al hacer flush
+# -----------------------------------------------------------------------------
+def _changed_tags(session: Session) -> set[m.Tag]:
+    changed: set[m.Tag] = set()
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, m.Question):
+            hist = inspect(obj).attrs.tags.history
+            changed.update(hist.added, hist.deleted)
+        elif isinstance(obj, m.Tag):
+            hist = inspect(obj).attrs.questions.history
+            if hist.added or hist.deleted:
+                changed.add(obj)
+    for obj in session.deleted:
+        if isinstance(obj, m.Question):
+            changed.update(obj.tags)
+    return changed
+
+
+@event.listens_for(Session, "before_flush")
+def _before_flush(session: Session, _ctx, _instances) -> None:
+    changed = _changed_tags(session)
+    if changed:
+        session.info.setdefault("tags_dirty", set()).update(changed)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _after_flush(session: Session, _ctx) -> None:
+    changed = session.info.pop("tags_dirty", None)
+    if not changed:
+        return
+    live = [t for t in changed if inspect(t).persistent]
+    if live:
+        rebuild_bitsets(session.connection(), [t.id for t in live])
+        for t in live:
+            session.expire(t, ["bitset", "question_count"])
+    sampling.mark_dirty(session)
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+"""Write coordination between several instances sharing one database.
+
+:func:`run_write` runs a unit of work in a session that first takes the
+SQLite write lock with ``BEGIN IMMEDIATE``: the connection's
+``busy_timeout`` waits for other writers, and when that runs out the whole
+unit is retried after a jittered exponential backoff, so instances that
+collided do not retry in lockstep.  The time until the lock is obtained is
+recorded in :func:`lock_stats` and logged through :func:`jlog`.
+
+With ``settings.write_lease_seconds > 0`` instances also elect a writer:
+the ``writer_lease`` row names the holder for a time slice and the others
+back off until it expires.  Use it when many machines write in bursts and
+lock storms cost more than the wait.
+
+WAL needs shared memory on one host: databases in a network folder are
+opened with ``journal_mode=DELETE`` (see ``core.database.is_shared_folder``
+and ``settings.sqlite_shared_folder``).
+"""
+
+from dataclasses import dataclass, replace
+import os
+import random
+import socket
+import threading
+import time
+from typing import Callable, TypeVar
+import uuid
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from examgen.config import settings
+from examgen.core import models as m
+from examgen.core.database import SessionLocal, is_sqlite
+from examgen.utils.debug import jlog
+
+T = TypeVar("T")
+
+# SQLITE_BUSY, SQLITE_LOCKED
+_BUSY_CODES = {5, 6}
+# identifica a esta instancia en writer_lease
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class WriteContention(RuntimeError):
+    """The write lock (or the lease) could not be obtained in time."""
+
+    def __init__(self, waited: float, holder: str | None = None) -> None:
+        who = f" (lease de {holder})" if holder else ""
+        super().__init__(f"Base de datos ocupada tras {waited:.1f} s{who}")
+        self.waited = waited
+        self.holder = holder
+
+
+class _LeaseHeld(Exception):
+    def __init__(self, holder: str) -> None:
+        self.holder = holder
+
+
+@dataclass(slots=True)
+class LockStats:
+    writes: int = 0
+    retries: int = 0
+    failures: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+
+_stats = LockStats()
+_stats_lock = threading.Lock()
+
+
+def lock_stats() -> LockStats:
+    """Return a snapshot of the write-lock counters of this process."""
+    with _stats_lock:
+        return replace(_stats)
+
+
+def reset_lock_stats() -> None:
+    global _stats
+    with _stats_lock:
+        _stats = LockStats()
+
+
+def is_busy(exc: BaseException) -> bool:
+    """True if *exc* is SQLite reporting a locked or busy database."""
+    orig = getattr(exc, "orig", exc)
+    code = getattr(orig, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in _BUSY_CODES
+    msg = str(orig).lower()
+    return "database is locked" in msg or "database is busy" in msg
+
+
+def backoff(attempt: int) -> float:
+    """Seconds to sleep before retry *attempt* (0-based): full jitter."""
+    cap = settings.write_backoff_max_ms / 1000
+    return random.uniform(0, min(cap, settings.write_backoff_ms / 1000 * 2**attempt))
+
+
+def _take_lease(session: Session) -> None:
+    """Check or take the writer lease inside the current transaction.
+
+    The lease is a time slice: it is not extended by writing.  An instance
+    refused the lease records itself as ``waiter``; when the slice ends the
+    last holder waits one more slice before taking it again only if someone
+    is waiting, so a busy instance cannot starve the others and a lone one
+    is never blocked by itself.
+    """
+    lease = m.WriterLease.__table__
+    ttl = settings.write_lease_seconds
+    now = time.time()
+    row = session.execute(
+        select(
+            lease.c.holder, lease.c.expires_at, lease.c.waiter, lease.c.waiter_at
+        ).where(lease.c.id == 1)
+    ).first()
+    if row is None:
+        session.execute(
+            insert(lease).values(id=1, holder=INSTANCE_ID, expires_at=now + ttl)
+        )
+        return
+    mine = row.holder == INSTANCE_ID
+    if now < row.expires_at:
+        if mine:
+            return
+        if row.waiter != INSTANCE_ID or now - (row.waiter_at or 0) > ttl:
+            # run_write confirma esta petición aunque no consiga el turno
+            session.execute(
+                update(lease)
+                .where(lease.c.id == 1)
+                .values(waiter=INSTANCE_ID, waiter_at=now)
+            )
+        raise _LeaseHeld(row.holder)
+    waiting = (
+        row.waiter is not None
+        and row.waiter != INSTANCE_ID
+        and now - (row.waiter_at or 0) <= 2 * ttl
+    )
+    if mine and waiting and now < row.expires_at + ttl:
+        # turno para los demás
+        raise _LeaseHeld(INSTANCE_ID)
+    values = {"holder": INSTANCE_ID, "expires_at": now + ttl}
+    if row.waiter == INSTANCE_ID:
+        values.update(waiter=None, waiter_at=None)
+    session.execute(update(lease).where(lease.c.id == 1).values(**values))
+
+
+def _begin_write(session: Session) -> None:
+    # todo el trabajo por el escritor: lo que lee es lo que va a modificar
+    session.info["use_writer"] = True
+    conn = session.connection()
+    if not is_sqlite(conn):
+        return
+    # toma el bloqueo de escritura ya: la espera queda aquí (busy_timeout)
+    # y no a mitad del trabajo, y se puede medir
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    if settings.write_lease_seconds > 0:
+        _take_lease(session)
+
+
+def _record(waited: float, retries: int, failed: bool = False) -> None:
+    with _stats_lock:
+        _stats.retries += retries
+        if failed:
+            _stats.failures += 1
+            return
+        _stats.writes += 1
+        _stats.wait_total += waited
+        _stats.wait_max = max(_stats.wait_max, waited)
+
+
+def _session(bind: Connection | None) -> Session:
+    if bind is None:
+        return SessionLocal()
+    # todo por esa conexión, también las lecturas
+    return SessionLocal(bind=bind, reader=None)
+
+
+def run_write(
+    work: Callable[[Session], T],
+    retries: int | None = None,
+    bind: Connection | None = None,
+) -> T:
+    """Run *work* holding the write lock, commit, and return its result.
+
+    *work* may run more than once (every attempt starts from a fresh
+    session), so it must only touch the session it receives.  With *bind*
+    the session uses that connection (e.g. a private one with the archive
+    attached) instead of the writer pool.  Raises :class:`WriteContention`
+    when the lock is still busy after *retries*.
+    """
+    retries = settings.write_retries if retries is None else retries
+    t0 = time.perf_counter()
+    holder: str | None = None
+    for attempt in range(retries + 1):
+        with _session(bind) as session:
+            try:
+                _begin_write(session)
+                waited = time.perf_counter() - t0
+                result = work(session)
+                session.commit()
+            except _LeaseHeld as exc:
+                # solo guarda la petición de turno: work() no ha corrido
+                session.commit()
+                holder = exc.holder
+            except OperationalError as exc:
+                session.rollback()
+                if not is_busy(exc):
+                    raise
+                holder = None
+            else:
+                _record(waited, attempt)
+                if attempt or waited >= 0.01:
+                    jlog(
+                        "write_wait",
+                        ms=int(waited * 1000),
+                        retries=attempt,
+                    )
+                return result
+        if attempt < retries:
+            time.sleep(backoff(attempt))
+    waited = time.perf_counter() - t0
+    _record(waited, retries, failed=True)
+    jlog("write_failed", ms=int(waited * 1000), retries=retries, holder=holder)
+    raise WriteContention(waited, holder)
+
+
+def release_lease() -> None:
+    """Give up the writer lease if this instance holds it."""
+    if settings.write_lease_seconds <= 0:
+        return
+    lease = m.WriterLease.__table__
+    with SessionLocal() as session:
+        session.execute(
+            update(lease)
+            .where(lease.c.id == 1, lease.c.holder == INSTANCE_ID)
+            .values(expires_at=0.0)
+        )
+        session.commit()
+
+
+# -----------------------------------------------------------------------------
+# Prueba de carga: varios procesos escribiendo a la vez en la misma BD
+# -----------------------------------------------------------------------------
+def _stress_worker(args: tuple[str, int, int, float]) -> tuple[LockStats, int]:
+    path, worker, writes, lease = args
+    from examgen.core.database import set_engine
+
+    settings.write_lease_seconds = lease
+    set_engine(path)
+
+    def _one(session: Session) -> None:
+        session.add(
+            m.Subject(name=f"stress-{worker}-{uuid.uuid4().hex[:8]}")
+        )
+
+    errors = 0
+    for _ in range(writes):
+        try:
+            run_write(_one)
+        except WriteContention:
+            errors += 1
+        time.sleep(random.uniform(0, 0.005))
+    return lock_stats(), errors
+
+
+def stress(
+    path: str, processes: int = 6, writes: int = 200, lease: float = 0.0
+) -> dict[str, float]:
+    """Write concurrently from *processes* processes and sum their stats.
+
+    ``rows`` counts the rows actually stored, to detect lost writes.
+    """
+    from multiprocessing import get_context
+
+    from examgen.core.database import set_engine
+
+    set_engine(path)
+    t0 = time.perf_counter()
+    with get_context("spawn").Pool(processes) as pool:
+        results = pool.map(
+            _stress_worker, [(path, i, writes, lease) for i in range(processes)]
+        )
+    total = LockStats()
+    errors = 0
+    for st, err in results:
+        total.writes += st.writes
+        total.retries += st.retries
+        total.failures += st.failures
+        total.wait_total += st.wait_total
+        total.wait_max = max(total.wait_max, st.wait_max)
+        errors += err
+    with SessionLocal() as session:
+        rows = session.scalar(
+            select(func.count(m.Subject.id)).where(m.Subject.name.like("stress-%"))
+        )
+    return {
+        "seconds": round(time.perf_counter() - t0, 2),
+        "writes": total.writes,
+        "failed": errors,
+        "rows": int(rows or 0),
+        "retries": total.retries,
+        "wait_avg_ms": round(total.wait_total / max(total.writes, 1) * 1000, 1),
+        "wait_max_ms": round(total.wait_max * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    target = sys.argv[1] if len(sys.argv) > 1 else tempfile.mkdtemp() + "/stress.db"
+    print(target)
+    for lease_s in (0.0, 0.05):
+        print(f"lease={lease_s}:", stress(target, lease=lease_s))
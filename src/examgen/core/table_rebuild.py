@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+"""Chunked, resumable table rebuilds for SQLite.
+
+SQLite cannot change most column definitions in place: the table has to be
+recreated and its rows copied.  A single ``INSERT … SELECT`` holds the
+write lock for the whole copy and keeps both copies on disk until the end.
+:func:`rebuild_table` instead creates ``<table>_rebuild`` beside the old
+table and *moves* rows across in rowid ranges, one short transaction per
+range, so other connections get the lock between chunks and the pages freed
+in the old table are reused by the new one.
+
+The rows still to copy are exactly those left in the old table, so a
+rebuild interrupted at any point resumes where it stopped the next time it
+is called.  The final swap (drop, rename, recreate indexes and triggers)
+is a single transaction; it first moves any rows written since the last
+chunk, so nothing inserted meanwhile is lost.
+
+The ``ON DELETE`` actions of the old table's foreign keys are kept unless
+the new definition declares its own.
+"""
+
+import time
+from typing import Callable, Mapping, Sequence
+
+from sqlalchemy import MetaData, Table
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable
+
+from examgen.utils.debug import jlog, log
+
+# (filas copiadas, filas totales)
+ProgressFn = Callable[[int, int], None]
+
+CHUNK_ROWS = 5000
+_SUFFIX = "_rebuild"
+
+
+def _columns(conn: Connection, name: str) -> list[str]:
+    return [row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info('{name}')")]
+
+
+def _exists(conn: Connection, name: str) -> bool:
+    return bool(_columns(conn, name))
+
+
+def _count(conn: Connection, name: str) -> int:
+    return int(conn.exec_driver_sql(f"SELECT count(*) FROM {name}").scalar() or 0)
+
+
+def _fk_actions(conn: Connection, name: str) -> dict[str, str]:
+    """``{column: ON DELETE action}`` of the foreign keys of *name*."""
+    rows = conn.exec_driver_sql(f"PRAGMA foreign_key_list('{name}')").mappings()
+    return {
+        row["from"]: row["on_delete"]
+        for row in rows
+        if row["on_delete"] and row["on_delete"] != "NO ACTION"
+    }
+
+
+def _with_fk_actions(table: Table, on_delete: Mapping[str, str]) -> Table:
+    """Copy of *table* whose foreign keys on *on_delete*'s columns use them."""
+    pending = {
+        fk: on_delete[fk.parent.name]
+        for fk in table.foreign_keys
+        if fk.parent.name in on_delete and fk.ondelete is None
+    }
+    if not pending:
+        return table
+    meta = MetaData()
+    for tbl in table.metadata.sorted_tables:
+        tbl.to_metadata(meta)
+    copy = meta.tables[table.key]
+    for fk in copy.foreign_keys:
+        if fk.parent.name in on_delete and fk.ondelete is None:
+            fk.ondelete = fk.constraint.ondelete = on_delete[fk.parent.name]
+    return copy
+
+
+def _create_sql(conn: Connection, table: Table, name: str) -> str:
+    """``CREATE TABLE`` for *table* under another *name* (no indexes)."""
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+    head = f"CREATE TABLE {conn.dialect.identifier_preparer.format_table(table)}"
+    if not ddl.startswith(head):
+        raise RuntimeError(f"Unexpected DDL for {table.name}: {ddl[:60]}")
+    return f"CREATE TABLE {name}" + ddl[len(head):]
+
+
+def _schema_sql(conn: Connection, name: str) -> list[str]:
+    """Indexes and triggers declared on *name* (dropped with the table)."""
+    rows = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master "
+        "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL "
+        "ORDER BY type",
+        (name,),
+    )
+    return [row[0] for row in rows]
+
+
+def _move(conn: Connection, name: str, tmp: str, cols: str, hi: int) -> int:
+    """Move the rows with ``rowid <= hi`` from *name* to *tmp*."""
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        n = conn.exec_driver_sql(
+            f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {name} WHERE rowid <= ?",
+            (hi,),
+        ).rowcount
+        conn.exec_driver_sql(f"DELETE FROM {name} WHERE rowid <= ?", (hi,))
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+    return n
+
+
+def _swap(conn: Connection, table: Table, tmp: str, cols: str) -> int:
+    """Replace *table* by *tmp*; return the rows moved by the swap itself."""
+    name = table.name
+    schema = _schema_sql(conn, name)
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        # filas escritas por otras conexiones tras el último lote: con el
+        # bloqueo de escritura ya no puede llegar ninguna más
+        late = conn.exec_driver_sql(
+            f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {name}"
+        ).rowcount
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+        conn.exec_driver_sql(f"ALTER TABLE {tmp} RENAME TO {name}")
+        for sql in schema:
+            try:
+                conn.exec_driver_sql(sql)
+            except OperationalError as exc:
+                # p. ej. un índice sobre una columna que ya no existe
+                log(f"rebuild {name}: se omite {sql!r}: {exc}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+    return late
+
+
+def rebuild_table(
+    engine: Engine,
+    table: Table,
+    columns: Sequence[str] | None = None,
+    chunk: int = CHUNK_ROWS,
+    progress: ProgressFn | None = None,
+    on_delete: Mapping[str, str] | None = None,
+) -> int:
+    """Recreate *table* with its current definition, keeping its rows.
+
+    *columns* defaults to the columns the old and new definitions share.
+    *on_delete* maps columns to the ``ON DELETE`` action of their foreign
+    key; by default the old table's actions are kept.
+    Indexes and triggers of the old table are recreated after the swap,
+    plus any index *table* declares.  Foreign keys are not enforced while
+    rows move; ``PRAGMA foreign_key_check`` runs at the end and its
+    violations are logged.  Returns the number of rows copied by this call.
+    """
+    name = table.name
+    tmp = f"{name}{_SUFFIX}"
+    t0 = time.perf_counter()
+    # transacciones explícitas (BEGIN/COMMIT); foreign_keys solo se puede
+    # cambiar fuera de una transacción
+    with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            # los PRAGMA de esquema no releen un esquema cambiado por otra
+            # conexión: una consulta normal lo recarga antes de leer las FK
+            conn.exec_driver_sql("SELECT count(*) FROM sqlite_master").scalar()
+            actions = {**_fk_actions(conn, name), **(on_delete or {})}
+            table = _with_fk_actions(table, actions)
+            if _exists(conn, tmp):
+                log(f"rebuild {name}: reanudando")
+            else:
+                conn.exec_driver_sql(_create_sql(conn, table, tmp))
+            if columns is None:
+                old = set(_columns(conn, name))
+                columns = [c for c in _columns(conn, tmp) if c in old]
+            cols = ", ".join(columns)
+            done = _count(conn, tmp)
+            total = done + _count(conn, name)
+            copied = 0
+            while True:
+                hi = conn.exec_driver_sql(
+                    f"SELECT max(rowid) FROM (SELECT rowid FROM {name} "
+                    "ORDER BY rowid LIMIT ?)",
+                    (chunk,),
+                ).scalar()
+                if hi is None:
+                    break
+                # copiar y borrar en la misma transacción: el fichero no
+                # duplica su tamaño y lo pendiente es lo que queda en name
+                n = _move(conn, name, tmp, cols, hi)
+                copied += n
+                done += n
+                if progress is not None:
+                    progress(done, total)
+            copied += _swap(conn, table, tmp, cols)
+            problems = conn.exec_driver_sql(
+                f"PRAGMA foreign_key_check('{name}')"
+            ).fetchall()
+            if problems:
+                log(f"rebuild {name}: {len(problems)} filas con FK rotas")
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+    jlog(
+        "rebuild",
+        table=name,
+        rows=copied,
+        ms=int((time.perf_counter() - t0) * 1000),
+    )
+    return copied
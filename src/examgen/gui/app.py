@@ -6,21 +6,14 @@ from pathlib import Path
 
 from PySide6.QtWidgets import QApplication
 
-from examgen.core.database import (
-    get_engine,
-    init_db,
-    run_migrations,
-    set_engine,
-)
-from examgen.config import settings, db_path
+from examgen.core.database import set_engine
+from examgen.core.services.maintenance import scheduler
+from examgen.core.services.write_coordinator import release_lease
 
 
-db_file = db_path()
-db_file.parent.mkdir(parents=True, exist_ok=True)
-set_engine(db_file)
-run_migrations()
-if db_file.exists() or settings.db_folder is None:
-    init_db(get_engine())
+# ``database_url`` o, si no hay, el fichero SQLite de ``db_folder``; crea o
+# actualiza el esquema según el ledger ``schema_version``
+set_engine()
 
 
 def main() -> None:
@@ -29,6 +22,11 @@ def main() -> None:
     from examgen.gui.windows.main_window import MainWindow
 
     app = QApplication.instance() or QApplication(sys.argv)
+    # ANALYZE / vacuum / quick_check en un hilo cuando la BD está ociosa
+    scheduler.start()
+    app.aboutToQuit.connect(scheduler.stop)
+    # deja el turno de escritura a otros equipos sin esperar a que caduque
+    app.aboutToQuit.connect(release_lease)
     win = MainWindow()
     win.show()
     sys.exit(app.exec())
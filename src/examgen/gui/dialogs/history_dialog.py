@@ -16,10 +16,9 @@ from PySide6.QtWidgets import (
     QAbstractItemView,
 )
 
-from sqlalchemy.orm import selectinload
-
-from examgen.core import models as m
 from examgen.core.database import SessionLocal
+from examgen.core.services import archive
+from examgen.core.services.exam_service import delete_attempts
 
 
 class AttemptsHistoryDialog(QDialog):
@@ -68,24 +67,19 @@ class AttemptsHistoryDialog(QDialog):
         self._reload_table()
 
     def _reload_table(self) -> None:
-        attempts = (
-            self._session.query(m.Attempt)
-            .options(selectinload(m.Attempt.questions))
-            .order_by(m.Attempt.started_at.desc())
-            .all()
-        )
+        attempts = archive.history()
 
         fmt = "%d/%m/%Y %H:%M"
         self.table.setRowCount(len(attempts))
         for row, at in enumerate(attempts):
             start = at.started_at.strftime(fmt) if at.started_at else "-"
-            if at.ended_at:
-                secs = int((at.ended_at - at.started_at).total_seconds())
+            secs = at.duration_seconds
+            if secs is not None:
                 dur_txt = f"{secs//60}:{secs%60:02d} min"
             else:
                 dur_txt = "-"
 
-            total_q = len(at.questions)
+            total_q = at.question_count
             corr = at.score or 0
             pct = round((corr / total_q) * 100) if total_q else 0
 
@@ -142,9 +136,7 @@ class AttemptsHistoryDialog(QDialog):
             != QMessageBox.Yes
         ):
             return
-        with SessionLocal() as s:
-            s.query(m.Attempt).filter_by(id=aid).delete()
-            s.commit()
+        delete_attempts([aid])
         self._reload_table()
 
     def _edit_placeholder(self) -> None:
@@ -166,9 +158,7 @@ class AttemptsHistoryDialog(QDialog):
             != QMessageBox.Yes
         ):
             return
-        with SessionLocal() as s:
-            s.query(m.Attempt).delete()
-            s.commit()
+        archive.clear_history()
         self._reload_table()
 
     def reject(self) -> None:  # type: ignore[override]
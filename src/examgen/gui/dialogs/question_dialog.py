@@ -10,6 +10,7 @@ from PySide6.QtWidgets import (
     QButtonGroup,
     QDialog,
     QDialogButtonBox,
+    QFileDialog,
     QRadioButton,
     QSpinBox,
     QFormLayout,
@@ -34,6 +35,8 @@ from examgen.config import DEFAULT_DB
 from examgen.core import models as m
 from examgen.core.database import SessionLocal
 from examgen.core.services.exam_service import ExamConfig
+from examgen.core.services.media import question_media, set_question_media, store_file
+from examgen.core.services import tags as tag_service
 from examgen.core.models import SelectorTypeEnum
 from sqlalchemy.orm import Session, joinedload, selectinload
 
@@ -208,15 +211,19 @@ class ExamConfigDialog(QDialog):
 
         self.rb_random = QRadioButton("Aleatorio")
         self.rb_errors = QRadioButton("Errores")
+        self.rb_review = QRadioButton("Repaso")
+        self.rb_review.setToolTip("Primero las preguntas cuyo repaso ha vencido")
         self.group = QButtonGroup(self)
         self.group.addButton(self.rb_random)
         self.group.addButton(self.rb_errors)
+        self.group.addButton(self.rb_review)
 
         radio_widget = QWidget()
         hr = QHBoxLayout(radio_widget)
         hr.setContentsMargins(0, 0, 0, 0)
         hr.addWidget(self.rb_random)
         hr.addWidget(self.rb_errors)
+        hr.addWidget(self.rb_review)
         hr.addStretch(1)
 
         form = QFormLayout()
@@ -225,6 +232,15 @@ class ExamConfigDialog(QDialog):
         form.addRow("Nº preguntas:", self.spin_questions)
         form.addRow("Selector:", radio_widget)
 
+        self.le_tags = QLineEdit()
+        self.le_tags.setPlaceholderText("ej.: tema1 OR tema2 AND NOT repaso")
+        known = tag_service.all_tags()
+        self.le_tags.setToolTip(
+            "Etiquetas: " + ", ".join(known) if known else "No hay etiquetas"
+        )
+        self.le_tags.setEnabled(bool(known))
+        form.addRow("Etiquetas:", self.le_tags)
+
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.btn_ok = self.buttons.button(QDialogButtonBox.Ok)
         self.buttons.accepted.connect(self.accept)
@@ -287,12 +303,32 @@ class ExamConfigDialog(QDialog):
         ok_enabled = subject_ok and selector_ok and questions_ok and time_ok
         self.btn_ok.setEnabled(ok_enabled)
 
-    def accept(self) -> None:  # type: ignore[override]
-        selector = (
-            SelectorTypeEnum.ALEATORIO
-            if self.rb_random.isChecked()
-            else SelectorTypeEnum.ERRORES
+    def _tag_expr(self) -> Optional[str]:
+        """Validated tag expression, ``None`` if empty; raises TagExprError."""
+        expr = self.le_tags.text().strip()
+        if not expr:
+            return None
+        unknown = tag_service.expr_tags(tag_service.parse_tag_expr(expr)) - set(
+            tag_service.all_tags()
         )
+        if unknown:
+            raise tag_service.TagExprError(
+                "Etiquetas desconocidas: " + ", ".join(sorted(unknown))
+            )
+        return expr
+
+    def accept(self) -> None:  # type: ignore[override]
+        try:
+            tag_expr = self._tag_expr()
+        except tag_service.TagExprError as exc:
+            QMessageBox.warning(self, "Etiquetas", str(exc))
+            return
+        if self.rb_random.isChecked():
+            selector = SelectorTypeEnum.ALEATORIO
+        elif self.rb_review.isChecked():
+            selector = SelectorTypeEnum.REPASO
+        else:
+            selector = SelectorTypeEnum.ERRORES
         self.config = ExamConfig(
             exam_id=0,
             subject=self.cb_subject.currentText().strip(),
@@ -301,6 +337,7 @@ class ExamConfigDialog(QDialog):
             num_questions=self.spin_questions.value(),
             error_threshold=None,
             time_limit=self.spin_time.value(),
+            tag_expr=tag_expr,
         )
         super().accept()
 
@@ -326,7 +363,10 @@ class QuestionDialog(QDialog):
                 self._question = (
                     s.query(m.MCQQuestion)
                     .options(
-                        selectinload(m.MCQQuestion.options),
+                        # el diálogo edita las explicaciones (columnas diferidas)
+                        selectinload(m.MCQQuestion.options).undefer(
+                            m.AnswerOption.explanation
+                        ),
                         joinedload(m.MCQQuestion.subject),
                     )
                     .get(question_id)
@@ -340,6 +380,8 @@ class QuestionDialog(QDialog):
         self.cb_section.setFixedWidth(500)
         self.le_reference = QLineEdit()
         self.le_reference.setPlaceholderText("ej.: exam_1025")
+        self.le_tags = QLineEdit()
+        self.le_tags.setPlaceholderText("separadas por comas")
 
         top = QHBoxLayout()
         top.setContentsMargins(0, 0, 0, 0)
@@ -350,6 +392,9 @@ class QuestionDialog(QDialog):
         top.addSpacing(20)
         top.addWidget(QLabel("Referencia:"))
         top.addWidget(self.le_reference)
+        top.addSpacing(20)
+        top.addWidget(QLabel("Etiquetas:"))
+        top.addWidget(self.le_tags)
         w_top = QWidget()
         w_top.setLayout(top)
 
@@ -366,6 +411,16 @@ class QuestionDialog(QDialog):
         self.table = OptionTable(self)
         add_btn = QPushButton("+", clicked=self.table.add_row, fixedSize=QSize(30, 30))
 
+        # imágenes: se copian al almacén de media al elegirlas; la pregunta
+        # solo guarda sus hashes al pulsar Guardar
+        self._media: list[str] = question_media(question_id) if question_id else []
+        self.btn_media = QPushButton("Imágenes…", clicked=self._pick_media)
+        self.btn_clear_media = QToolButton(clicked=self._clear_media)
+        self.btn_clear_media.setIcon(QIcon.fromTheme("edit-delete"))
+        self.btn_clear_media.setToolTip("Quitar imágenes")
+        self.lbl_media = QLabel()
+        self._update_media_label()
+
         form = QFormLayout()
         form.addRow("Materia:", w_top)
         form.addRow("Enunciado:", w_prompt)
@@ -375,6 +430,9 @@ class QuestionDialog(QDialog):
         h = QHBoxLayout()
         h.addWidget(add_btn)
         h.addStretch(1)
+        h.addWidget(self.lbl_media)
+        h.addWidget(self.btn_media)
+        h.addWidget(self.btn_clear_media)
         form.addRow(h)
 
         buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
@@ -391,6 +449,7 @@ class QuestionDialog(QDialog):
             self.cb_subject.setCurrentText(self._question.subject.name)
             self.cb_section.setCurrentText(self._question.section or "")
             self.le_reference.setText(self._question.reference or "")
+            self.le_tags.setText(", ".join(tag_service.question_tags(question_id)))
             self.prompt.setPlainText(self._question.prompt)
 
             opts = self._question.options
@@ -410,6 +469,28 @@ class QuestionDialog(QDialog):
             self.prompt.moveCursor(self.prompt.textCursor().End)
         self.counter.setText(f"{len(self.prompt.toPlainText())}/{MAX_CHARS}")
 
+    def _pick_media(self) -> None:
+        files, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Añadir imágenes",
+            "",
+            "Imágenes (*.png *.jpg *.jpeg *.gif *.bmp *.svg)",
+        )
+        for path in files:
+            sha = store_file(path)
+            if sha not in self._media:
+                self._media.append(sha)
+        self._update_media_label()
+
+    def _clear_media(self) -> None:
+        self._media.clear()
+        self._update_media_label()
+
+    def _update_media_label(self) -> None:
+        n = len(self._media)
+        self.lbl_media.setText(f"{n} imagen(es)" if n else "")
+        self.btn_clear_media.setEnabled(bool(n))
+
     def _load_subjects(self) -> None:
         with SessionLocal() as s:
             names = sorted(sub.name for sub in s.query(m.Subject).all())
@@ -447,6 +528,7 @@ class QuestionDialog(QDialog):
         ref = self.le_reference.text().strip()
         section = self.cb_section.currentText().strip()
         prompt_txt = self.prompt.toPlainText().strip()
+        tag_names = self.le_tags.text().split(",")
 
         if not subj or not prompt_txt:
             QMessageBox.warning(
@@ -473,6 +555,8 @@ class QuestionDialog(QDialog):
                     section=section or None,
                 )
                 q.options = options
+                set_question_media(q, self._media)
+                tag_service.set_question_tags(s, q, tag_names)
                 s.add(q)
             else:
                 q = s.merge(self._question)
@@ -482,6 +566,8 @@ class QuestionDialog(QDialog):
                 q.subject = self._ensure_subject(s, subj)
                 q.options[:] = []
                 q.options.extend(options)
+                set_question_media(q, self._media)
+                tag_service.set_question_tags(s, q, tag_names)
             s.commit()
 
         QMessageBox.information(
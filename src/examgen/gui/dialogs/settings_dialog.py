@@ -16,7 +16,7 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from examgen.config import AppSettings, db_path
+from examgen.config import AppSettings
 from examgen.core.database import set_engine
 
 
@@ -67,5 +67,6 @@ class SettingsDialog(QDialog):
         cfg.db_folder = self.settings.db_folder
         self.settings.save()
         if self.settings.db_folder:
-            set_engine(db_path())
+            # set_engine() prefiere database_url a la carpeta
+            set_engine()
         super().accept()
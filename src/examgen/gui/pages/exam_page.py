@@ -35,9 +35,15 @@ from PySide6.QtWidgets import (
 )
 
 from examgen.core.models import Attempt, AttemptQuestion
-from examgen.core.database import SessionLocal
-from examgen.core.services.exam_service import evaluate_attempt
+from examgen.core.services.exam_service import (
+    evaluate_attempt,
+    is_answer_correct,
+    question_explanations,
+)
+from examgen.core.services.media import media_for_questions
+from examgen.core.services.write_coordinator import run_write
 from examgen.gui.dialogs.results_dialog import ResultsDialog
+from examgen.gui.pixmap_cache import pixmap_cache
 from examgen.utils.debug import (
     jlog,
     mark_render_start,
@@ -128,6 +134,13 @@ class ExamPage(QWidget):
             QSizePolicy.Expanding,
             QSizePolicy.Minimum,
         )
+        # imágenes de la pregunta: hashes de toda la prueba en una consulta,
+        # pixmaps bajo demanda a través de ``pixmap_cache``
+        self._media_index: dict[int, list[str]] | None = None
+        self.media_panel = QWidget()
+        self.vbox_media = QVBoxLayout(self.media_panel)
+        self.vbox_media.setContentsMargins(0, 0, 0, 0)
+        self.media_panel.setVisible(False)
         self.group = QButtonGroup(self)
         self.options: list[OptionWidgetInfo] = []
         # Guardaremos aquí todos los widgets de opción
@@ -162,6 +175,7 @@ class ExamPage(QWidget):
         )
         container_layout.addWidget(self.progress)
         container_layout.addWidget(self.lbl_prompt)
+        container_layout.addWidget(self.media_panel)
         container_layout.addWidget(opts_container)
         self.box_expl = QFrame(objectName="explanationBox")
         lay_expl = QVBoxLayout(self.box_expl)
@@ -345,9 +359,7 @@ class ExamPage(QWidget):
                 )
             )
         aq.selected_option = sel
-        with SessionLocal() as s:
-            s.merge(aq)
-            s.commit()
+        run_write(lambda s: s.merge(aq))
 
     # ------------------------ nav & display ----------------------------
     def _load_question(self) -> None:
@@ -377,8 +389,10 @@ class ExamPage(QWidget):
         )
         self.lbl_prompt.setText(q.prompt)
         self.lbl_prompt.adjustSize()
+        self._load_media(q.id)
+        q_expl, opt_expl = question_explanations(q.id)
         has_expl = bool(
-            q.explanation and q.explanation.strip()
+            q_expl and q_expl.strip()
         )
         self._has_expl = has_expl
         self.btn_toggle.setEnabled(has_expl)
@@ -388,14 +402,14 @@ class ExamPage(QWidget):
         self.btn_toggle.setText("Revisar Explicación \u25bc")
         self.btn_toggle.setEnabled(False)
         self.btn_next.setEnabled(False)
-        self.lbl_expl.setText(q.explanation or "")
+        self.lbl_expl.setText(q_expl or "")
 
         options: list[tuple[str, str, bool, str]] = [
             (
                 letter,
                 opt.text,
                 opt.is_correct,
-                opt.explanation or "",
+                opt_expl.get(opt.id) or "",
             )
             for letter, opt in aq.question.options_dict.items()
             if opt.text
@@ -482,6 +496,28 @@ class ExamPage(QWidget):
             mem_mb=int(psutil.Process().memory_full_info().uss / 1e6),
         )
 
+    def _load_media(self, question_id: int) -> None:
+        if self._media_index is None:
+            self._media_index = media_for_questions(
+                aq.question_id for aq in self.attempt.questions
+            )
+        for i in reversed(range(self.vbox_media.count())):
+            item = self.vbox_media.takeAt(i)
+            if item.widget():
+                item.widget().deleteLater()
+        shown = 0
+        for sha in self._media_index.get(question_id, []):
+            pix = pixmap_cache.get(sha)
+            if pix is None:
+                continue
+            if pix.width() > 960:
+                pix = pix.scaledToWidth(960, Qt.SmoothTransformation)
+            lbl = QLabel(alignment=Qt.AlignCenter)
+            lbl.setPixmap(pix)
+            self.vbox_media.addWidget(lbl)
+            shown += 1
+        self.media_panel.setVisible(bool(shown))
+
     def _toggle_pause(self) -> None:
         if self.timer.isActive():
             self.timer.stop()
@@ -590,18 +626,8 @@ class ExamPage(QWidget):
             info.widget.setFocusPolicy(Qt.NoFocus)
 
     def _evaluate_selection(self, aq: AttemptQuestion) -> None:
-        correct_set = {
-            letter
-            for letter, opt in zip("ABCDE", aq.question.options)
-            if opt.is_correct
-        }
-        if isinstance(self.options[0].widget, QRadioButton):
-            aq.is_correct = aq.selected_option in correct_set
-        else:
-            aq.is_correct = set(aq.selected_option or "") == correct_set
-        with SessionLocal() as s:
-            s.merge(aq)
-            s.commit()
+        aq.is_correct = is_answer_correct(aq.selected_mask, aq.question.correct_mask)
+        run_write(lambda s: s.merge(aq))
 
     def _apply_colors(self, aq: AttemptQuestion) -> None:
         sel_set = set(aq.selected_option or "")
@@ -630,9 +656,7 @@ class ExamPage(QWidget):
             self.timer.stop()
         self._save_selection()
         self.attempt.ended_at = datetime.utcnow()
-        with SessionLocal() as s:
-            s.merge(self.attempt)
-            s.commit()
+        run_write(lambda s: s.merge(self.attempt))
 
         self.attempt = evaluate_attempt(self.attempt.id)
 
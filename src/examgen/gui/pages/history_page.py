@@ -13,13 +13,15 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QHeaderView,
     QAbstractItemView,
+    QCheckBox,
     QSizePolicy,
 )
 
-from sqlalchemy.orm import selectinload
-
-from examgen.core import models as m
-from examgen.core.database import SessionLocal
+from examgen.config import settings
+from examgen.core.services import archive
+from examgen.core.services.archive import HistoryEntry
+from examgen.core.services.exam_service import delete_attempts
+from examgen.core.services.maintenance import scheduler
 from examgen.gui.dialogs.results_dialog import ResultsDialog
 
 
@@ -53,6 +55,9 @@ class HistoryPage(QWidget):
         hh.setSectionResizeMode(7, QHeaderView.Fixed)
 
         self.btn_clear = QPushButton("Borrar todo", clicked=self._clear_all)
+        self.btn_archive = QPushButton("Archivar antiguos", clicked=self._archive_old)
+        self.chk_archived = QCheckBox("Incluir archivados")
+        self.chk_archived.toggled.connect(lambda _: self._reload_table())
 
         root = QVBoxLayout(self)
         root.setContentsMargins(0, 0, 0, 0)
@@ -61,7 +66,9 @@ class HistoryPage(QWidget):
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         root.addWidget(self.table)
         footer = QHBoxLayout()
+        footer.addWidget(self.chk_archived)
         footer.addStretch(1)
+        footer.addWidget(self.btn_archive)
         footer.addWidget(self.btn_clear)
         root.addLayout(footer)
 
@@ -69,25 +76,19 @@ class HistoryPage(QWidget):
 
     # ------------------------------------------------------------------
     def _reload_table(self) -> None:
-        with SessionLocal() as session:
-            attempts = (
-                session.query(m.Attempt)
-                .options(selectinload(m.Attempt.questions))
-                .order_by(m.Attempt.started_at.desc())
-                .all()
-            )
+        attempts = archive.history(self.chk_archived.isChecked())
 
         fmt = "%d/%m/%Y %H:%M"
         self.table.setRowCount(len(attempts))
         for row, at in enumerate(attempts):
             start = at.started_at.strftime(fmt) if at.started_at else "-"
-            if at.ended_at:
-                secs = int((at.ended_at - at.started_at).total_seconds())
+            secs = at.duration_seconds
+            if secs is not None:
                 dur_txt = f"{secs//60}:{secs%60:02d} min"
             else:
                 dur_txt = "-"
 
-            total_q = len(at.questions)
+            total_q = at.question_count
             corr = at.score or 0
             pct = round((corr / total_q) * 100) if total_q else 0
 
@@ -122,6 +123,9 @@ class HistoryPage(QWidget):
             del_btn.clicked.connect(
                 lambda _, aid=at.id: self._delete_attempt(aid)
             )
+            if at.archived:
+                del_btn.setEnabled(False)
+                del_btn.setToolTip("Intento archivado")
             self.table.setCellWidget(row, 7, del_btn)
 
         for c in range(self.table.columnCount()):
@@ -141,8 +145,28 @@ class HistoryPage(QWidget):
         self.table.setMinimumWidth(total_w)
         self.resize(total_w, self.height())
 
-    def _show_results(self, attempt: m.Attempt) -> None:
-        ResultsDialog.show_for_attempt(attempt, self.window())
+    def _show_results(self, entry: HistoryEntry) -> None:
+        if not entry.archived:
+            ResultsDialog.show_for_attempt(entry, self.window())
+            return
+        attempt = archive.load_archived_attempt(entry.id)
+        if attempt is None:
+            QMessageBox.critical(self, "Error", "Intento no encontrado en el archivo")
+            return
+        ResultsDialog(attempt, self.window()).exec()
+
+    def _archive_old(self) -> None:
+        days = settings.archive_after_days or archive.DEFAULT_AFTER_DAYS
+        rep = archive.archive_old_attempts(days)
+        if rep.attempts:
+            scheduler.request("incremental_vacuum", "optimize")
+        QMessageBox.information(
+            self,
+            "Archivar",
+            f"{rep.attempts} intentos de más de {days} días "
+            f"movidos a {rep.path.name}.",
+        )
+        self._reload_table()
 
     def _delete_attempt(self, aid: int) -> None:
         if (
@@ -156,11 +180,7 @@ class HistoryPage(QWidget):
             != QMessageBox.Yes
         ):
             return
-        with SessionLocal() as session:
-            attempt = session.get(m.Attempt, aid)
-            if attempt:
-                session.delete(attempt)
-                session.commit()
+        delete_attempts([aid])
         self._reload_table()
 
     def _clear_all(self) -> None:
@@ -175,9 +195,5 @@ class HistoryPage(QWidget):
             != QMessageBox.Yes
         ):
             return
-        with SessionLocal() as session:
-            attempts = session.query(m.Attempt).all()
-            for attempt in attempts:
-                session.delete(attempt)
-            session.commit()
+        archive.clear_history()
         self._reload_table()
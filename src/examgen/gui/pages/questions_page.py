@@ -22,14 +22,18 @@ from PySide6.QtWidgets import (
     QSplitter,
     QAbstractScrollArea,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 
 from examgen.core import models as m
 from examgen.core.database import SessionLocal
+from examgen.core.services.search import search_question_ids
 from sqlalchemy.exc import IntegrityError
 from examgen.gui.dialogs.question_dialog import QuestionDialog
 from sqlalchemy.orm import selectinload
 
+# resultados de búsqueda por página
+SEARCH_PAGE = 200
+
 
 class QuestionsPage(QWidget):
     def __init__(self, parent: QWidget | None = None) -> None:
@@ -37,13 +41,18 @@ class QuestionsPage(QWidget):
 
         # --- fila 1: filtros + botón ---
         self.cb_subject = QComboBox()
-        self.cb_subject.currentIndexChanged.connect(self._load_table)
+        self.cb_subject.currentIndexChanged.connect(self._new_search)
 
-        self.search = QLineEdit(placeholderText="Busca en enunciado u opciones…")
-        self.search.setEnabled(False)
+        self.search = QLineEdit(
+            placeholderText="Busca en enunciado, opciones o explicaciones…"
+        )
         self.search.setMinimumWidth(400)
         self.search.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         self.search.textChanged.connect(self._filter_table)
+        # evita una consulta por cada pulsación
+        self._search_timer = QTimer(self, singleShot=True, interval=250)
+        self._search_timer.timeout.connect(self._new_search)
+        self._search_page = 0
 
         btn_new = QPushButton("Nueva pregunta", clicked=self._new_question)
 
@@ -101,6 +110,13 @@ class QuestionsPage(QWidget):
         self.footer = QStatusBar(self)
         self.lbl_stats = QLabel(self)
         self.footer.addWidget(self.lbl_stats)
+        # paginación de la búsqueda (solo visible si hay más de una página)
+        self.btn_prev = QPushButton("◀", clicked=lambda: self._turn_page(-1))
+        self.lbl_page = QLabel(self)
+        self.btn_next = QPushButton("▶", clicked=lambda: self._turn_page(1))
+        for w in (self.btn_prev, self.lbl_page, self.btn_next):
+            self.footer.addPermanentWidget(w)
+        self._show_page(0, 0, False)
         self.footer.setStyleSheet("QStatusBar::item { border: 0px; }")
         root.addWidget(self.footer)
 
@@ -123,39 +139,66 @@ class QuestionsPage(QWidget):
 
     def _load_table(self) -> None:
         subj_id = self.cb_subject.currentData()
-        self.search.setEnabled(bool(subj_id))
-        if not subj_id:
+        query_text = self.search.text().strip()
+        if not subj_id and not query_text:
             self.table.setRowCount(0)
+            self._show_page(0, 0, False)
             return
 
-        query_text = self.search.text().strip().lower()
-
         with SessionLocal() as s:
-            questions = (
-                s.query(m.MCQQuestion)
-                .options(selectinload(m.MCQQuestion.options))
-                .filter(m.MCQQuestion.subject_id == subj_id)
-                .order_by(m.MCQQuestion.id)
-                .all()
+            stmt = s.query(m.MCQQuestion).options(
+                selectinload(m.MCQQuestion.options).undefer(m.AnswerOption.explanation)
             )
-
             if query_text:
-                questions = [
-                    q
-                    for q in questions
-                    if query_text in q.prompt.lower()
-                    or any(query_text in o.text.lower() for o in q.options)
-                ]
+                # sin materia seleccionada se busca en todas; se pide uno de
+                # más para saber si hay otra página
+                offset = self._search_page * SEARCH_PAGE
+                ids = search_question_ids(
+                    query_text, subj_id or None, SEARCH_PAGE + 1, offset
+                )
+                more = len(ids) > SEARCH_PAGE
+                ids = ids[:SEARCH_PAGE]
+                order = {qid: pos for pos, qid in enumerate(ids)}
+                questions = sorted(
+                    stmt.filter(m.MCQQuestion.id.in_(ids)).all(),
+                    key=lambda q: order[q.id],
+                )
+            else:
+                offset, more = 0, False
+                questions = (
+                    stmt.filter(m.MCQQuestion.subject_id == subj_id)
+                    .order_by(m.MCQQuestion.id)
+                    .all()
+                )
+
+            self._show_page(offset, len(questions), more)
+            self._populate_table(questions, start=offset + 1)
+
+    def _new_search(self) -> None:
+        self._search_page = 0
+        self._load_table()
 
-            self._populate_table(questions)
+    def _turn_page(self, step: int) -> None:
+        self._search_page = max(self._search_page + step, 0)
+        self._load_table()
 
-    def _populate_table(self, rows: list[m.MCQQuestion]) -> None:
+    def _show_page(self, offset: int, shown: int, more: bool) -> None:
+        paged = offset > 0 or more
+        for w in (self.btn_prev, self.lbl_page, self.btn_next):
+            w.setVisible(paged)
+        self.btn_prev.setEnabled(offset > 0)
+        self.btn_next.setEnabled(more)
+        if paged:
+            text = f"Resultados {offset + 1}–{offset + shown}"
+            self.lbl_page.setText(text + (" (hay más)" if more else ""))
+
+    def _populate_table(self, rows: list[m.MCQQuestion], start: int = 1) -> None:
         self.table.setRowCount(0)
         cur_row = 0
         COL_EDIT = self.table.columnCount() - 2
         COL_DELETE = self.table.columnCount() - 1
 
-        for q_index, q in enumerate(rows, start=1):
+        for q_index, q in enumerate(rows, start=start):
             n_opts = len(q.options) or 1
 
             for _ in range(n_opts):
@@ -298,7 +341,7 @@ class QuestionsPage(QWidget):
         self.lbl_stats.setText(f"Materias: {num_subj}   Preguntas: {num_q}")
 
     def _filter_table(self, _text: str) -> None:
-        self._load_table()
+        self._search_timer.start()
 
     # ---------------- actions ----------------
     def _new_question(self) -> None:
@@ -3,7 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QObject, Qt, Signal
 from PySide6.QtWidgets import (
     QWidget,
     QComboBox,
@@ -12,18 +12,28 @@ from PySide6.QtWidgets import (
     QFormLayout,
     QHBoxLayout,
     QLineEdit,
+    QMessageBox,
+    QProgressBar,
     QPushButton,
     QVBoxLayout,
 )
 
-from examgen.config import AppSettings, db_path
+from examgen.config import AppSettings
 from examgen.utils.debug import log
 from examgen.core.database import set_engine
+from examgen.core.services import backup
 
 if TYPE_CHECKING:  # pragma: no cover - circular imports only for type hints
     from examgen.gui.windows.main_window import MainWindow  # noqa: F401
 
 
+class _BackupSignals(QObject):
+    """Carry BackupJob callbacks from its thread to the GUI thread."""
+
+    progress = Signal(int, int)
+    finished = Signal(object, object)
+
+
 class SettingsPage(QWidget):
     """Editable application settings as a page."""
 
@@ -46,12 +56,28 @@ class SettingsPage(QWidget):
         btn_choose = QPushButton("…", clicked=self._pick_db_dir)
         btn_save = QPushButton("Guardar", clicked=self.save_settings)
 
+        # copias de seguridad en segundo plano (API de backup de SQLite)
+        self.btn_backup = QPushButton("Crear copia", clicked=self._start_backup)
+        self.btn_restore = QPushButton("Restaurar…", clicked=self._restore)
+        self.progress = QProgressBar()
+        self.progress.setTextVisible(True)
+        self.progress.hide()
+        self._backup_job: backup.BackupJob | None = None
+        self._signals = _BackupSignals(self)
+        self._signals.progress.connect(self._on_backup_progress)
+        self._signals.finished.connect(self._on_backup_finished)
+
         form = QFormLayout()
         form.addRow("Tema:", self.cb_theme)
         hb = QHBoxLayout()
         hb.addWidget(self.dir_edit)
         hb.addWidget(btn_choose)
         form.addRow("Base de datos:", hb)
+        hb_backup = QHBoxLayout()
+        hb_backup.addWidget(self.btn_backup)
+        hb_backup.addWidget(self.btn_restore)
+        hb_backup.addWidget(self.progress, 1)
+        form.addRow("Copia de seguridad:", hb_backup)
         form.addRow(self.chk_debug)
 
         root = QVBoxLayout(self)
@@ -74,7 +100,8 @@ class SettingsPage(QWidget):
         self.settings.debug_mode = self.chk_debug.isChecked()
         self.settings.save()
         cfg.db_folder = self.settings.db_folder
-        set_engine(db_path())
+        # con un servidor configurado la carpeta no cambia de BD
+        set_engine()
         win = self.window()
         from examgen.gui.windows.main_window import MainWindow as MW
 
@@ -82,6 +109,68 @@ class SettingsPage(QWidget):
             win._apply_theme()
             win._set_app_actions_enabled(bool(self.settings.db_folder))
 
+    def _start_backup(self) -> None:
+        if self._backup_job is not None:
+            return
+        self.btn_backup.setEnabled(False)
+        self.btn_restore.setEnabled(False)
+        self.progress.setValue(0)
+        self.progress.show()
+        self._backup_job = backup.BackupJob(
+            progress=self._signals.progress.emit,
+            done=self._signals.finished.emit,
+        ).start()
+
+    def _on_backup_progress(self, done: int, total: int) -> None:
+        self.progress.setMaximum(max(total, 1))
+        self.progress.setValue(done)
+
+    def _on_backup_finished(self, result, error) -> None:
+        self._backup_job = None
+        self.btn_backup.setEnabled(True)
+        self.btn_restore.setEnabled(True)
+        self.progress.hide()
+        if error is not None:
+            QMessageBox.critical(self, "Copia de seguridad", str(error))
+        else:
+            QMessageBox.information(
+                self, "Copia de seguridad", f"Copia guardada en {result.path}"
+            )
+
+    def _restore(self) -> None:
+        try:
+            folder = str(backup.backup_folder())
+        except RuntimeError as exc:
+            QMessageBox.warning(self, "Restaurar", str(exc))
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Restaurar copia", folder, "Copias (*.db)"
+        )
+        if not path:
+            return
+        if (
+            QMessageBox.question(
+                self,
+                "Restaurar",
+                "Se sustituirá la base de datos actual por la copia elegida "
+                "(antes se guarda una copia del estado actual). ¿Continuar?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            != QMessageBox.Yes
+        ):
+            return
+        try:
+            safety = backup.restore_backup(Path(path))
+        except Exception as exc:  # noqa: BLE001 - se muestra al usuario
+            QMessageBox.critical(self, "Restaurar", str(exc))
+            return
+        QMessageBox.information(
+            self,
+            "Restaurar",
+            f"Copia restaurada. El estado anterior está en {safety.path.name}.",
+        )
+
     def _on_debug_toggled(self, state: int) -> None:
         self.settings.debug_mode = bool(state)
         from examgen.utils.logger import set_logging
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from PySide6.QtGui import QPixmap
+
+from examgen.core.services.media import media_path
+
+
+class PixmapCache:
+    """Bounded LRU of decoded media pixmaps, keyed by sha256.
+
+    The budget counts decoded bytes (width × height × depth), which is what
+    actually occupies memory.  GUI thread only, like ``QPixmap`` itself.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, tuple[QPixmap, int]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, sha256: str) -> QPixmap | None:
+        """Return the pixmap for *sha256*, reading the file on a miss."""
+        hit = self._items.get(sha256)
+        if hit is not None:
+            self._items.move_to_end(sha256)
+            return hit[0]
+        pix = QPixmap(str(media_path(sha256)))
+        if pix.isNull():
+            return None
+        cost = pix.width() * pix.height() * max(pix.depth(), 8) // 8
+        self._items[sha256] = (pix, cost)
+        self._bytes += cost
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, (_, old) = self._items.popitem(last=False)
+            self._bytes -= old
+        return pix
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._bytes = 0
+
+
+pixmap_cache = PixmapCache()
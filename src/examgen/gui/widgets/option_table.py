@@ -24,12 +24,13 @@ from PySide6.QtWidgets import (
 )
 
 from examgen.core.models import Attempt, AttemptQuestion
-from examgen.core.database import SessionLocal
 from examgen.core.services.exam_service import (
     ExamConfig,
     create_attempt,
     evaluate_attempt,
+    question_explanations,
 )
+from examgen.core.services.write_coordinator import run_write
 from examgen.gui.dialogs.results_dialog import ResultsDialog
 
 from examgen.core import models as m
@@ -237,9 +238,7 @@ class ExamDialog(QDialog):
         else:
             sel = "".join(sorted(w.letter for w in self.opts if w.isChecked()))
         aq.selected_option = sel
-        with SessionLocal() as s:
-            s.merge(aq)
-            s.commit()
+        run_write(lambda s: s.merge(aq))
 
     # ----- correction helpers -----
     def _freeze_options(self) -> None:
@@ -247,16 +246,8 @@ class ExamDialog(QDialog):
             self._lock_widget(w)
 
     def _evaluate_selection(self, aq: AttemptQuestion) -> None:
-        correct_set = {
-            l for l, opt in zip("ABCDE", aq.question.options) if opt.is_correct
-        }
-        if isinstance(self.opts[0], QRadioButton):
-            aq.is_correct = aq.selected_option in correct_set
-        else:
-            aq.is_correct = set(aq.selected_option or "") == correct_set
-        with SessionLocal() as s:
-            s.merge(aq)
-            s.commit()
+        aq.is_correct = (aq.selected_mask or 0) == aq.question.correct_mask
+        run_write(lambda s: s.merge(aq))
 
     def _apply_colors(self, aq: AttemptQuestion) -> None:
         """Color options using rich text and lock them."""
@@ -289,7 +280,8 @@ class ExamDialog(QDialog):
         self.expl_shown = False
         self.lbl_prompt.setText(aq.question.prompt)
         self.lbl_prompt.adjustSize()
-        has_expl = bool(aq.question.explanation and aq.question.explanation.strip())
+        q_expl, opt_expl = question_explanations(aq.question_id)
+        has_expl = bool(q_expl and q_expl.strip())
         self._has_expl = has_expl
         self.btn_toggle.setEnabled(has_expl)
         self.btn_toggle.setToolTip(
@@ -320,7 +312,7 @@ class ExamDialog(QDialog):
             if isinstance(w, QRadioButton):
                 self.group.addButton(w)
             self.opts.append(w)
-            exp_text = aq.question.options_dict[letter].explanation or ""
+            exp_text = opt_expl.get(aq.question.options_dict[letter].id) or ""
             lbl_exp = QLabel(exp_text, self)
             lbl_exp.setWordWrap(True)
             lbl_exp.setObjectName("OptExplanation")
@@ -410,11 +402,7 @@ class ExamDialog(QDialog):
         self._save_selection()
         self.attempt.ended_at = datetime.utcnow()
 
-        from examgen.core.database import SessionLocal
-
-        with SessionLocal() as s:
-            s.merge(self.attempt)
-            s.commit()
+        run_write(lambda s: s.merge(self.attempt))
 
         self.attempt = evaluate_attempt(self.attempt.id)
 
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from sqlalchemy import select
+
+from examgen import config
+from examgen.core import database
+from examgen.core import models as m
+from examgen.core.services import sampling
+
+
+@pytest.fixture
+def db_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """A migrated SQLite database in a temporary folder."""
+    monkeypatch.setattr(config, "db_folder", str(tmp_path))
+    monkeypatch.setattr(config.settings, "archive_after_days", None)
+    path = tmp_path / "examgen.db"
+    database.set_engine(path)
+    database.run_migrations()
+    yield path
+    database.dispose_engines()
+    sampling.invalidate()
+
+
+@pytest.fixture
+def seed(db_file: Path):
+    """Return ``seed(subjects, per_subject)`` creating MCQ questions.
+
+    Question *i* has section ``S{i % 3}``, difficulty ``i % 3`` and its
+    correct option is ``i % 4``.
+    """
+
+    def _seed(subjects: int = 1, per_subject: int = 12) -> list[int]:
+        with database.SessionLocal() as s:
+            for si in range(subjects):
+                subject = m.Subject(name=f"Sub{si}")
+                s.add(subject)
+                for i in range(per_subject):
+                    q = m.MCQQuestion(
+                        prompt=f"Pregunta {si}-{i}",
+                        subject=subject,
+                        section=f"S{i % 3}",
+                        difficulty=i % 3,
+                    )
+                    q.options = [
+                        m.AnswerOption(text=f"opt{j}", is_correct=j == i % 4)
+                        for j in range(4)
+                    ]
+                    s.add(q)
+            s.commit()
+            return list(s.scalars(select(m.Question.id).order_by(m.Question.id)))
+
+    return _seed
+
+
+@pytest.fixture
+def make_attempt(db_file: Path):
+    """Return ``make_attempt(answers, **fields)`` creating an attempt.
+
+    *answers* maps question ids to the selected letters (``None`` = no
+    answer); extra keyword arguments are set on the :class:`Attempt`.
+    """
+
+    def _make(answers: dict[int, str | None], **fields) -> int:
+        values = {
+            "subject": "Sub0",
+            "selector_type": m.SelectorTypeEnum.ALEATORIO,
+            "time_limit": 0,
+            "question_count": len(answers),
+            **fields,
+        }
+        with database.SessionLocal() as s:
+            attempt = m.Attempt(**values)
+            for qid, letters in answers.items():
+                attempt.questions.append(
+                    m.AttemptQuestion(question_id=qid, selected_option=letters)
+                )
+            s.add(attempt)
+            s.commit()
+            return attempt.id
+
+    return _make
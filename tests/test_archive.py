@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal, get_engine
+from examgen.core.services import archive, exam_service
+from examgen.core.services.question_stats import rebuild_question_stats
+
+
+def _stats() -> dict[int, tuple[int, int]]:
+    st = m.QuestionStats
+    with SessionLocal() as s:
+        rows = s.execute(select(st.question_id, st.attempts, st.errors))
+        return {qid: (attempts, errors) for qid, attempts, errors in rows}
+
+
+def _answers(aid: int) -> list[tuple]:
+    with SessionLocal() as s:
+        return [
+            (aq.id, aq.question_id, aq.selected_option, aq.is_correct)
+            for aq in s.scalars(
+                select(m.AttemptQuestion)
+                .where(m.AttemptQuestion.attempt_id == aid)
+                .order_by(m.AttemptQuestion.id)
+            )
+        ]
+
+
+def test_archive_round_trip(seed, make_attempt):
+    ids = seed(1, 12)
+    old = datetime.utcnow() - timedelta(days=400)
+    # el intento reciente va primero: tras archivar, el id vivo más alto es 1
+    recent = make_attempt({qid: "A" for qid in ids})
+    archived = [
+        make_attempt({qid: letters for qid in ids}, started_at=old, ended_at=old)
+        for letters in ("B", "C")
+    ]
+    for aid in (recent, *archived):
+        exam_service.evaluate_attempt(aid)
+    stats = _stats()
+    rows = {aid: _answers(aid) for aid in archived}
+
+    report = archive.archive_old_attempts(older_than_days=365)
+
+    assert (report.attempts, report.questions) == (2, 24)
+    assert report.path.exists()
+    assert [e.id for e in archive.history()] == [recent]
+    entries = {e.id: e for e in archive.history(include_archived=True)}
+    assert {aid: e.archived for aid, e in entries.items()} == {
+        recent: False,
+        archived[0]: True,
+        archived[1]: True,
+    }
+    assert entries[archived[0]].question_count == 12
+    for aid in archived:
+        attempt = archive.load_archived_attempt(aid)
+        got = [
+            (aq.id, aq.question_id, aq.selected_option, aq.is_correct)
+            for aq in attempt.questions
+        ]
+        assert got == rows[aid]
+        assert attempt.questions[0].question.prompt.startswith("Pregunta")
+
+    # las estadísticas siguen contando lo archivado, también al reconstruirlas
+    assert _stats() == stats
+    rebuild_question_stats()
+    assert _stats() == stats
+
+    # los ids archivados no se reutilizan
+    new = make_attempt({ids[0]: "A"})
+    assert new > max(archived)
+    assert min(r[0] for r in _answers(new)) > max(r[0] for r in rows[archived[1]])
+
+    archive.clear_archive()
+    assert [e.id for e in archive.history(include_archived=True)] == [new, recent]
+
+
+def test_archiving_does_not_take_the_writer_connection(seed, make_attempt):
+    ids = seed(1, 6)
+    old = datetime.utcnow() - timedelta(days=400)
+    aid = make_attempt({qid: "A" for qid in ids}, started_at=old, ended_at=old)
+    exam_service.evaluate_attempt(aid)
+    # con la única conexión del escritor ocupada el archivado no debe esperar
+    with get_engine().connect():
+        report = archive.archive_old_attempts(older_than_days=365)
+    assert report.attempts == 1
+
+
+def test_clear_history_empties_live_archive_and_stats(seed, make_attempt):
+    ids = seed(1, 6)
+    old = datetime.utcnow() - timedelta(days=400)
+    for started in (old, datetime.utcnow()):
+        aid = make_attempt({qid: "A" for qid in ids}, started_at=started)
+        exam_service.evaluate_attempt(aid)
+    archive.archive_old_attempts(older_than_days=365)
+
+    assert archive.clear_history() == 1
+    assert archive.history(include_archived=True) == []
+    assert _stats() == {}
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import sqlite3
+
+from examgen.config import settings
+from examgen.core import database
+from examgen.core.services import backup
+
+
+def test_backup_is_not_restarted_by_concurrent_writes(db_file, seed, tmp_path):
+    seed(4, 200)
+    writer = sqlite3.connect(db_file, isolation_level=None)
+    steps: list[int] = []
+
+    def _progress(done: int, total: int) -> None:
+        steps.append(done)
+        if len(steps) > 20:
+            return
+        writer.execute(
+            "INSERT INTO subject (name, created_at, updated_at) "
+            "VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+            (f"w{len(steps)}",),
+        )
+
+    try:
+        res = backup.backup_database(tmp_path / "copy.db", _progress, pages=4)
+    finally:
+        writer.close()
+    # sin reinicios el progreso solo avanza
+    assert steps == sorted(steps) and len(steps) <= res.pages // 4 + 1
+    con = sqlite3.connect(res.path)
+    # la copia es la instantánea del inicio: sin las filas escritas durante ella
+    assert con.execute("SELECT count(*) FROM subject").fetchone()[0] == 4
+    con.close()
+
+
+def test_backup_without_wal_does_not_block_writers(
+    db_file, seed, tmp_path, monkeypatch
+):
+    seed(4, 200)
+    # carpeta compartida: el perfil abre la BD con journal_mode=DELETE
+    monkeypatch.setattr(settings, "sqlite_shared_folder", True)
+    database.dispose_engines()
+    database.set_engine(db_file)
+    with database.get_engine().connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    # sin espera: si la copia retuviera el bloqueo, el INSERT fallaría
+    writer = sqlite3.connect(db_file, isolation_level=None, timeout=0)
+    written = 0
+
+    def _progress(done: int, total: int) -> None:
+        nonlocal written
+        if written < 5:
+            written += 1
+            writer.execute(
+                "INSERT INTO subject (name, created_at, updated_at) "
+                "VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)",
+                (f"w{written}",),
+            )
+
+    try:
+        res = backup.backup_database(tmp_path / "copy.db", _progress, pages=4)
+    finally:
+        writer.close()
+    con = sqlite3.connect(res.path)
+    # sin WAL la copia vuelve a empezar tras cada escritura: tiene el final
+    assert con.execute("SELECT count(*) FROM subject").fetchone()[0] == 4 + 5
+    con.close()
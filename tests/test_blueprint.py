@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from collections import Counter
+import random
+
+import pytest
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import exam_service
+from examgen.core.services.blueprint import (
+    Blueprint,
+    BlueprintError,
+    _quotas,
+    sampler_for,
+)
+
+
+@pytest.fixture
+def strata(db_file) -> dict[int, tuple[str, int]]:
+    """36 questions: sections S0-S2 × difficulty 0-2, four per stratum."""
+    with SessionLocal() as s:
+        subject = m.Subject(name="Sub0")
+        for i in range(36):
+            q = m.MCQQuestion(
+                prompt=f"P{i}",
+                subject=subject,
+                section=f"S{i % 3}",
+                difficulty=i // 3 % 3,
+            )
+            q.options = [m.AnswerOption(text="a", is_correct=True)]
+            s.add(q)
+        s.commit()
+        q = m.Question
+        rows = s.execute(select(q.id, q.section, q.difficulty))
+        return {qid: (section, level) for qid, section, level in rows}
+
+
+def _sampler(blueprint: Blueprint, k: int):
+    with SessionLocal() as s:
+        return sampler_for(s, blueprint, k, subject="Sub0")
+
+
+def _config(num_questions: int | None, **kw) -> exam_service.ExamConfig:
+    return exam_service.ExamConfig(
+        exam_id=0,
+        subject="Sub0",
+        subject_id=0,
+        selector_type=m.SelectorTypeEnum.ALEATORIO,
+        num_questions=num_questions,
+        error_threshold=None,
+        time_limit=0,
+        blueprint=Blueprint(**kw),
+    )
+
+
+@pytest.mark.parametrize("k", [None, 0])
+def test_blueprint_without_size_raises_like_other_selectors(seed, k):
+    seed(1, 12)
+    with pytest.raises(ValueError, match="No hay preguntas"):
+        exam_service.create_attempt(_config(k))
+
+
+@pytest.mark.parametrize(
+    "k, mix, want",
+    [
+        (10, {0: 30, 1: 50, 2: 20}, {0: 3, 1: 5, 2: 2}),
+        (7, {0: 1, 1: 1, 2: 1}, {0: 3, 1: 2, 2: 2}),
+        (5, {1: 2, 2: 1}, {1: 3, 2: 2}),
+    ],
+)
+def test_quotas_use_largest_remainder(k, mix, want):
+    assert _quotas(k, mix) == want
+
+
+def test_every_draw_meets_section_minimums_and_mix(strata):
+    blueprint = Blueprint(min_per_section=3, difficulty_mix={0: 30, 1: 50, 2: 20})
+    sampler = _sampler(blueprint, 10)
+    rng = random.Random(1)
+    for _ in range(200):
+        ids = sampler.draw(rng)
+        assert len(ids) == len(set(ids)) == 10
+        sections = Counter(strata[qid][0] for qid in ids)
+        levels = Counter(strata[qid][1] for qid in ids)
+        assert min(sections[s] for s in ("S0", "S1", "S2")) >= 3
+        assert levels == {0: 3, 1: 5, 2: 2}
+
+
+def test_explicit_section_minimum_wins(strata):
+    blueprint = Blueprint(min_per_section=1, sections={"S2": 6})
+    sampler = _sampler(blueprint, 8)
+    rng = random.Random(2)
+    for _ in range(50):
+        sections = Counter(strata[qid][0] for qid in sampler.draw(rng))
+        assert sections["S2"] >= 6 and sections["S0"] >= 1 and sections["S1"] >= 1
+
+
+def test_impossible_blueprints_list_every_problem(strata):
+    with pytest.raises(BlueprintError) as exc:
+        _sampler(Blueprint(min_per_section=5, difficulty_mix={0: 1, 4: 1}), 12)
+    problems = " | ".join(exc.value.problems)
+    assert "suman 15" in problems
+    assert "la dificultad 4 necesita 6 y hay 0" in problems
+
+
+def test_blueprint_attempt_meets_the_blueprint(strata):
+    config = _config(9, min_per_section=3, difficulty_mix={0: 1, 1: 1, 2: 1})
+    attempt = exam_service.create_attempt(config)
+    ids = [aq.question_id for aq in attempt.questions]
+    assert len(ids) == 9
+    assert Counter(strata[qid][0] for qid in ids) == {"S0": 3, "S1": 3, "S2": 3}
+    assert Counter(strata[qid][1] for qid in ids) == {0: 3, 1: 3, 2: 3}
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import exam_service
+
+
+def _papers(attempt_ids: list[int]) -> list[frozenset[int]]:
+    aq = m.AttemptQuestion
+    with SessionLocal() as s:
+        rows = s.execute(
+            select(aq.attempt_id, aq.question_id).where(aq.attempt_id.in_(attempt_ids))
+        ).all()
+    return [frozenset(q for a, q in rows if a == aid) for aid in attempt_ids]
+
+
+def test_error_papers_are_drawn_per_learner(seed):
+    ids = seed(1, 20)
+    failed = set(ids[:10])
+    with SessionLocal() as s:
+        exam = m.Exam(title="Parcial")
+        exam.questions = [
+            m.ExamQuestion(question_id=qid, order=i) for i, qid in enumerate(ids)
+        ]
+        s.add(exam)
+        s.add_all(
+            m.QuestionStats(
+                question_id=qid, attempts=3, errors=1 + i if qid in failed else 0
+            )
+            for i, qid in enumerate(ids)
+        )
+        s.commit()
+        exam_id = exam.id
+    cfg = exam_service.ExamConfig(
+        exam_id=exam_id,
+        subject="Sub0",
+        subject_id=None,
+        selector_type=m.SelectorTypeEnum.ERRORES,
+        num_questions=4,
+        error_threshold=4,
+        time_limit=0,
+    )
+
+    learners = [f"alumno{i}" for i in range(6)]
+    papers = _papers(exam_service.create_cohort_attempts(cfg, learners, seed=7))
+    # cada uno con su sorteo, pero solo entre las preguntas falladas
+    assert all(len(p) == 4 and p <= failed for p in papers)
+    assert len(set(papers)) > 1
+    # la misma semilla repite los exámenes
+    again = _papers(exam_service.create_cohort_attempts(cfg, learners, seed=7))
+    assert again == papers
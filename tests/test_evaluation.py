@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import random
+
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import exam_service
+
+CHOICES = [None, "A", "B", "C", "D", "AB"]
+
+
+def _reference(attempt_id: int) -> tuple[list[bool], dict[int, list[int]]]:
+    """Evaluate in Python with the letter-set rule used before the UPDATEs."""
+    with SessionLocal() as s:
+        attempt = s.get(m.Attempt, attempt_id)
+        results = []
+        for aq in sorted(attempt.questions, key=lambda aq: aq.id):
+            correct = {
+                letter
+                for letter, opt in zip("ABCDE", aq.question.options)
+                if opt.is_correct
+            }
+            sel = aq.selected_option
+            if not sel:
+                ok = False
+            elif len(correct) == 1:
+                ok = sel in correct
+            else:
+                ok = set(sel) == correct
+            results.append((aq.question_id, ok))
+    tally: dict[int, list[int]] = {}
+    for qid, ok in results:
+        t = tally.setdefault(qid, [0, 0])
+        t[0] += 1
+        t[1] += not ok
+    return [ok for _qid, ok in results], tally
+
+
+def _stats() -> dict[int, list[int]]:
+    with SessionLocal() as s:
+        rows = s.execute(
+            select(
+                m.QuestionStats.question_id,
+                m.QuestionStats.attempts,
+                m.QuestionStats.errors,
+            )
+        )
+        return {qid: [attempts, errors] for qid, attempts, errors in rows}
+
+
+def test_set_based_evaluation_matches_letter_sets(seed, make_attempt):
+    ids = seed(1, 12)
+    rng = random.Random(7)
+    started = datetime.utcnow() - timedelta(minutes=5)
+    answers = {qid: rng.choice(CHOICES) for qid in ids}
+    aid = make_attempt(answers, started_at=started)
+    expected, tally = _reference(aid)
+
+    attempt = exam_service.evaluate_attempt(aid)
+
+    rows = sorted(attempt.questions, key=lambda aq: aq.id)
+    assert [aq.is_correct for aq in rows] == expected
+    assert [aq.score for aq in rows] == [int(ok) for ok in expected]
+    assert attempt.score == attempt.correct_count == sum(expected)
+    assert attempt.question_count == len(ids)
+    assert attempt.answered_count == sum(1 for a in answers.values() if a)
+    assert 299 <= attempt.duration_seconds <= 302
+    assert _stats() == tally
+
+
+def test_batch_evaluation_counts_statistics_once(seed, make_attempt):
+    ids = seed(1, 12)
+    rng = random.Random(3)
+    aids = [make_attempt({qid: rng.choice(CHOICES) for qid in ids}) for _ in range(3)]
+    tally: dict[int, list[int]] = {}
+    expected = {}
+    for aid in aids:
+        expected[aid], single = _reference(aid)
+        for qid, (attempts, errors) in single.items():
+            t = tally.setdefault(qid, [0, 0])
+            t[0] += attempts
+            t[1] += errors
+
+    with SessionLocal() as s:
+        assert sorted(exam_service.evaluate_attempts(s, aids)) == sorted(aids)
+        s.commit()
+    # evaluar otra vez no vuelve a sumar estadísticas
+    for aid in aids:
+        exam_service.evaluate_attempt(aid)
+
+    with SessionLocal() as s:
+        for aid in aids:
+            rows = s.scalars(
+                select(m.AttemptQuestion)
+                .where(m.AttemptQuestion.attempt_id == aid)
+                .order_by(m.AttemptQuestion.id)
+            )
+            assert [aq.is_correct for aq in rows] == expected[aid]
+    assert _stats() == {qid: t for qid, t in tally.items() if t[0]}
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from examgen.core.database import get_engine
+from examgen.core.migrations import hot_path_indexes
+
+
+def test_migration_creates_every_index(db_file):
+    with get_engine().begin() as conn:
+        for name, _table, _cols in hot_path_indexes.INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    hot_path_indexes.run()
+    # idempotente: una segunda ejecución no falla
+    hot_path_indexes.run()
+    with get_engine().connect() as conn:
+        names = set(
+            conn.scalars(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        )
+    assert {name for name, _t, _c in hot_path_indexes.INDEXES} <= names
+
+
+def test_selector_queries_do_not_scan_tables(seed):
+    seed(2, 30)
+    with get_engine().begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    report = hot_path_indexes.verify()
+    assert report and {name: scans for name, scans in report.items() if scans} == {}
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import sqlite3
+
+from examgen.config import settings
+from examgen.core import database
+from examgen.core.services import maintenance
+
+
+def test_jobs_do_not_take_the_writer_connection(db_file, seed):
+    seed(2, 50)
+    # con la única conexión del escritor ocupada, ningún job debe esperarla
+    with database.get_engine().connect():
+        for name in ("quick_check", "analyze", "optimize", "incremental_vacuum"):
+            res = maintenance.run_job(name)
+            assert res.ok, res.detail
+
+
+def test_big_legacy_file_is_not_converted_by_the_scheduler(db_file, monkeypatch):
+    database.dispose_engines()
+    con = sqlite3.connect(db_file)
+    con.execute("PRAGMA journal_mode = DELETE")
+    con.execute("PRAGMA auto_vacuum = NONE")
+    con.execute("VACUUM")
+    con.close()
+    database.set_engine(db_file)
+    monkeypatch.setattr(settings, "maintenance_convert_max_mb", 0)
+
+    res = maintenance.run_job("incremental_vacuum")
+    assert res.ok and res.detail.startswith("skipped")
+    res = maintenance.run_job("convert_vacuum")
+    assert res.ok and res.detail.startswith("converted")
+    con = sqlite3.connect(db_file)
+    assert con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    con.close()
+
+
+def test_idle_runs_only_touch_user_data_when_archiving_is_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "archive_after_days", None)
+    assert maintenance.scheduled_jobs() == maintenance.SCHEDULED_JOBS
+    assert not {"backup", "archive", "media_gc"} & set(maintenance.SCHEDULED_JOBS)
+    monkeypatch.setattr(settings, "archive_after_days", 180)
+    assert maintenance.scheduled_jobs()[:2] == ("quick_check", "archive")
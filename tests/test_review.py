@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import exam_service
+from examgen.core.services.question_stats import (
+    MIN_EASE,
+    _Card,
+    rebuild_question_stats,
+    review,
+)
+
+T0 = datetime(2026, 1, 1)
+
+
+def test_review_follows_sm2():
+    card = _Card()
+    intervals = []
+    for day, ok in enumerate([True, True, True, False, True]):
+        review(card, ok, T0 + timedelta(days=day))
+        intervals.append(card.interval_days)
+    # el tercer acierto usa la facilidad ya subida dos veces (2.5 + 0.2)
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] == pytest.approx(6.0 * 2.7, abs=0.01)
+    # un fallo vuelve a empezar
+    assert intervals[3:] == [1.0, 1.0]
+    assert card.due_at == T0 + timedelta(days=4 + 1)
+    for _ in range(20):
+        review(card, False, T0)
+    assert card.ease == MIN_EASE
+
+
+def _cards() -> dict[int, tuple]:
+    st = m.QuestionStats
+    with SessionLocal() as s:
+        rows = s.execute(
+            select(st.question_id, st.ease, st.interval_days, st.repetitions, st.due_at)
+        )
+        return {qid: tuple(rest) for qid, *rest in rows}
+
+
+def _answer(ids, correct: bool) -> dict[int, str]:
+    # la opción correcta de la pregunta i es i % 4 (ver conftest.seed)
+    with SessionLocal() as s:
+        masks = dict(s.execute(select(m.Question.id, m.Question.correct_mask)).all())
+    letters = {1: "A", 2: "B", 4: "C", 8: "D"}
+    wrong = {1: "B", 2: "C", 4: "D", 8: "A"}
+    return {qid: (letters if correct else wrong)[masks[qid]] for qid in ids}
+
+
+@pytest.fixture
+def reviewed(seed, make_attempt):
+    """q0-3 failed 3 days ago; q4-7 right 3 and 2 days ago; q8-11 unseen."""
+    ids = seed(1, 12)
+    now = datetime.utcnow()
+    first = {**_answer(ids[:4], False), **_answer(ids[4:8], True)}
+    for answers, days in ((first, 3), (_answer(ids[4:8], True), 2)):
+        ended = now - timedelta(days=days)
+        aid = make_attempt(answers, started_at=ended, ended_at=ended)
+        exam_service.evaluate_attempt(aid)
+    return ids
+
+
+def test_due_dates_are_stored_incrementally(reviewed):
+    ids = reviewed
+    cards = _cards()
+    assert set(cards) == set(ids[:8])
+    now = datetime.utcnow()
+    for qid in ids[:4]:
+        assert cards[qid][2] == 0 and cards[qid][3] < now
+    for qid in ids[4:8]:
+        assert cards[qid][1:3] == (6.0, 2) and cards[qid][3] > now
+
+
+def test_review_selector_takes_overdue_then_new_then_later(reviewed):
+    ids = reviewed
+
+    def _draw(k: int) -> set[int]:
+        config = exam_service.ExamConfig(
+            exam_id=0,
+            subject="Sub0",
+            subject_id=0,
+            selector_type=m.SelectorTypeEnum.REPASO,
+            num_questions=k,
+            error_threshold=None,
+            time_limit=0,
+        )
+        return {aq.question_id for aq in exam_service.create_attempt(config).questions}
+
+    assert _draw(4) == set(ids[:4])
+    six = _draw(6)
+    assert set(ids[:4]) < six and six - set(ids[:4]) <= set(ids[8:])
+    assert _draw(12) == set(ids)
+
+
+def test_replaying_history_gives_the_incremental_state(reviewed):
+    incremental = _cards()
+    with SessionLocal() as s:
+        s.execute(delete(m.QuestionStats))
+        s.commit()
+    rebuild_question_stats()
+    assert _cards() == incremental
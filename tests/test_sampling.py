@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import sqlite3
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import sampling
+
+
+def test_pools_see_changes_from_other_connections(db_file, seed):
+    ids = seed(1, 12)
+    with SessionLocal() as s:
+        subject_id = s.get(m.Question, ids[0]).subject_id
+        assert sorted(sampling.subject_pool(s, subject_id)) == ids
+
+    # otro proceso (o SQL directo) borra una pregunta: sin eventos del ORM
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute("DELETE FROM question WHERE id = ?", (ids[-1],))
+    con.close()
+
+    with SessionLocal() as s:
+        assert sorted(sampling.subject_pool(s, subject_id)) == ids[:-1]
+
+
+def test_pools_are_reused_while_nothing_changes(db_file, seed):
+    ids = seed(1, 12)
+    with SessionLocal() as s:
+        subject_id = s.get(m.Question, ids[0]).subject_id
+        first = sampling.subject_pool(s, subject_id)
+    with SessionLocal() as s:
+        assert sampling.subject_pool(s, subject_id) is first
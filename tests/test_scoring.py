@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from itertools import combinations
+
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal, get_engine
+from examgen.core.migrations import answer_masks
+from examgen.core.services.exam_service import evaluate_attempt, is_answer_correct
+
+LETTERS = "ABCD"
+SUBSETS = [
+    "".join(c) for n in range(len(LETTERS) + 1) for c in combinations(LETTERS, n)
+]
+
+
+def _letter_rule(correct: set[str], selected: str | None) -> bool:
+    # regla anterior a las máscaras (conjuntos de letras); sin respuesta
+    # nunca es acierto, tampoco en preguntas sin opción correcta
+    if not selected:
+        return False
+    if len(correct) == 1:
+        return selected in correct
+    return set(selected) == correct
+
+
+def _add_question(s, subject: m.Subject, correct: str) -> m.MCQQuestion:
+    q = m.MCQQuestion(prompt=f"clave {correct}", subject=subject)
+    q.options = [
+        m.AnswerOption(text=letter, is_correct=letter in correct)
+        for letter in LETTERS
+    ]
+    s.add(q)
+    return q
+
+
+def test_masks_score_like_letter_sets(db_file):
+    with SessionLocal() as s:
+        subject = m.Subject(name="Sub0")
+        questions = {key: _add_question(s, subject, key) for key in SUBSETS}
+        s.flush()
+        attempt = m.Attempt(
+            subject="Sub0", selector_type=m.SelectorTypeEnum.ALEATORIO, time_limit=0
+        )
+        expected = []
+        for key, q in questions.items():
+            assert q.correct_mask == m.letters_to_mask(key)
+            # también selecciones desordenadas y sin respuesta
+            for selected in [*SUBSETS, key[::-1], None]:
+                aq = m.AttemptQuestion(question=q, selected_option=selected)
+                attempt.questions.append(aq)
+                ok = _letter_rule(set(key), selected)
+                expected.append(ok)
+                # la regla en Python (GUI) es la misma que la de la BD
+                assert is_answer_correct(aq.selected_mask, q.correct_mask) == ok
+        s.add(attempt)
+        s.commit()
+        attempt_id = attempt.id
+
+    scored = evaluate_attempt(attempt_id)
+    got = [aq.is_correct for aq in sorted(scored.questions, key=lambda aq: aq.id)]
+    assert got == expected
+    assert scored.correct_count == scored.score == sum(expected)
+
+
+def test_mask_backfill_ignores_lowercase(make_attempt, seed):
+    qid = seed(1, 1)[0]
+    aid = make_attempt({qid: "A"})
+    with get_engine().begin() as conn:
+        # como lo dejaba el relleno con LIKE
+        conn.exec_driver_sql(
+            "UPDATE attempt_question SET selected_option = 'ab', selected_mask = 3 "
+            "WHERE attempt_id = ?",
+            (aid,),
+        )
+    answer_masks.run()
+    with get_engine().connect() as conn:
+        mask = conn.exec_driver_sql(
+            "SELECT selected_mask FROM attempt_question WHERE attempt_id = ?", (aid,)
+        ).scalar()
+    assert mask == m.letters_to_mask("ab") == 0
+
+
+def test_selected_mask_follows_selected_option(db_file):
+    aq = m.AttemptQuestion(selected_option="CA")
+    assert aq.selected_mask == 0b101
+    aq.selected_option = None
+    assert aq.selected_mask is None
+    # letras fuera de A-E no cuentan
+    assert m.letters_to_mask("AZ") == 1
+
+
+def test_correct_mask_follows_option_edits(db_file):
+    with SessionLocal() as s:
+        q = _add_question(s, m.Subject(name="Sub0"), "B")
+        s.commit()
+        assert q.correct_mask == 0b10
+        q.options[3].is_correct = True
+        s.commit()
+        assert q.correct_mask == 0b1010
+        s.delete(q.options[1])
+        s.commit()
+        # "D" pasa a ser la tercera opción (C)
+        stored = s.scalar(select(m.Question.correct_mask).where(m.Question.id == q.id))
+        assert stored == 0b100
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import sqlite3
+
+from examgen.core import database
+from examgen.core import models as m
+from examgen.core.services.search import search_question_ids
+
+
+def test_search_pages_cover_every_match_once(seed):
+    ids = seed(1, 12)
+    pages = [search_question_ids("pregunta", limit=5, offset=o) for o in (0, 5, 10)]
+    assert [len(p) for p in pages] == [5, 5, 2]
+    assert sorted(qid for page in pages for qid in page) == ids
+
+
+def test_other_clients_can_write_indexed_tables(seed, db_file):
+    qid = seed(1, 1)[0]
+    # sqlite3 sin funciones de la aplicación: los triggers deben funcionar
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute(
+            "UPDATE question SET explanation = 'ornitorrinco' WHERE id = ?", [qid]
+        )
+        con.execute(
+            "UPDATE answer_option SET text = 'equidna' "
+            "WHERE question_id = ? AND text = 'opt0'",
+            [qid],
+        )
+    con.close()
+    assert search_question_ids("ornitorrinco") == [qid]
+    assert search_question_ids("equidna") == [qid]
+
+
+def test_compressed_explanations_are_searchable(seed):
+    qid = seed(1, 1)[0]
+    long_text = "murciélago " + "lorem ipsum " * 100
+    with database.SessionLocal() as s:
+        q = s.get(m.Question, qid)
+        q.explanation = long_text
+        q.options[0].text = "quokka"
+        s.commit()
+    with database.get_engine().connect() as conn:
+        stored = conn.exec_driver_sql(
+            "SELECT typeof(explanation) FROM question WHERE id = ?", (qid,)
+        ).scalar()
+    assert stored == "blob"
+    assert search_question_ids("murcielago") == [qid]
+    assert search_question_ids("quokka") == [qid]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table
+
+from examgen.core.database import get_engine
+from examgen.core.table_rebuild import rebuild_table
+
+ROWS = 95
+
+
+class _Stop(Exception):
+    pass
+
+
+def _new_child() -> Table:
+    # definición nueva: columna extra con valor por defecto, FK sin ON DELETE
+    meta = MetaData()
+    Table("parent", meta, Column("id", Integer, primary_key=True))
+    return Table(
+        "child",
+        meta,
+        Column("id", Integer, primary_key=True),
+        Column("parent_id", ForeignKey("parent.id"), nullable=False),
+        Column("val", String(20)),
+        Column("extra", Integer, nullable=False, server_default="7"),
+    )
+
+
+@pytest.fixture
+def legacy(db_file):
+    con = sqlite3.connect(db_file)
+    with con:
+        con.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        con.execute(
+            "CREATE TABLE child (id INTEGER PRIMARY KEY, parent_id INTEGER "
+            "NOT NULL REFERENCES parent(id) ON DELETE CASCADE, val TEXT)"
+        )
+        con.execute("CREATE INDEX ix_child_val ON child (val)")
+        con.executemany("INSERT INTO parent (id) VALUES (?)", [(1,), (2,)])
+        con.executemany(
+            "INSERT INTO child (id, parent_id, val) VALUES (?, ?, ?)",
+            [(i, 1 + i % 2, f"v{i}") for i in range(1, ROWS + 1)],
+        )
+    yield con
+    con.close()
+
+
+def test_interrupted_rebuild_resumes_without_losing_rows(legacy):
+    seen: list[tuple[int, int]] = []
+    stop = [True]
+
+    def _progress(done: int, total: int) -> None:
+        seen.append((done, total))
+        if stop[0] and len(seen) == 3:
+            raise _Stop()
+
+    with pytest.raises(_Stop):
+        rebuild_table(get_engine(), _new_child(), chunk=10, progress=_progress)
+    assert seen[-1] == (30, ROWS)
+    # a medias: la copia parcial existe y lo pendiente sigue en child
+    left = legacy.execute("SELECT count(*) FROM child").fetchone()[0]
+    assert left == ROWS - 30
+
+    # filas nuevas escritas entre la interrupción y la reanudación
+    with legacy:
+        legacy.execute("INSERT INTO child (id, parent_id, val) VALUES (500, 2, 'late')")
+    seen.clear()
+    stop[0] = False
+    copied = rebuild_table(get_engine(), _new_child(), chunk=10, progress=_progress)
+    assert copied == ROWS - 30 + 1
+    assert seen[0] == (40, ROWS + 1)
+
+    rows = legacy.execute("SELECT id, val, extra FROM child ORDER BY id").fetchall()
+    assert [r[0] for r in rows] == [*range(1, ROWS + 1), 500]
+    assert rows[0][1:] == ("v1", 7)
+    names = {r[0] for r in legacy.execute("SELECT name FROM sqlite_master")}
+    assert "ix_child_val" in names and "child_rebuild" not in names
+
+
+def test_rebuild_keeps_on_delete_actions(legacy):
+    rebuild_table(get_engine(), _new_child(), chunk=40)
+    sql = legacy.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'child'"
+    ).fetchone()[0]
+    assert "ON DELETE CASCADE" in sql
+    legacy.execute("PRAGMA foreign_keys = ON")
+    with legacy:
+        legacy.execute("DELETE FROM parent WHERE id = 1")
+    left = legacy.execute("SELECT count(*) FROM child").fetchone()[0]
+    # parent 1 tenía los ids pares
+    assert left == ROWS - ROWS // 2
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import tags
+from examgen.core.services.tags import TagExprError, parse_tag_expr
+
+
+@pytest.mark.parametrize(
+    "text, tree",
+    [
+        ("a", ("tag", "a")),
+        ("a OR b AND c", ("or", ("tag", "a"), ("and", ("tag", "b"), ("tag", "c")))),
+        ("NOT a AND b", ("and", ("not", ("tag", "a")), ("tag", "b"))),
+        ("(a OR b) c", ("and", ("or", ("tag", "a"), ("tag", "b")), ("tag", "c"))),
+        (
+            "a | b & !c",
+            ("or", ("tag", "a"), ("and", ("tag", "b"), ("not", ("tag", "c")))),
+        ),
+        ("a && b || c", ("or", ("and", ("tag", "a"), ("tag", "b")), ("tag", "c"))),
+        ('"Tema  1" and not X', ("and", ("tag", "tema 1"), ("not", ("tag", "x")))),
+        ("NOT NOT a", ("not", ("not", ("tag", "a")))),
+    ],
+)
+def test_parser_precedence_and_syntax(text, tree):
+    assert parse_tag_expr(text) == tree
+
+
+@pytest.mark.parametrize("text", ["", "   ", "a AND", "(a", "a)", "AND a", "a ( )"])
+def test_parser_rejects_malformed_expressions(text):
+    with pytest.raises(TagExprError):
+        parse_tag_expr(text)
+
+
+@pytest.fixture
+def tagged(seed) -> dict[int, set[str]]:
+    """Tag the seeded questions: "par"/"impar" by id, "tres" one in three."""
+    ids = seed(1, 12)
+    wanted = {qid: {"par" if qid % 2 == 0 else "impar"} for qid in ids}
+    for qid in ids[::3]:
+        wanted[qid].add("tres")
+    with SessionLocal() as s:
+        for q in s.scalars(select(m.Question)):
+            tags.set_question_tags(s, q, wanted[q.id])
+        s.commit()
+    return wanted
+
+
+def _matches(expr: str) -> list[int]:
+    with SessionLocal() as s:
+        universe = tags.subject_bits_by_name(s, "Sub0")
+        return tags.from_bits(tags.evaluate(s, expr, universe))
+
+
+@pytest.mark.parametrize(
+    "expr, keep",
+    [
+        ("par", lambda t: "par" in t),
+        ("par AND NOT tres", lambda t: "par" in t and "tres" not in t),
+        ("impar OR tres", lambda t: "impar" in t or "tres" in t),
+        ("NOT (par OR tres)", lambda t: not {"par", "tres"} & t),
+    ],
+)
+def test_expressions_match_set_logic(tagged, expr, keep):
+    assert _matches(expr) == sorted(qid for qid, t in tagged.items() if keep(t))
+
+
+def test_bitsets_follow_tag_edits(tagged):
+    first = min(tagged)
+    with SessionLocal() as s:
+        tags.set_question_tags(s, s.get(m.Question, first), ["nueva"])
+        s.commit()
+    assert _matches("nueva") == [first]
+    assert first not in _matches("par OR impar")
+
+
+def test_unknown_tags_are_reported(tagged):
+    with pytest.raises(TagExprError, match="desconocida"):
+        _matches("par AND fantasma")
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from sqlalchemy import select, text
+
+from examgen.config import settings
+from examgen.core import models as m
+from examgen.core.database import SessionLocal
+from examgen.core.services import write_coordinator as wc
+
+
+@pytest.mark.parametrize("lease", [0.0, 0.02])
+def test_concurrent_processes_lose_no_writes(db_file, lease):
+    res = wc.stress(str(db_file), processes=4, writes=40, lease=lease)
+    assert res["failed"] == 0
+    assert res["writes"] == 4 * 40
+    assert res["rows"] == 4 * 40
+
+
+def test_lone_instance_keeps_writing_with_lease(db_file, monkeypatch):
+    monkeypatch.setattr(settings, "write_lease_seconds", 0.05)
+    monkeypatch.setattr(settings, "write_retries", 0)
+    for i in range(5):
+        wc.run_write(lambda s, i=i: s.add(m.Subject(name=f"solo-{i}")))
+        # fuera de su turno y sin nadie esperando: no debe cederlo
+        time.sleep(0.06)
+    with SessionLocal() as s:
+        assert len(s.scalars(select(m.Subject.id)).all()) == 5
+
+
+def test_holder_yields_only_to_a_waiter(db_file, monkeypatch):
+    monkeypatch.setattr(settings, "write_lease_seconds", 10.0)
+    lease = m.WriterLease.__table__
+    now = time.time()
+    with SessionLocal() as s:
+        # turno propio recién vencido y otra instancia esperando
+        s.execute(
+            lease.insert().values(
+                id=1,
+                holder=wc.INSTANCE_ID,
+                expires_at=now - 1,
+                waiter="otro",
+                waiter_at=now - 2,
+            )
+        )
+        s.commit()
+    with pytest.raises(wc.WriteContention):
+        wc.run_write(lambda s: s.add(m.Subject(name="x")), retries=0)
+    with SessionLocal() as s:
+        s.execute(lease.update().values(waiter=None, waiter_at=None))
+        s.commit()
+    wc.run_write(lambda s: s.add(m.Subject(name="x")), retries=0)
+
+
+def test_textual_writes_and_run_write_reads_use_the_writer(db_file):
+    with SessionLocal() as s:
+        # text() no es UpdateBase: antes iba al lector, de solo lectura
+        s.execute(
+            text(
+                "INSERT INTO subject (name, created_at, updated_at) "
+                "VALUES ('crudo', '2026-01-01', '2026-01-01')"
+            )
+        )
+        s.commit()
+
+    def _work(session):
+        return session.get_bind(clause=select(m.Subject.id))
+
+    with SessionLocal() as s:
+        reader = s.reader
+    assert wc.run_write(_work) is not reader